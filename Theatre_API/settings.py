@@ -48,22 +48,34 @@ INSTALLED_APPS = [
     "theatre.apps.TheatreConfig",
     "user.apps.UserConfig",
     "rest_framework",
-    "debug_toolbar",
     "rest_framework_simplejwt",
     "drf_spectacular",
 ]
 
 MIDDLEWARE = [
+    "theatre.metrics.MetricsMiddleware",
+    "theatre.timing.ServerTimingMiddleware",
+    "theatre.querylog.SlowQueryMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "debug_toolbar.middleware.DebugToolbarMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "theatre.profiling.ProfilerMiddleware",
+    "theatre.replicas.ReplicaRoutingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+if DEBUG:
+    # The toolbar records every query and template of every request; it is
+    # a development tool only.
+    INSTALLED_APPS.append("debug_toolbar")
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index("django.middleware.security.SecurityMiddleware") + 1,
+        "debug_toolbar.middleware.DebugToolbarMiddleware",
+    )
+
 ROOT_URLCONF = "Theatre_API.urls"
 
 TEMPLATES = [
@@ -87,15 +99,102 @@ WSGI_APPLICATION = "Theatre_API.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.postgresql",
-        "NAME": os.environ["POSTGRES_DB"],
-        "USER": os.environ["POSTGRES_USER"],
-        "PASSWORD": os.environ["POSTGRES_PASSWORD"],
-        "HOST": os.environ["POSTGRES_HOST"],
-        "PORT": os.environ["POSTGRES_PORT"],
+# DATABASE_BACKEND selects the deployment profile: "postgresql" (default)
+# or "sqlite" for single-box deployments and local load tests that should
+# not need a database server.
+DATABASE_BACKEND = os.environ.get("DATABASE_BACKEND", "postgresql")
+
+if DATABASE_BACKEND == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("SQLITE_PATH", BASE_DIR / "db.sqlite3"),
+            "CONN_MAX_AGE": int(os.environ.get("SQLITE_CONN_MAX_AGE", 60)),
+            "CONN_HEALTH_CHECKS": True,
+            # A file (not the in-memory default) so tests get WAL and real
+            # cross-thread locking.
+            "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
+            "OPTIONS": {
+                # Seconds a writer waits on a locked database (busy timeout).
+                "timeout": float(os.environ.get("SQLITE_BUSY_TIMEOUT", 20)),
+                # Take the write lock when a transaction starts, so two
+                # reservations never deadlock upgrading read locks.
+                "transaction_mode": "IMMEDIATE",
+                "init_command": ";".join(
+                    [
+                        "PRAGMA journal_mode=WAL",
+                        "PRAGMA synchronous=NORMAL",
+                        "PRAGMA temp_store=MEMORY",
+                        # Bytes of the file mapped into memory (256 MiB).
+                        "PRAGMA mmap_size="
+                        + os.environ.get("SQLITE_MMAP_SIZE", "268435456"),
+                        # Negative values are KiB of page cache (64 MiB).
+                        "PRAGMA cache_size="
+                        + os.environ.get("SQLITE_CACHE_SIZE", "-65536"),
+                    ]
+                ),
+            },
+        }
     }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ["POSTGRES_DB"],
+            "USER": os.environ["POSTGRES_USER"],
+            "PASSWORD": os.environ["POSTGRES_PASSWORD"],
+            "HOST": os.environ["POSTGRES_HOST"],
+            "PORT": os.environ["POSTGRES_PORT"],
+            # Validate pooled/persistent connections before handing them out.
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {},
+        }
+    }
+
+    # Connection pooling (psycopg_pool). Pooling and persistent connections
+    # are mutually exclusive: with the pool disabled, POSTGRES_CONN_MAX_AGE
+    # keeps one connection per worker thread open instead.
+    if os.environ.get("POSTGRES_POOL_ENABLED", "True") == "True":
+        DATABASES["default"]["OPTIONS"]["pool"] = {
+            "min_size": int(os.environ.get("POSTGRES_POOL_MIN_SIZE", 2)),
+            "max_size": int(os.environ.get("POSTGRES_POOL_MAX_SIZE", 10)),
+            # Seconds a request waits for a free connection before failing.
+            "timeout": float(os.environ.get("POSTGRES_POOL_TIMEOUT", 10)),
+            "max_idle": float(os.environ.get("POSTGRES_POOL_MAX_IDLE", 600)),
+            "max_lifetime": float(
+                os.environ.get("POSTGRES_POOL_MAX_LIFETIME", 3600)
+            ),
+        }
+    else:
+        DATABASES["default"]["CONN_MAX_AGE"] = int(
+            os.environ.get("POSTGRES_CONN_MAX_AGE", 60)
+        )
+
+    # Read replicas: comma-separated "host[:port]" list. Each becomes a
+    # "replica_<n>" alias used for reads by ReplicaRouter.
+    for index, replica in enumerate(
+        filter(None, os.environ.get("POSTGRES_REPLICA_HOSTS", "").split(",")),
+        start=1,
+    ):
+        host, _, port = replica.strip().partition(":")
+        DATABASES[f"replica_{index}"] = {
+            **DATABASES["default"],
+            "HOST": host,
+            "PORT": port or DATABASES["default"]["PORT"],
+            "TEST": {"MIRROR": "default"},
+        }
+
+DATABASE_ROUTERS = ["theatre.replicas.ReplicaRouter"]
+
+REPLICA_ROUTING = {
+    "REPLICAS": [alias for alias in DATABASES if alias != "default"],
+    # Seconds a user's reads stay on the primary after they wrote.
+    "PIN_SECONDS": int(os.environ.get("REPLICA_PIN_SECONDS", 5)),
+    # Seat availability checks must never see replication lag.
+    "PRIMARY_ONLY_PATHS": [
+        "/api/theatre/reservations/",
+        "/api/health/",
+    ],
 }
 
 AUTH_USER_MODEL = "user.User"
@@ -158,6 +257,88 @@ REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
 
+# Virtual waiting room in front of reservation creation, see
+# theatre/admission.py for the available options.
+ADMISSION_QUEUE = {
+    "ENABLED": os.environ.get("ADMISSION_QUEUE_ENABLED", "True") == "True",
+    "STORE": "theatre.admission.LocalAdmissionStore",
+    # At most the connection pool, or admitted bookers wait for a
+    # connection instead of in the queue.
+    "MAX_CONCURRENT_BOOKERS": int(
+        os.environ.get(
+            "ADMISSION_QUEUE_MAX_CONCURRENT_BOOKERS",
+            os.environ.get("POSTGRES_POOL_MAX_SIZE", 10),
+        )
+    ),
+    "MAX_WAIT": float(os.environ.get("ADMISSION_QUEUE_MAX_WAIT", 5)),
+    "TICKET_TTL": float(os.environ.get("ADMISSION_QUEUE_TICKET_TTL", 30)),
+}
+
+# Stored responses for POST /reservations/ sent with an Idempotency-Key.
+IDEMPOTENCY = {
+    "TTL": timedelta(hours=24),
+    "WAIT": 10.0,
+}
+
+# Resized Play image variants, see theatre/images.py. With 0 workers
+# variants are rendered inline, at the end of the upload request.
+PLAY_IMAGES = {
+    "WORKERS": int(os.environ.get("PLAY_IMAGE_WORKERS", 2)),
+    # Uploads are rejected while streaming, see theatre/uploads.py.
+    "MAX_UPLOAD_SIZE": int(
+        os.environ.get("PLAY_IMAGE_MAX_UPLOAD_SIZE", 10 * 1024 * 1024)
+    ),
+    "MAX_PIXELS": int(os.environ.get("PLAY_IMAGE_MAX_PIXELS", 40_000_000)),
+}
+
+# Prometheus metrics, see theatre/metrics.py. Under a multi-worker server
+# point PROMETHEUS_MULTIPROC_DIR at a directory shared by the workers and
+# emptied on start.
+METRICS = {
+    "MULTIPROCESS_DIR": os.environ.get("PROMETHEUS_MULTIPROC_DIR", ""),
+    "FLUSH_INTERVAL": float(os.environ.get("METRICS_FLUSH_INTERVAL", 1)),
+    # Static bearer token for the Prometheus scrape job; empty disables it.
+    "SCRAPE_TOKEN": os.environ.get("METRICS_SCRAPE_TOKEN", ""),
+}
+
+CACHES = {
+    "default": {
+        # LocMemCache that counts hits and misses.
+        "BACKEND": "theatre.metrics.MeteredLocMemCache",
+    }
+}
+
+# Share of requests timed by theatre.timing.ServerTimingMiddleware (0 to 1).
+REQUEST_TIMING = {
+    "SAMPLE_RATE": float(os.environ.get("REQUEST_TIMING_SAMPLE_RATE", 0)),
+}
+
+# Slow query log, see theatre/querylog.py. The sampled EXPLAIN ANALYZE runs
+# the query a second time.
+SLOW_QUERIES = {
+    "THRESHOLD_MS": float(os.environ.get("SLOW_QUERY_THRESHOLD_MS", 100)),
+    "EXPLAIN_SAMPLE_RATE": float(
+        os.environ.get("SLOW_QUERY_EXPLAIN_SAMPLE_RATE", 0)
+    ),
+    "PATH": os.environ.get("SLOW_QUERY_LOG", ""),
+}
+
+# Per-request profiles of staff requests, see theatre/profiling.py.
+PROFILING = {
+    "DIRECTORY": os.environ.get("PROFILING_DIR", BASE_DIR / "files/profiles"),
+    "INTERVAL": float(os.environ.get("PROFILING_INTERVAL", 0.001)),
+}
+
+# Media file serving, see theatre/media.py. Behind nginx set
+# MEDIA_OFFLOAD=x-accel-redirect with an internal location aliased to
+# MEDIA_ROOT; behind Apache (mod_xsendfile) or lighttpd use x-sendfile.
+MEDIA_SERVING = {
+    "OFFLOAD": os.environ.get("MEDIA_OFFLOAD", ""),
+    "ACCEL_REDIRECT_LOCATION": os.environ.get(
+        "MEDIA_ACCEL_REDIRECT_LOCATION", "/protected-media/"
+    ),
+}
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Theatre API",
     "DESCRIPTION": "Order Theatre tickets",
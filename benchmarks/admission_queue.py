@@ -0,0 +1,203 @@
+"""
+Admission queue under overload, through the reservation API.
+
+A burst of clients, ``--overload`` times ``--bookers``
+(``MAX_CONCURRENT_BOOKERS``), posts one reservation each through the WSGI
+application in process, one thread per client. With the waiting room they
+queue for a booking slot and come back with their ``Queue-Ticket`` when
+told to; without it every request goes straight to the database. Clients
+book distinct free seats, so no booking fails on a seat conflict.
+
+The report shows booking latency from the first attempt to the created
+reservation, failed bookings and the peak number of database connections
+held by the client threads at once. Queued requests hand their connection
+back while they wait, so with the queue that peak stays near the number of
+bookers instead of growing with the burst; without it, requests beyond
+the pool's ``max_size`` wait for a connection and fail after its
+``timeout``.
+
+Connections are only handed back on a server database: run it against
+PostgreSQL with the connection pool enabled (the user needs CREATEDB).
+SQLite's in-memory test database keeps every connection open.
+
+Usage:
+    python -m benchmarks.admission_queue [--bookers 10] [--overload 10]
+"""
+import argparse
+import random
+import threading
+import time
+
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.test import override_settings
+from django.test.utils import setup_databases, teardown_databases
+
+from benchmarks.reservation_contention import (
+    BENCH_SETTINGS,
+    RESERVATIONS_URL,
+    Client,
+    Stats,
+    create_show,
+    create_users,
+    percentile,
+)
+
+
+class ConnectionGauge:
+    """Peak number of client threads holding a database connection."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.wrappers = []
+        self.peak = 0
+        self.done = threading.Event()
+
+    def register(self):
+        """Watch the connection of the calling thread."""
+        with self.lock:
+            self.wrappers.append(connections["default"])
+
+    def sample(self, interval=0.001):
+        while not self.done.wait(interval):
+            with self.lock:
+                held = sum(
+                    wrapper.connection is not None
+                    for wrapper in self.wrappers
+                )
+            self.peak = max(self.peak, held)
+
+
+def book(client, show, place, retry_delay):
+    """Book `place`, coming back with the queue ticket while queued."""
+    row, seat = place
+    data = {
+        "tickets": [
+            {"performance": show.performance_id, "row": row, "seat": seat}
+        ]
+    }
+    headers = {}
+    while True:
+        status, body = client.call(
+            "book", "POST", RESERVATIONS_URL, data, headers
+        )
+        if status != 503 or not body or "queue_ticket" not in body:
+            return status
+        headers = {"Queue-Ticket": body["queue_ticket"]}
+        time.sleep(retry_delay)
+
+
+def run(name, users, options):
+    show = create_show(name, len(users))
+    places = [
+        (index // show.seats_in_row + 1, index % show.seats_in_row + 1)
+        for index in range(show.presold, show.presold + show.free)
+    ]
+    application = get_wsgi_application()
+    stats = Stats()
+    gauge = ConnectionGauge()
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(len(users))
+
+    def client(index, user):
+        rng = random.Random(f"{options.seed}-{name}-{index}")
+        try:
+            gauge.register()
+            start_barrier.wait()
+            started = time.perf_counter()
+            status = book(
+                Client(application, stats, user, rng),
+                show,
+                places[index],
+                options.retry_ms / 1000,
+            )
+            with lock:
+                if status == 201:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    failures.append(status)
+        finally:
+            connections.close_all()
+
+    sampler = threading.Thread(target=gauge.sample)
+    sampler.start()
+    threads = [
+        threading.Thread(target=client, args=(index, user))
+        for index, user in enumerate(users)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    gauge.done.set()
+    sampler.join()
+    return latencies, failures, gauge.peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--bookers",
+        type=int,
+        default=10,
+        help="MAX_CONCURRENT_BOOKERS, at most the connection pool size.",
+    )
+    parser.add_argument("--overload", type=int, default=10)
+    parser.add_argument(
+        "--max-wait",
+        type=float,
+        default=5.0,
+        help="Seconds a request waits in the queue before a 503.",
+    )
+    parser.add_argument(
+        "--retry-ms",
+        type=float,
+        default=50.0,
+        help="Pause before a client comes back with its queue ticket.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    old_config = setup_databases(
+        verbosity=0, interactive=False, serialized_aliases=set()
+    )
+    try:
+        with override_settings(**BENCH_SETTINGS):
+            print(f"database: {connections['default'].vendor}")
+            print(
+                f"{'load':>5} {'mode':>8} {'ok':>6} {'failed':>6} "
+                f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'conns':>6}"
+            )
+            factors = sorted({1, args.overload // 2 or 1, args.overload})
+            users = create_users(args.bookers * max(factors))
+            for factor in factors:
+                for gated in (False, True):
+                    mode = "queue" if gated else "direct"
+                    queue_settings = {
+                        "ENABLED": gated,
+                        "MAX_CONCURRENT_BOOKERS": args.bookers,
+                        "MAX_WAIT": args.max_wait,
+                    }
+                    with override_settings(ADMISSION_QUEUE=queue_settings):
+                        latencies, failures, peak = run(
+                            f"{mode} {factor}x",
+                            users[: args.bookers * factor],
+                            args,
+                        )
+                    ms = [value * 1000 for value in latencies]
+                    print(
+                        f"{factor:>4}x {mode:>8} "
+                        f"{len(latencies):>6} {len(failures):>6} "
+                        f"{percentile(ms, 0.5):>8.1f} "
+                        f"{percentile(ms, 0.95):>8.1f} "
+                        f"{percentile(ms, 0.99):>8.1f} {peak:>6}"
+                    )
+    finally:
+        connections.close_all()
+        teardown_databases(old_config, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Sync (WSGI) vs native async (ASGI) read endpoints.
+
+Drives both Django applications in process at a fixed concurrency: WSGI
+requests run on a thread pool, one thread per in-flight request, while
+ASGI requests to the ``async/`` endpoints are coroutines on one event loop.
+Reports requests per second, latency percentiles and the peak Python heap
+(tracemalloc, measured in a separate pass) for each catalog read path.
+
+Runs against the database configured by DJANGO_SETTINGS_MODULE; seed it
+first, e.g. with ``python manage.py loaddata theatre_db_data.json``.
+
+Usage:
+    python -m benchmarks.async_reads [--concurrency 100] [--requests 2000]
+"""
+import argparse
+import asyncio
+import os
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "Theatre_API.settings")
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.core.asgi import get_asgi_application  # noqa: E402
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+from django.test import RequestFactory, override_settings  # noqa: E402
+from rest_framework_simplejwt.tokens import AccessToken  # noqa: E402
+
+from theatre.models import Performance, Play  # noqa: E402
+
+BENCH_SETTINGS = {
+    "DEBUG": False,
+    "ALLOWED_HOSTS": ["*"],
+    # Throttle history lives in the cache; a dummy cache never throttles.
+    "CACHES": {
+        "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+    },
+}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_wsgi(path, token, concurrency, total):
+    application = get_wsgi_application()
+    factory = RequestFactory()
+    latencies = []
+
+    def call(_):
+        environ = factory.get(path, HTTP_AUTHORIZATION=token).environ
+        statuses = []
+        started = time.perf_counter()
+        response = application(
+            environ, lambda status, headers: statuses.append(status)
+        )
+        b"".join(response)
+        response.close()
+        latencies.append(time.perf_counter() - started)
+        return statuses[0]
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        statuses = list(pool.map(call, range(total)))
+    return latencies, statuses
+
+
+def run_asgi(path, token, concurrency, total):
+    application = get_asgi_application()
+    path, _, query = path.partition("?")
+    latencies = []
+    statuses = []
+
+    async def call(semaphore):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [
+                (b"host", b"testserver"),
+                (b"authorization", token.encode()),
+            ],
+            "client": ("127.0.0.1", 0),
+            "server": ("testserver", 80),
+        }
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+        disconnect = asyncio.Event()
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                statuses.append(message["status"])
+
+        async with semaphore:
+            started = time.perf_counter()
+            await application(scope, receive, send)
+            latencies.append(time.perf_counter() - started)
+            disconnect.set()
+
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+        await asyncio.gather(*(call(semaphore) for _ in range(total)))
+
+    asyncio.run(main())
+    return latencies, statuses
+
+
+def measure(runner, path, token, concurrency, total):
+    started = time.perf_counter()
+    latencies, statuses = runner(path, token, concurrency, total)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    runner(path, token, concurrency, max(concurrency, total // 4))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    errors = sum(1 for status in statuses if int(str(status)[:3]) >= 400)
+    ms = [value * 1000 for value in latencies]
+    return (
+        f"{total / elapsed:>8.0f} {percentile(ms, 0.5):>8.1f} "
+        f"{percentile(ms, 0.99):>8.1f} {peak / 2 ** 20:>8.1f} {errors:>6}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    with override_settings(**BENCH_SETTINGS):
+        user, _ = get_user_model().objects.get_or_create(
+            email="benchmark@theatre.com"
+        )
+        token = f"Bearer {AccessToken.for_user(user)}"
+        play = Play.objects.first()
+        performance = Performance.objects.first()
+
+        paths = ["genres/", "actors/", "plays/", "performances/"]
+        if play:
+            paths.append(f"plays/{play.id}/")
+        if performance:
+            paths.append(f"performances/{performance.id}/")
+
+        print(
+            f"{'endpoint':<24} {'stack':<6} {'req/s':>8} {'p50 ms':>8} "
+            f"{'p99 ms':>8} {'heap MB':>8} {'errors':>6}"
+        )
+        for path in paths:
+            for stack, runner, prefix in (
+                ("wsgi", run_wsgi, "/api/theatre/"),
+                ("asgi", run_asgi, "/api/theatre/async/"),
+            ):
+                result = measure(
+                    runner,
+                    prefix + path,
+                    token,
+                    args.concurrency,
+                    args.requests,
+                )
+                print(f"{path:<24} {stack:<6} {result}")
+
+
+if __name__ == "__main__":
+    main()
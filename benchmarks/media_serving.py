@@ -0,0 +1,177 @@
+"""
+Media serving: Python streaming vs sendfile() vs front-server offload.
+
+A pool of sync workers (threads, as in gunicorn's sync or gthread workers)
+serves a mix of poster thumbnails, cards and full images to clients on a
+limited link. A sync worker is busy until the kernel send buffer has
+accepted the whole body, so with a slow client it waits for the transfer
+minus one buffer's worth. Each mode is measured end to end through
+``theatre.media.serve_media``:
+
+- ``python``: the body is iterated in Python (no ``wsgi.file_wrapper``).
+- ``sendfile``: the file is handed to ``os.sendfile()``, as gunicorn does.
+  The body is not copied through Python, but the worker still waits for
+  the client; at poster sizes the CPU saved is lost in the noise.
+- ``offload``: ``X-Accel-Redirect``; the worker returns after the headers
+  and the front server streams the file.
+
+``workers`` is how many workers it takes to sustain ``--rate`` requests
+per second (Little's law: rate x busy time per request); the last column
+is how many of the ``python`` mode's workers each mode frees.
+
+Usage:
+    python -m benchmarks.media_serving [--workers 16] [--requests 400]
+        [--client-mbps 8] [--rate 200]
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(MEDIA_ROOT="", MEDIA_SERVING={})
+    django.setup()
+
+from django.test import RequestFactory, override_settings  # noqa: E402
+
+from theatre.media import serve_media  # noqa: E402
+
+# Typical sizes of the rendered variants (see theatre/images.py).
+IMAGES = {
+    "thumb.jpg": 12 * 1024,
+    "card.jpg": 70 * 1024,
+    "full.jpg": 420 * 1024,
+}
+# thumb-heavy mix, as in play and performance lists.
+WEIGHTS = (6, 3, 1)
+
+
+def sink_python(response, devnull):
+    for chunk in response.streaming_content:
+        os.write(devnull, chunk)
+
+
+def sink_sendfile(response, devnull):
+    source = response.file_to_stream
+    offset, remaining = source.tell(), int(response["Content-Length"])
+    while remaining:
+        sent = os.sendfile(devnull, source.fileno(), offset, remaining)
+        offset += sent
+        remaining -= sent
+
+
+def sink_offload(response, devnull):
+    assert response["X-Accel-Redirect"]
+
+
+MODES = {
+    "python": ({}, sink_python),
+    "sendfile": ({}, sink_sendfile),
+    "offload": ({"OFFLOAD": "x-accel-redirect"}, sink_offload),
+}
+
+
+def run(mode, root, paths, workers, bandwidth, send_buffer):
+    media_serving, sink = MODES[mode]
+    factory = RequestFactory()
+    busy = []
+    cpu = []
+    lock = threading.Lock()
+
+    def serve(path):
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        started = time.perf_counter()
+        cpu_started = time.thread_time()
+        response = serve_media(factory.get(f"/media/{path}"), path, root)
+        sink(response, devnull)
+        response.close()
+        cpu_used = time.thread_time() - cpu_started
+        if mode != "offload":
+            # Blocked on the client until the rest fits in the send buffer.
+            time.sleep(max(0, IMAGES[path] - send_buffer) / bandwidth)
+        elapsed = time.perf_counter() - started
+        os.close(devnull)
+        with lock:
+            busy.append(elapsed)
+            cpu.append(cpu_used)
+
+    with override_settings(MEDIA_SERVING=media_serving):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(serve, paths))
+        elapsed = time.perf_counter() - started
+    return (
+        len(paths) / elapsed,
+        sum(busy) / len(busy),
+        sum(cpu) / len(cpu),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument(
+        "--client-mbps",
+        type=float,
+        default=8,
+        help="Client link speed in Mbit/s.",
+    )
+    parser.add_argument(
+        "--send-buffer",
+        type=int,
+        default=64,
+        help="Socket send buffer in KiB.",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=200,
+        help="Image requests per second to size the worker pool for.",
+    )
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp()
+    try:
+        generator = random.Random(0)
+        for name, size in IMAGES.items():
+            with open(os.path.join(root, name), "wb") as fileobj:
+                fileobj.write(generator.randbytes(size))
+        paths = generator.choices(
+            list(IMAGES), weights=WEIGHTS, k=args.requests
+        )
+
+        print(
+            f"{'mode':<10} {'req/s':>8} {'busy ms':>9} {'cpu ms':>8} "
+            f"{'workers':>8} {'freed':>6}"
+        )
+        baseline = None
+        for mode in MODES:
+            rate, busy, cpu = run(
+                mode,
+                root,
+                paths,
+                args.workers,
+                args.client_mbps * 1e6 / 8,
+                args.send_buffer * 1024,
+            )
+            needed = args.rate * busy
+            baseline = baseline or needed
+            print(
+                f"{mode:<10} {rate:>8.0f} {busy * 1000:>9.2f} "
+                f"{cpu * 1000:>8.3f} {needed:>8.1f} "
+                f"{baseline - needed:>6.1f}"
+            )
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
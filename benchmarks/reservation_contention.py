@@ -0,0 +1,482 @@
+"""
+Reservation contention under load.
+
+Many clients fight over the last free seats of a show through the WSGI
+application in process, on a pool of worker threads with one database
+connection each. Every client reads the seat map, picks free seats and
+posts a reservation. It picks again after a conflict, waits in the
+admission queue when told to (``Queue-Ticket``) and gives up once the show
+is sold out. Scenarios:
+
+- ``sellout``: every client wants one of the last ``--seats`` seats.
+- ``groups``: clients book 2 to 6 adjacent seats.
+- ``mixed``: clients browse the catalog, and ``--buyers`` of them buy.
+- ``refresh``: every access token has just expired, so each client gets
+  a 401, refreshes its token and books with the new one.
+
+Each scenario gets a fresh show. The report shows throughput, latency
+percentiles per request kind, the conflict rate and an oversell check:
+no seat sold twice, none outside the hall, no more than were free, and
+exactly as many as clients were told they got. The exit status is 1 when
+a check fails.
+
+The run uses a throwaway test database of the configured backend, so no
+existing data is touched, e.g. ``DATABASE_BACKEND=sqlite`` or a local
+PostgreSQL server (the user needs CREATEDB).
+
+Usage:
+    python -m benchmarks.reservation_contention [--clients 500] [--seats 50]
+        [--concurrency 50] [--scenario sellout]
+"""
+import argparse
+import json
+import os
+import queue
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from datetime import timedelta
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "Theatre_API.settings")
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.contrib.auth.hashers import make_password  # noqa: E402
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+from django.db import connections  # noqa: E402
+from django.db.models import Count  # noqa: E402
+from django.test import RequestFactory, override_settings  # noqa: E402
+from django.test.utils import (  # noqa: E402
+    setup_databases,
+    teardown_databases,
+)
+from django.utils import timezone  # noqa: E402
+from rest_framework_simplejwt.tokens import RefreshToken  # noqa: E402
+
+from theatre.models import (  # noqa: E402
+    Performance,
+    Play,
+    Reservation,
+    TheatreHall,
+    Ticket,
+)
+
+BENCH_SETTINGS = {
+    "DEBUG": False,
+    "ALLOWED_HOSTS": ["*"],
+    # Throttle history lives in the cache; a dummy cache never throttles.
+    "CACHES": {
+        "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+    },
+}
+
+SEATS_IN_ROW = 25
+MIN_ROWS = 20
+RESERVATIONS_URL = "/api/theatre/reservations/"
+REFRESH_URL = "/api/user/token/refresh/"
+BROWSE_URLS = (
+    "/api/theatre/genres/",
+    "/api/theatre/plays/",
+    "/api/theatre/performances/",
+)
+
+
+def percentile(values, fraction):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Stats:
+    """Latencies and outcomes shared by all clients of a scenario."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = Counter()
+        self.outcomes = Counter()
+        self.events = Counter()
+        self.tickets = 0
+
+    def record(self, kind, status, seconds):
+        with self.lock:
+            self.latencies[kind].append(seconds)
+            self.statuses[status] += 1
+
+    def count(self, event):
+        with self.lock:
+            self.events[event] += 1
+
+    def finish(self, outcome, tickets=0):
+        with self.lock:
+            self.outcomes[outcome] += 1
+            self.tickets += tickets
+
+
+@dataclass
+class Show:
+    performance_id: int
+    rows: int
+    seats_in_row: int
+    presold: int
+    free: int
+
+    @property
+    def url(self):
+        return f"/api/theatre/performances/{self.performance_id}/"
+
+
+class Client:
+    """One simulated user with its own JWT pair."""
+
+    factory = RequestFactory()
+
+    def __init__(self, application, stats, user, rng, expired=False):
+        self.application = application
+        self.stats = stats
+        self.rng = rng
+        refresh = RefreshToken.for_user(user)
+        access = refresh.access_token
+        if expired:
+            access.set_exp(lifetime=timedelta(seconds=-1))
+        self.refresh = str(refresh)
+        self.access = str(access)
+
+    def call(self, kind, method, path, data=None, headers=None, auth=True):
+        headers = dict(headers or {})
+        if auth:
+            headers["Authorization"] = f"Bearer {self.access}"
+        body = "" if data is None else json.dumps(data)
+        environ = self.factory.generic(
+            method, path, body, "application/json", headers=headers
+        ).environ
+        statuses = []
+        started = time.perf_counter()
+        response = self.application(
+            environ, lambda status, response_headers: statuses.append(status)
+        )
+        content = b"".join(response)
+        response.close()
+        status = int(statuses[0][:3])
+        self.stats.record(kind, status, time.perf_counter() - started)
+        try:
+            return status, json.loads(content)
+        except ValueError:
+            return status, None
+
+    def authorized(self, kind, method, path, data=None, headers=None):
+        """`call`, refreshing the access token once if it was rejected."""
+        status, body = self.call(kind, method, path, data, headers)
+        if status == 401:
+            self.stats.count("expired")
+            refreshed, tokens = self.call(
+                "refresh", "POST", REFRESH_URL, {"refresh": self.refresh},
+                auth=False,
+            )
+            if refreshed == 200:
+                self.access = tokens["access"]
+                status, body = self.call(kind, method, path, data, headers)
+        return status, body
+
+    def book(self, show, seats):
+        """POST a reservation, waiting in the admission queue as told to."""
+        data = {
+            "tickets": [
+                {"performance": show.performance_id, "row": row, "seat": seat}
+                for row, seat in seats
+            ]
+        }
+        headers = {}
+        while True:
+            status, body = self.authorized(
+                "book", "POST", RESERVATIONS_URL, data, headers
+            )
+            if status != 503 or not body or "queue_ticket" not in body:
+                return status
+            self.stats.count("queued")
+            headers = {"Queue-Ticket": body["queue_ticket"]}
+            time.sleep(self.rng.uniform(0.5, 1))
+
+
+def free_blocks(show, taken_places, size):
+    """Every run of `size` adjacent free seats, as lists of (row, seat)."""
+    taken = {(place["row"], place["seat"]) for place in taken_places}
+    blocks = []
+    for row in range(1, show.rows + 1):
+        for first in range(1, show.seats_in_row - size + 2):
+            block = [(row, seat) for seat in range(first, first + size)]
+            if not taken.intersection(block):
+                blocks.append(block)
+    return blocks
+
+
+def buy(client, show, size, attempts):
+    for _ in range(attempts):
+        status, body = client.authorized("seat-map", "GET", show.url)
+        if status != 200:
+            client.stats.finish("error")
+            return
+        blocks = free_blocks(show, body["taken_places"], size)
+        if not blocks:
+            client.stats.finish("sold out")
+            return
+        status = client.book(show, client.rng.choice(blocks))
+        if status == 201:
+            client.stats.finish("booked", tickets=size)
+            return
+        if status not in (400, 409):
+            client.stats.finish("error")
+            return
+        client.stats.count("conflict")
+    client.stats.finish("gave up")
+
+
+def sellout(client, show, options):
+    buy(client, show, 1, options.attempts)
+
+
+def groups(client, show, options):
+    buy(client, show, client.rng.randint(2, 6), options.attempts)
+
+
+def mixed(client, show, options):
+    for _ in range(options.browse):
+        path = client.rng.choice(BROWSE_URLS + (show.url,))
+        client.authorized("browse", "GET", path)
+    if client.rng.random() < options.buyers:
+        buy(client, show, 1, options.attempts)
+    else:
+        client.stats.finish("browsed")
+
+
+def refresh(client, show, options):
+    buy(client, show, 1, options.attempts)
+
+
+SCENARIOS = {
+    "sellout": sellout,
+    "groups": groups,
+    "mixed": mixed,
+    "refresh": refresh,
+}
+
+
+def create_show(name, free):
+    rows = max(MIN_ROWS, -(-free // SEATS_IN_ROW))
+    capacity = rows * SEATS_IN_ROW
+    hall = TheatreHall.objects.create(
+        name=f"Contention {name}", rows=rows, seats_in_row=SEATS_IN_ROW
+    )
+    play = Play.objects.create(
+        title=f"Contention {name}", description="Load test show."
+    )
+    performance = Performance.objects.create(
+        play=play,
+        theatre_hall=hall,
+        show_time=timezone.now() + timedelta(days=30),
+    )
+    box_office, _ = get_user_model().objects.get_or_create(
+        email="box-office@benchmark.test"
+    )
+    reservation = Reservation.objects.create(user=box_office)
+    presold = capacity - free
+    Ticket.objects.bulk_create(
+        Ticket(
+            performance=performance,
+            reservation=reservation,
+            row=index // SEATS_IN_ROW + 1,
+            seat=index % SEATS_IN_ROW + 1,
+        )
+        for index in range(presold)
+    )
+    return Show(performance.id, rows, SEATS_IN_ROW, presold, free)
+
+
+def create_users(count):
+    model = get_user_model()
+    password = make_password(None)
+    model.objects.bulk_create(
+        model(email=f"client{index}@benchmark.test", password=password)
+        for index in range(count)
+    )
+    return list(
+        model.objects.filter(email__startswith="client").order_by("id")
+    )
+
+
+def run(name, users, options):
+    show = create_show(name, options.seats)
+    stats = Stats()
+    application = get_wsgi_application()
+    clients = queue.SimpleQueue()
+    for index, user in enumerate(users):
+        rng = random.Random(f"{options.seed}-{name}-{index}")
+        clients.put(
+            Client(application, stats, user, rng, expired=name == "refresh")
+        )
+
+    def worker():
+        try:
+            while True:
+                try:
+                    client = clients.get_nowait()
+                except queue.Empty:
+                    return
+                SCENARIOS[name](client, show, options)
+        finally:
+            connections.close_all()
+
+    threads = [
+        threading.Thread(target=worker) for _ in range(options.concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return show, stats, time.perf_counter() - started
+
+
+def check(show, stats):
+    """Sold seats and the oversell problems found for `show`."""
+    tickets = Ticket.objects.filter(performance_id=show.performance_id)
+    sold = tickets.count() - show.presold
+    duplicates = (
+        tickets.values("row", "seat")
+        .annotate(copies=Count("id"))
+        .filter(copies__gt=1)
+        .count()
+    )
+    outside = tickets.exclude(
+        row__range=(1, show.rows), seat__range=(1, show.seats_in_row)
+    ).count()
+    problems = []
+    if sold > show.free:
+        problems.append(f"{sold - show.free} seats oversold")
+    if duplicates:
+        problems.append(f"{duplicates} seats sold twice")
+    if outside:
+        problems.append(f"{outside} seats outside the hall")
+    if sold != stats.tickets:
+        problems.append(
+            f"{sold} seats sold but clients were told {stats.tickets}"
+        )
+    return sold, problems
+
+
+def report(name, show, stats, wall, sold, problems):
+    requests = sum(stats.statuses.values())
+    attempts = stats.events["conflict"] + stats.outcomes["booked"]
+    conflict_rate = stats.events["conflict"] / attempts if attempts else 0
+    server_errors = sum(
+        count for status, count in stats.statuses.items() if status >= 500
+    )
+    print(
+        f"{name}: {sum(stats.outcomes.values())} clients, {show.free} free "
+        f"seats, {requests} requests in {wall:.1f} s "
+        f"({requests / wall:.0f} req/s)"
+    )
+    print(
+        f"  {'request':<10} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} "
+        f"{'p99 ms':>8}"
+    )
+    everything = []
+    for kind, latencies in sorted(stats.latencies.items()):
+        everything += latencies
+        ms = [value * 1000 for value in latencies]
+        print(
+            f"  {kind:<10} {len(ms):>6} {percentile(ms, 0.5):>8.1f} "
+            f"{percentile(ms, 0.95):>8.1f} {percentile(ms, 0.99):>8.1f}"
+        )
+    ms = [value * 1000 for value in everything]
+    print(
+        f"  {'all':<10} {len(ms):>6} {percentile(ms, 0.5):>8.1f} "
+        f"{percentile(ms, 0.95):>8.1f} {percentile(ms, 0.99):>8.1f}"
+    )
+    print(
+        "  clients: "
+        + ", ".join(
+            f"{count} {outcome}"
+            for outcome, count in sorted(stats.outcomes.items())
+        )
+    )
+    print(
+        f"  bookings: {attempts} attempts, {stats.events['conflict']} "
+        f"conflicts ({conflict_rate:.1%}), {stats.events['queued']} queued, "
+        f"{stats.events['expired']} expired tokens, {server_errors} "
+        f"server errors"
+    )
+    print(
+        f"  seats: {sold} of {show.free} sold: "
+        + ("; ".join(problems) if problems else "no oversell")
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--scenario",
+        choices=SCENARIOS,
+        action="append",
+        help="Scenario to run, repeatable; all of them by default.",
+    )
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--seats", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument(
+        "--attempts",
+        type=int,
+        default=5,
+        help="Seat picks per client before it gives up.",
+    )
+    parser.add_argument(
+        "--browse",
+        type=int,
+        default=5,
+        help="Catalog reads per client in the mixed scenario.",
+    )
+    parser.add_argument(
+        "--buyers",
+        type=float,
+        default=0.2,
+        help="Share of clients who buy in the mixed scenario.",
+    )
+    parser.add_argument(
+        "--no-admission-queue",
+        action="store_true",
+        help="Book without the waiting room.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    bench_settings = dict(BENCH_SETTINGS)
+    if args.no_admission_queue:
+        bench_settings["ADMISSION_QUEUE"] = {"ENABLED": False}
+
+    old_config = setup_databases(
+        verbosity=0, interactive=False, serialized_aliases=set()
+    )
+    failed = False
+    try:
+        with override_settings(**bench_settings):
+            print(f"database: {connections['default'].vendor}")
+            users = create_users(args.clients)
+            for name in args.scenario or SCENARIOS:
+                show, stats, wall = run(name, users, args)
+                sold, problems = check(show, stats)
+                report(name, show, stats, wall, sold, problems)
+                failed = failed or bool(problems)
+    finally:
+        connections.close_all()
+        teardown_databases(old_config, verbosity=0)
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,9 @@ from .models import (
     Performance,
     Reservation,
     Ticket,
+    IdempotencyKey,
+    ArchivedPerformance,
+    ArchivedTicket,
 )
 
 # Register your models here.
@@ -18,3 +21,6 @@ admin.site.register(TheatreHall),
 admin.site.register(Performance),
 admin.site.register(Reservation),
 admin.site.register(Ticket)
+admin.site.register(IdempotencyKey)
+admin.site.register(ArchivedPerformance)
+admin.site.register(ArchivedTicket)
@@ -0,0 +1,272 @@
+"""
+Virtual waiting room for reservation creation.
+
+Every booking request for a performance takes a queue ticket and waits
+until it reaches the head of the queue and one of a bounded number of
+booking slots is free. Requests that time out get their ticket and position
+back and may present the ticket again (``Queue-Ticket`` header) within
+``TICKET_TTL`` seconds. A parked ticket keeps its place in the line, but
+live waiters behind it are admitted while its holder is away. Tickets are
+random, belong to the user they were issued to and only resume a place in
+the line: a ticket that has been admitted cannot be presented again.
+
+A request hands its database connections back before it starts waiting,
+so queued requests do not hold one each; ``MAX_CONCURRENT_BOOKERS``
+should not exceed the connection pool.
+
+The queue state lives in a store configured through
+``settings.ADMISSION_QUEUE["STORE"]``; the default keeps it in process.
+"""
+import itertools
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connections
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+DEFAULTS = {
+    "ENABLED": True,
+    "STORE": "theatre.admission.LocalAdmissionStore",
+    "MAX_CONCURRENT_BOOKERS": 10,
+    "MAX_WAIT": 5.0,
+    "TICKET_TTL": 30.0,
+}
+
+
+def get_setting(name):
+    return getattr(settings, "ADMISSION_QUEUE", {}).get(name, DEFAULTS[name])
+
+
+@dataclass
+class Admission:
+    key: str
+    ticket: str
+    admitted: bool
+    position: int
+
+    @property
+    def token(self):
+        return f"{self.key}-{self.ticket}"
+
+
+class BaseAdmissionStore:
+    """Interface every admission queue store has to implement."""
+
+    def acquire(
+        self, key, limit, timeout, ticket=None, owner=None, before_wait=None
+    ):
+        """
+        Wait up to `timeout` seconds for a booking slot for `key`.
+
+        `ticket` resumes a ticket previously issued to `owner` if it is
+        still queued; any other ticket is ignored and a new one issued.
+        `before_wait` is called, without holding any lock, before the
+        request starts waiting. Returns an Admission; when `admitted`
+        is False the ticket stays queued and `position` is the number of
+        requests ahead of it.
+        """
+        raise NotImplementedError
+
+    def release(self, key, ticket):
+        """Free the slot (or queue place) held by `ticket`."""
+        raise NotImplementedError
+
+
+class _Queue:
+    def __init__(self):
+        self.waiting = OrderedDict()
+        self.owners = {}
+        self.active = set()
+
+
+class LocalAdmissionStore(BaseAdmissionStore):
+    """
+    In-process store guarded by a condition variable.
+
+    It bounds concurrency per worker process and needs no outside
+    services, which also makes it the store used in tests.
+    """
+
+    poll_interval = 0.25
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._queues = {}
+
+    def reset(self):
+        with self._condition:
+            self._queues.clear()
+            self._condition.notify_all()
+
+    def _queue(self, key):
+        return self._queues.setdefault(key, _Queue())
+
+    def _purge_expired(self, queue, now):
+        expired = [
+            ticket
+            for ticket, expires_at in queue.waiting.items()
+            if expires_at is not None and expires_at <= now
+        ]
+        for ticket in expired:
+            del queue.waiting[ticket]
+            del queue.owners[ticket]
+
+    def _head(self, queue):
+        """The first live waiter, skipping parked (expiring) tickets."""
+        return next(
+            (
+                ticket
+                for ticket, expires_at in queue.waiting.items()
+                if expires_at is None
+            ),
+            None,
+        )
+
+    def _position(self, queue, ticket):
+        ahead = itertools.takewhile(lambda t: t != ticket, queue.waiting)
+        return sum(1 for _ in ahead)
+
+    def _try_admit(self, queue, ticket, limit):
+        self._purge_expired(queue, time.monotonic())
+        if self._head(queue) == ticket and len(queue.active) < limit:
+            del queue.waiting[ticket]
+            del queue.owners[ticket]
+            queue.active.add(ticket)
+            self._condition.notify_all()
+            return True
+        return False
+
+    def acquire(
+        self, key, limit, timeout, ticket=None, owner=None, before_wait=None
+    ):
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            queue = self._queue(key)
+            if ticket not in queue.waiting or queue.owners[ticket] != owner:
+                ticket = secrets.token_hex(16)
+                queue.owners[ticket] = owner
+            queue.waiting[ticket] = None
+            if self._try_admit(queue, ticket, limit):
+                return Admission(key, ticket, True, 0)
+
+        if before_wait is not None and timeout > 0:
+            before_wait()
+
+        with self._condition:
+            queue = self._queue(key)
+            while not self._try_admit(queue, ticket, limit):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    queue.waiting[ticket] = (
+                        time.monotonic() + get_setting("TICKET_TTL")
+                    )
+                    self._condition.notify_all()
+                    return Admission(
+                        key, ticket, False, self._position(queue, ticket)
+                    )
+                # Wake up periodically so expired tickets are purged even
+                # if nobody releases a slot.
+                self._condition.wait(min(remaining, self.poll_interval))
+            return Admission(key, ticket, True, 0)
+
+    def release(self, key, ticket):
+        with self._condition:
+            queue = self._queues.get(key)
+            if queue is None:
+                return
+            queue.active.discard(ticket)
+            queue.waiting.pop(ticket, None)
+            queue.owners.pop(ticket, None)
+            if not queue.active and not queue.waiting:
+                del self._queues[key]
+            self._condition.notify_all()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = import_string(get_setting("STORE"))()
+        return _store
+
+
+@receiver(setting_changed)
+def reset_store(*, setting, **kwargs):
+    global _store
+    if setting == "ADMISSION_QUEUE":
+        with _store_lock:
+            _store = None
+
+
+def parse_token(token):
+    """Split a ``Queue-Ticket`` header value into (key, ticket)."""
+    key, _, ticket = (token or "").rpartition("-")
+    if not key or not ticket:
+        return None, None
+    return key, ticket
+
+
+def release_connections():
+    """
+    Hand this thread's database connections back, to the pool if there is
+    one, before waiting in the queue. Connections inside a transaction
+    have to stay open.
+    """
+    for connection in connections.all(initialized_only=True):
+        if not connection.in_atomic_block:
+            connection.close()
+
+
+class AdmissionGate:
+    """
+    Context manager admitting a request for several performances.
+
+    Performances are queued for in ascending id order so two requests never
+    hold slots the other one is waiting for.
+    """
+
+    def __init__(self, performance_ids, token=None, owner=None):
+        self.keys = [f"performance:{pk}" for pk in sorted(performance_ids)]
+        self.resume_key, self.resume_ticket = parse_token(token)
+        self.owner = owner
+        self.held = []
+        self.blocked = None
+
+    def __enter__(self):
+        store = get_store()
+        limit = get_setting("MAX_CONCURRENT_BOOKERS")
+        timeout = get_setting("MAX_WAIT")
+        for key in self.keys:
+            ticket = self.resume_ticket if key == self.resume_key else None
+            admission = store.acquire(
+                key,
+                limit,
+                timeout,
+                ticket=ticket,
+                owner=self.owner,
+                before_wait=release_connections,
+            )
+            if not admission.admitted:
+                self.blocked = admission
+                self._release_held(store)
+                break
+            self.held.append(admission)
+        return self
+
+    def _release_held(self, store):
+        for admission in self.held:
+            store.release(admission.key, admission.ticket)
+        self.held = []
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._release_held(get_store())
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class TheatreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "theatre"
+
+    def ready(self):
+        from theatre import querylog, signals  # noqa: F401
+        from theatre.timing import install_serializer_timer
+
+        install_serializer_timer()
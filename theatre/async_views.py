@@ -0,0 +1,230 @@
+"""Async views served by the ASGI application."""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from theatre.events import get_broker, performance_channel
+from theatre.models import Performance, Ticket
+from theatre.views import (
+    GenreViewSet,
+    ActorViewSet,
+    PlayViewSet,
+    PerformanceViewSet,
+)
+
+HEARTBEAT_INTERVAL = 15
+
+
+def error_response(detail, status_code):
+    return JsonResponse({"detail": detail}, status=status_code)
+
+
+async def authenticate(request):
+    """Authenticate a plain Django request with the API's JWT scheme."""
+    try:
+        result = await sync_to_async(JWTAuthentication().authenticate)(
+            request
+        )
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def taken_seats(performance_id):
+    return [
+        {"row": row, "seat": seat}
+        async for row, seat in Ticket.objects.filter(
+            performance_id=performance_id
+        ).values_list("row", "seat")
+    ]
+
+
+async def seat_event_stream(performance_id, heartbeat=HEARTBEAT_INTERVAL):
+    async with get_broker().subscribe(
+        performance_channel(performance_id)
+    ) as subscription:
+        # Subscribe before taking the snapshot so no delta falls between.
+        yield format_event(
+            "snapshot",
+            {
+                "performance": performance_id,
+                "taken": await taken_seats(performance_id),
+            },
+        )
+        while True:
+            try:
+                message = await asyncio.wait_for(
+                    subscription.get(), heartbeat
+                )
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if subscription.overflowed:
+                subscription.overflowed = False
+                yield format_event(
+                    "snapshot",
+                    {
+                        "performance": performance_id,
+                        "taken": await taken_seats(performance_id),
+                    },
+                )
+                continue
+            yield format_event(message["event"], message)
+
+
+async def performance_seat_events(request, pk):
+    """
+    Server-Sent Events stream of seat-taken / seat-released deltas for a
+    performance, starting with a snapshot of the taken seats.
+    """
+    if request.method != "GET":
+        return error_response(
+            "Method not allowed.", status.HTTP_405_METHOD_NOT_ALLOWED
+        )
+    if not isinstance(request, ASGIRequest):
+        return error_response(
+            "Seat events are only available under ASGI.",
+            status.HTTP_501_NOT_IMPLEMENTED,
+        )
+    if await authenticate(request) is None:
+        return error_response(
+            "Authentication credentials were not provided.",
+            status.HTTP_401_UNAUTHORIZED,
+        )
+    if not await Performance.objects.filter(pk=pk).aexists():
+        return error_response("Not found.", status.HTTP_404_NOT_FOUND)
+
+    return StreamingHttpResponse(
+        seat_event_stream(pk),
+        content_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def prepare_view(request, viewset_class, action, **kwargs):
+    """
+    Authenticate and throttle `request`, then return a viewset instance
+    set up for `action` whose queryset and serializer the async views reuse.
+    Returns (view, None) or (None, error response).
+    """
+    if request.method != "GET":
+        return None, error_response(
+            "Method not allowed.", status.HTTP_405_METHOD_NOT_ALLOWED
+        )
+    user = await authenticate(request)
+    if user is None:
+        return None, error_response(
+            "Authentication credentials were not provided.",
+            status.HTTP_401_UNAUTHORIZED,
+        )
+
+    drf_request = Request(request)
+    drf_request.user = user
+    view = viewset_class(
+        request=drf_request,
+        action=action,
+        args=(),
+        kwargs=kwargs,
+        format_kwarg=None,
+        headers={},
+    )
+    for throttle in view.get_throttles():
+        allowed = await sync_to_async(throttle.allow_request)(
+            drf_request, view
+        )
+        if not allowed:
+            return None, JsonResponse(
+                {"detail": "Request was throttled."},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+            )
+    return view, None
+
+
+def serialize(view, data, **kwargs):
+    """Serialize fully loaded objects; serializers never hit the DB here."""
+    serializer_class = view.get_serializer_class()
+    return serializer_class(
+        data, context=view.get_serializer_context(), **kwargs
+    ).data
+
+
+async def async_list(request, viewset_class):
+    view, error = await prepare_view(request, viewset_class, "list")
+    if error:
+        return error
+
+    queryset = view.get_queryset()
+    paginator = view.paginator
+    paginator.request = view.request
+    paginator.limit = paginator.get_limit(view.request)
+    paginator.offset = paginator.get_offset(view.request)
+    paginator.count = await queryset.acount()
+
+    page = [
+        obj
+        async for obj in queryset[
+            paginator.offset:paginator.offset + paginator.limit
+        ]
+    ]
+    response = paginator.get_paginated_response(
+        serialize(view, page, many=True)
+    )
+    return JsonResponse(response.data, encoder=JSONEncoder)
+
+
+async def async_retrieve(request, viewset_class, pk, prefetch=()):
+    view, error = await prepare_view(
+        request, viewset_class, "retrieve", pk=pk
+    )
+    if error:
+        return error
+
+    queryset = view.get_queryset().prefetch_related(*prefetch)
+    try:
+        instance = await queryset.aget(pk=pk)
+    except queryset.model.DoesNotExist:
+        return error_response("Not found.", status.HTTP_404_NOT_FOUND)
+    return JsonResponse(serialize(view, instance), encoder=JSONEncoder)
+
+
+async def genre_list(request):
+    return await async_list(request, GenreViewSet)
+
+
+async def actor_list(request):
+    return await async_list(request, ActorViewSet)
+
+
+async def play_list(request):
+    return await async_list(request, PlayViewSet)
+
+
+async def play_detail(request, pk):
+    return await async_retrieve(request, PlayViewSet, pk)
+
+
+async def performance_list(request):
+    return await async_list(request, PerformanceViewSet)
+
+
+async def performance_detail(request, pk):
+    # Nested play tags and taken places are serialized from relations,
+    # so they are loaded up front instead of inside the serializer.
+    return await async_retrieve(
+        request,
+        PerformanceViewSet,
+        pk,
+        prefetch=("play__genres", "play__actors", "tickets"),
+    )
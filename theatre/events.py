@@ -0,0 +1,134 @@
+"""
+Seat availability events.
+
+Ticket writes publish ``seat-taken`` / ``seat-released`` deltas after their
+transaction commits; the async SSE view subscribes to them per performance.
+The broker is configured through ``settings.SEAT_EVENTS_BROKER``. The
+default LocalBroker only fans out within one process, so multi-process
+deployments should plug in a broker backed by shared infrastructure
+implementing the same two methods.
+"""
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+SEAT_TAKEN = "seat-taken"
+SEAT_RELEASED = "seat-released"
+
+
+def performance_channel(performance_id):
+    return f"performance:{performance_id}"
+
+
+class BaseBroker:
+    def publish(self, channel, message):
+        """Deliver `message` to every current subscriber of `channel`."""
+        raise NotImplementedError
+
+    def subscribe(self, channel):
+        """
+        Async context manager yielding a Subscription whose `get()`
+        coroutine returns the next message.
+        """
+        raise NotImplementedError
+
+
+class Subscription:
+    max_pending = 1000
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(self.max_pending)
+        # Set when messages were dropped; the consumer should resync.
+        self.overflowed = False
+
+    def _put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    def deliver(self, message):
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class LocalBroker(BaseBroker):
+    """In-process fan-out, safe to publish to from any thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.deliver(message)
+            except RuntimeError:
+                # The subscriber's event loop has already been closed.
+                continue
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        subscription = Subscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.setdefault(channel, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            with self._lock:
+                subscribers = self._subscriptions.get(channel, set())
+                subscribers.discard(subscription)
+                if not subscribers:
+                    self._subscriptions.pop(channel, None)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(
+                getattr(
+                    settings,
+                    "SEAT_EVENTS_BROKER",
+                    "theatre.events.LocalBroker",
+                )
+            )()
+        return _broker
+
+
+@receiver(setting_changed)
+def reset_broker(*, setting, **kwargs):
+    global _broker
+    if setting == "SEAT_EVENTS_BROKER":
+        with _broker_lock:
+            _broker = None
+
+
+def publish_seats(event, performance_id, seats, using=None):
+    """Publish a seat delta once the current transaction commits."""
+    message = {
+        "event": event,
+        "performance": performance_id,
+        "seats": [{"row": row, "seat": seat} for row, seat in seats],
+    }
+    transaction.on_commit(
+        lambda: get_broker().publish(
+            performance_channel(performance_id), message
+        ),
+        using=using,
+    )
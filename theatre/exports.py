@@ -0,0 +1,150 @@
+"""
+Streaming ticket sales export.
+
+Rows are read with ``QuerySet.iterator(chunk_size=...)``, which uses a
+server-side cursor on PostgreSQL, and rendered lazily in blocks. Exporting
+any number of tickets then takes constant memory, and the first bytes go
+out as soon as the first chunk is fetched.
+
+Tickets of performances moved to the archive by ``archive_performances``
+are exported after the current ones, so past sales stay complete. The two
+tables are read one after the other, each in primary key order, rather
+than as one sorted UNION that the database would have to sort in full
+before returning a row.
+
+Under ASGI, ``StreamingHttpResponse`` reads a sync iterator into a list
+before sending it; ``async_blocks`` hands the blocks over one at a time
+instead.
+"""
+import csv
+import itertools
+import json
+from datetime import datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from theatre.models import ArchivedTicket, Ticket
+
+CHUNK_SIZE = 2000
+
+# (column, lookup) pairs of an exported ticket row.
+COLUMNS = (
+    ("ticket", "id"),
+    ("row", "row"),
+    ("seat", "seat"),
+    ("performance", "performance_id"),
+    ("show_time", "performance__show_time"),
+    ("play", "performance__play__title"),
+    ("theatre_hall", "performance__theatre_hall__name"),
+    ("reservation", "reservation_id"),
+    ("reserved_at", "reservation__created_at"),
+    ("user", "reservation__user__email"),
+)
+HEADER = tuple(column for column, _ in COLUMNS)
+
+
+def filter_tickets(queryset, date_from=None, date_to=None, performance=None):
+    if date_from:
+        queryset = queryset.filter(
+            reservation__created_at__gte=timezone.make_aware(
+                datetime.combine(date_from, time())
+            )
+        )
+    if date_to:
+        queryset = queryset.filter(
+            reservation__created_at__lt=timezone.make_aware(
+                datetime.combine(date_to + timedelta(days=1), time())
+            )
+        )
+    if performance:
+        queryset = queryset.filter(performance_id=performance)
+    return queryset.order_by("id").values_list(
+        *(lookup for _, lookup in COLUMNS)
+    )
+
+
+def export_querysets(date_from=None, date_to=None, performance=None):
+    """
+    Current and archived ticket rows as tuples in HEADER order, optionally
+    only tickets sold between `date_from` and `date_to` (inclusive) or of
+    one performance. Archived tickets keep their original ids.
+    """
+    filters = {
+        "date_from": date_from,
+        "date_to": date_to,
+        "performance": performance,
+    }
+    return (
+        filter_tickets(Ticket.objects.all(), **filters),
+        filter_tickets(ArchivedTicket.objects.all(), **filters),
+    )
+
+
+class Echo:
+    """File-like object whose write() returns the line it was given."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(HEADER)
+    for row in rows:
+        yield writer.writerow(
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in row
+        )
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(HEADER, row)), cls=DjangoJSONEncoder) + "\n"
+
+
+RENDERERS = {
+    "csv": ("text/csv", csv_lines),
+    "ndjson": ("application/x-ndjson", ndjson_lines),
+}
+
+
+def stream_export(querysets, file_format, chunk_size=CHUNK_SIZE):
+    """
+    Yield the rows of `querysets`, one after the other, as text blocks of
+    up to `chunk_size` rows. The first line is sent on its own so clients
+    see the response start at once.
+    """
+    _, render = RENDERERS[file_format]
+    lines = render(
+        itertools.chain.from_iterable(
+            queryset.iterator(chunk_size=chunk_size) for queryset in querysets
+        )
+    )
+    for line in lines:
+        yield line
+        break
+    block = []
+    for line in lines:
+        block.append(line)
+        if len(block) >= chunk_size:
+            yield "".join(block)
+            block = []
+    if block:
+        yield "".join(block)
+
+
+async def async_blocks(blocks):
+    """
+    Iterate the sync `blocks` from async code, one block at a time. Each
+    block is produced in the request's sync thread, which owns the
+    database cursor.
+    """
+    produce = sync_to_async(next, thread_sensitive=True)
+    done = object()
+    try:
+        while (block := await produce(blocks, done)) is not done:
+            yield block
+    finally:
+        await sync_to_async(blocks.close, thread_sensitive=True)()
@@ -0,0 +1,49 @@
+from django.db import connections
+from django.db.utils import OperationalError
+
+
+def database_is_available(alias="default"):
+    """Open (or borrow from the pool) a connection and run a trivial query."""
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute("SELECT 1")
+    except OperationalError:
+        return False
+    return True
+
+
+def pool_stats(alias="default"):
+    """
+    Current psycopg_pool statistics for a database alias, or None when the
+    alias does not use a connection pool.
+    """
+    pool = getattr(connections[alias], "pool", None)
+    if pool is None:
+        return None
+
+    stats = pool.get_stats()
+    in_use = stats.get("pool_size", 0) - stats.get("pool_available", 0)
+    max_size = stats.get("pool_max") or pool.max_size
+    return {
+        "min_size": stats.get("pool_min", pool.min_size),
+        "max_size": max_size,
+        "size": stats.get("pool_size", 0),
+        "available": stats.get("pool_available", 0),
+        "in_use": in_use,
+        "waiting": stats.get("requests_waiting", 0),
+        "saturation": round(in_use / max_size, 3) if max_size else 0,
+        "requests_total": stats.get("requests_num", 0),
+        "requests_queued_total": stats.get("requests_queued", 0),
+        "requests_wait_ms_total": stats.get("requests_wait_ms", 0),
+        "requests_errors_total": stats.get("requests_errors", 0),
+        "connections_errors_total": stats.get("connections_errors", 0),
+    }
+
+
+def database_status(alias="default"):
+    available = database_is_available(alias)
+    return {
+        "available": available,
+        "vendor": connections[alias].vendor,
+        "pool": pool_stats(alias) if available else None,
+    }
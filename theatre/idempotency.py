@@ -0,0 +1,168 @@
+"""
+Idempotency-Key support for unsafe API requests.
+
+The first request with a key claims it by inserting an IdempotencyKey row
+in its own transaction; the unique (user, key) constraint makes concurrent
+duplicates fail that insert and wait for the original to store its
+response, which they then replay.
+"""
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction, IntegrityError
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+from theatre.models import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+DEFAULTS = {
+    "TTL": timedelta(hours=24),
+    "WAIT": 10.0,
+    "POLL_INTERVAL": 0.05,
+    # In-progress claims older than this belong to a crashed worker.
+    "ABANDONED_AFTER": timedelta(minutes=2),
+}
+
+
+def get_setting(name):
+    return getattr(settings, "IDEMPOTENCY", {}).get(name, DEFAULTS[name])
+
+
+def request_fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(
+        f"{request.method} {request.path} {body}".encode()
+    ).hexdigest()
+
+
+def _replay(record):
+    return Response(
+        record.response_body,
+        status=record.status_code,
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+def _wait_for_original(user, key):
+    deadline = time.monotonic() + get_setting("WAIT")
+    while True:
+        record = IdempotencyKey.objects.filter(user=user, key=key).first()
+        if record is None or record.is_complete:
+            return record
+        if time.monotonic() >= deadline:
+            return record
+        time.sleep(get_setting("POLL_INTERVAL"))
+
+
+def _is_stale(record, now):
+    abandoned = (
+        not record.is_complete
+        and record.created_at <= now - get_setting("ABANDONED_AFTER")
+    )
+    return record.expires_at <= now or abandoned
+
+
+def _claim(user, key, request_hash):
+    """
+    Return (record, claimed): a freshly inserted record if this request
+    owns the key, otherwise the record stored by the original request.
+    """
+    now = timezone.now()
+    record = IdempotencyKey.objects.filter(user=user, key=key).first()
+    if record is not None:
+        if not _is_stale(record, now):
+            return record, False
+        record.delete()
+
+    try:
+        with transaction.atomic():
+            record = IdempotencyKey.objects.create(
+                user=user,
+                key=key,
+                request_hash=request_hash,
+                expires_at=now + get_setting("TTL"),
+            )
+            return record, True
+    except IntegrityError:
+        return IdempotencyKey.objects.filter(user=user, key=key).first(), False
+
+
+def purge_expired_keys(batch_size=1000):
+    """
+    Delete expired keys in batches of `batch_size`, oldest first, and
+    return how many were deleted. Keys are otherwise only removed when
+    their owner reuses them.
+    """
+    expired = IdempotencyKey.objects.filter(expires_at__lte=timezone.now())
+    deleted = 0
+    while True:
+        ids = list(
+            expired.order_by("expires_at").values_list("id", flat=True)[
+                :batch_size
+            ]
+        )
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
+
+
+def idempotent_response(view, request, handler):
+    """
+    Run `handler` at most once per (user, Idempotency-Key).
+
+    Requests without the header are passed straight through. Final
+    responses (anything below 500) are stored and replayed; server errors
+    release the key so the client can retry.
+    """
+    key = request.headers.get(HEADER)
+    if not key:
+        return handler()
+    if len(key) > IdempotencyKey._meta.get_field("key").max_length:
+        return Response(
+            {"detail": f"{HEADER} is too long."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    request_hash = request_fingerprint(request)
+    record, claimed = _claim(request.user, key, request_hash)
+
+    if not claimed:
+        if record is not None and not record.is_complete:
+            record = _wait_for_original(request.user, key)
+        if record is None:
+            return idempotent_response(view, request, handler)
+        if record.request_hash != request_hash:
+            return Response(
+                {"detail": f"{HEADER} was already used for another request."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        if not record.is_complete:
+            return Response(
+                {"detail": f"A request with this {HEADER} is in progress."},
+                status=status.HTTP_409_CONFLICT,
+                headers={"Retry-After": "1"},
+            )
+        return _replay(record)
+
+    try:
+        response = handler()
+    except APIException as exc:
+        response = view.handle_exception(exc)
+    except Exception:
+        record.delete()
+        raise
+
+    if response.status_code >= 500:
+        record.delete()
+        return response
+
+    record.status_code = response.status_code
+    record.response_body = response.data
+    record.save(update_fields=["status_code", "response_body"])
+    return response
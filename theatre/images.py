@@ -0,0 +1,243 @@
+"""
+Precomputed Play image variants.
+
+An uploaded poster is resized into bounding boxes (VARIANTS) and
+recompressed as progressive JPEG and WebP. The files go through the
+image field's content-addressed storage, like the original, and are
+recorded in ``Play.image_variants``. Rendering runs after the upload
+commits on a thread pool sized by ``settings.PLAY_IMAGES["WORKERS"]``; with
+0 workers it runs inline. Until the variants exist, serializers fall back
+to the original.
+
+Variants are stored like originals, under their content hash in the
+directory the original was uploaded to.
+
+Replacing an image releases the old files once no play refers to them.
+Files written or saved again in the last ``RELEASE_MIN_AGE`` seconds are
+kept, since an upload that has not committed yet may have just been
+deduplicated onto them; ``collect_image_garbage`` sweeps anything left
+behind.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.signals import setting_changed
+from django.db import connection, transaction
+from django.db.models import Q, TextField
+from django.db.models.functions import Cast
+from django.dispatch import receiver
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from theatre.models import Play
+from theatre.storage import is_content_addressed
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "WORKERS": 2,
+    "MAX_UPLOAD_SIZE": 10 * 1024 * 1024,
+    "MAX_PIXELS": 40_000_000,
+    "RELEASE_MIN_AGE": 60.0,
+}
+
+# Bounding boxes (width, height); images are never upscaled.
+VARIANTS = {
+    "thumb": (160, 240),
+    "card": (480, 720),
+    "full": (1600, 2400),
+}
+# format: (Pillow format, file extension, save options)
+FORMATS = {
+    "jpeg": (
+        "JPEG",
+        ".jpg",
+        {"quality": 82, "optimize": True, "progressive": True},
+    ),
+    "webp": ("WEBP", ".webp", {"quality": 80, "method": 4}),
+}
+
+
+def get_setting(name):
+    return getattr(settings, "PLAY_IMAGES", {}).get(name, DEFAULTS[name])
+
+
+def image_storage():
+    return Play._meta.get_field("image").storage
+
+
+def variant_name(name, variant, image_format):
+    """
+    Name to save a variant of the image stored as `name` under. The
+    content-addressed storage only keeps its directory and extension.
+    """
+    directory, filename = os.path.split(name)
+    if is_content_addressed(name):
+        directory = os.path.dirname(directory)
+    root, _ = os.path.splitext(filename)
+    return os.path.join(
+        directory, f"{root}.{variant}{FORMATS[image_format][1]}"
+    )
+
+
+def _for_format(image, pil_format):
+    if pil_format == "JPEG":
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            return background
+        return image.convert("RGB") if image.mode != "RGB" else image
+    if image.mode not in ("RGB", "RGBA"):
+        return image.convert("RGBA" if "A" in image.getbands() else "RGB")
+    return image
+
+
+def render_variants(name, storage=None):
+    """
+    Write every variant of the image stored as `name` and return
+    {variant: {format: stored name}}.
+    """
+    storage = storage or image_storage()
+    with storage.open(name) as file:
+        with Image.open(file) as original:
+            original = ImageOps.exif_transpose(original)
+            original.load()
+
+    variants = {}
+    for variant, size in VARIANTS.items():
+        resized = original.copy()
+        resized.thumbnail(size, Image.Resampling.LANCZOS)
+        variants[variant] = {}
+        for image_format, (pil_format, _, options) in FORMATS.items():
+            buffer = BytesIO()
+            _for_format(resized, pil_format).save(
+                buffer, pil_format, **options
+            )
+            variants[variant][image_format] = storage.save(
+                variant_name(name, variant, image_format),
+                ContentFile(buffer.getvalue()),
+            )
+    return variants
+
+
+def process_play_image(play_id, name):
+    """Render the variants of a play's image and record them."""
+    try:
+        variants = render_variants(name)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        logger.exception("Could not render variants of %s", name)
+        return False
+    # Only keep them if the play still shows the image they came from.
+    return bool(
+        Play.objects.filter(pk=play_id, image=name).update(
+            image_variants=variants
+        )
+    )
+
+
+def run_in_worker(play_id, name):
+    try:
+        return process_play_image(play_id, name)
+    finally:
+        # Pool threads are long-lived; do not hold a connection between jobs.
+        connection.close()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=get_setting("WORKERS"),
+                thread_name_prefix="play-images",
+            )
+        return _executor
+
+
+@receiver(setting_changed)
+def reset_executor(*, setting, **kwargs):
+    global _executor
+    if setting == "PLAY_IMAGES":
+        with _executor_lock:
+            if _executor is not None:
+                _executor.shutdown(wait=True)
+            _executor = None
+
+
+def schedule_variants(play):
+    """Render the variants of `play.image` once the transaction commits."""
+    name = play.image.name
+    if not name:
+        return
+
+    def submit():
+        if get_setting("WORKERS") == 0:
+            process_play_image(play.pk, name)
+        else:
+            get_executor().submit(run_in_worker, play.pk, name)
+
+    transaction.on_commit(submit)
+
+
+def stored_files(image, variants):
+    """Names of the original and every variant of a play image."""
+    names = {image} if image else set()
+    for formats in (variants or {}).values():
+        names.update(formats.values())
+    return names
+
+
+def referenced_files(names):
+    """The subset of `names` still used by a play, in one query."""
+    query = Q(image__in=names)
+    for name in names:
+        query |= Q(variants_text__contains=name)
+    plays = (
+        Play.objects.annotate(
+            variants_text=Cast("image_variants", TextField())
+        )
+        .filter(query)
+        .values_list("image", "image_variants")
+    )
+    referenced = set()
+    for image, variants in plays:
+        referenced |= stored_files(image, variants)
+    return referenced & names
+
+
+def release_files(names):
+    """
+    Delete the files among `names` that no play refers to any more.
+    Identical uploads share files, so they are only released by the last
+    play using them, and not while an upload may be about to.
+    """
+    names = set(names)
+    if not names:
+        return
+    storage = image_storage()
+    cutoff = timezone.now() - timedelta(
+        seconds=get_setting("RELEASE_MIN_AGE")
+    )
+    for name in names - referenced_files(names):
+        storage.delete_if_unused_since(name, cutoff)
+
+
+def release_replaced_image(play):
+    """
+    Release the files of `play`'s current image after the transaction that
+    replaces it commits.
+    """
+    names = stored_files(play.image.name, play.image_variants)
+    if names:
+        transaction.on_commit(lambda: release_files(names))
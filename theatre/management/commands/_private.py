@@ -0,0 +1,86 @@
+"""Helpers shared by the bulk data management commands."""
+import time
+from itertools import islice
+
+from django.core.management.color import no_style
+from django.db import connection
+from django.db.models import Max
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def copy_supported():
+    return connection.vendor == "postgresql"
+
+
+def write_rows(model, fields, rows, use_copy=False):
+    """
+    Insert `rows` (tuples of values for the `fields` attnames) into the
+    table of `model` with PostgreSQL COPY, or with one bulk_create.
+    Signals, save() and model validation are skipped either way.
+    """
+    if use_copy:
+        opts = model._meta
+        columns = ", ".join(
+            connection.ops.quote_name(opts.get_field(name).column)
+            for name in fields
+        )
+        table = connection.ops.quote_name(opts.db_table)
+        with connection.cursor() as cursor:
+            # The underlying psycopg cursor streams rows over COPY.
+            with cursor.cursor.copy(
+                f"COPY {table} ({columns}) FROM STDIN"
+            ) as copy:
+                for row in rows:
+                    copy.write_row(row)
+        return
+    model.objects.bulk_create(
+        [model(**dict(zip(fields, row))) for row in rows]
+    )
+
+
+def next_id(model):
+    return (model.objects.aggregate(top=Max("pk"))["top"] or 0) + 1
+
+
+def reset_sequences(models):
+    """Move primary key sequences past rows inserted with explicit ids."""
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+class Progress:
+    """Counts rows and reports throughput through a command's stdout."""
+
+    def __init__(self, stdout, label, verbosity=1):
+        self.stdout = stdout
+        self.label = label
+        self.verbosity = verbosity
+        self.rows = 0
+        self.started = time.perf_counter()
+
+    @property
+    def rate(self):
+        elapsed = time.perf_counter() - self.started
+        return self.rows / elapsed if elapsed else 0.0
+
+    def advance(self, rows):
+        self.rows += rows
+        if self.verbosity >= 1:
+            self.stdout.write(
+                f"  {self.label}: {self.rows:,} rows "
+                f"({self.rate:,.0f} rows/s)"
+            )
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        return (
+            f"{self.label}: {self.rows:,} rows in {elapsed:.1f}s "
+            f"({self.rate:,.0f} rows/s)"
+        )
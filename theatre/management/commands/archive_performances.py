@@ -0,0 +1,120 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from theatre.models import (
+    ArchivedPerformance,
+    ArchivedTicket,
+    Performance,
+    Ticket,
+)
+
+
+class Command(BaseCommand):
+    """Django command to move past performances and their tickets
+    to the archive tables"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=30,
+            help="Archive performances that started more than N days ago.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="Performances moved per transaction.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many performances would be archived.",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        pending = Performance.objects.filter(show_time__lt=cutoff)
+
+        if options["dry_run"]:
+            self.stdout.write(
+                f"{pending.count()} performances before {cutoff:%Y-%m-%d} "
+                f"would be archived."
+            )
+            return
+
+        performances_total = tickets_total = 0
+        while True:
+            ids = list(
+                pending.order_by("id").values_list("id", flat=True)[
+                    : options["batch_size"]
+                ]
+            )
+            if not ids:
+                break
+            tickets_total += self.archive_batch(ids)
+            performances_total += len(ids)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Archived {performances_total} performances and "
+                f"{tickets_total} tickets."
+            )
+        )
+
+    @staticmethod
+    def archive_batch(ids, ticket_chunk_size=2000):
+        with transaction.atomic():
+            ArchivedPerformance.objects.bulk_create(
+                ArchivedPerformance(
+                    id=performance.id,
+                    show_time=performance.show_time,
+                    duration=performance.duration,
+                    play_id=performance.play_id,
+                    theatre_hall_id=performance.theatre_hall_id,
+                )
+                for performance in Performance.objects.filter(id__in=ids)
+            )
+
+            tickets = Ticket.objects.filter(performance_id__in=ids)
+            archived = 0
+            chunk = []
+            for values in tickets.values_list(
+                "id", "row", "seat", "performance_id", "reservation_id"
+            ).iterator(chunk_size=ticket_chunk_size):
+                chunk.append(
+                    ArchivedTicket(
+                        id=values[0],
+                        row=values[1],
+                        seat=values[2],
+                        performance_id=values[3],
+                        reservation_id=values[4],
+                    )
+                )
+                if len(chunk) == ticket_chunk_size:
+                    ArchivedTicket.objects.bulk_create(chunk)
+                    archived += len(chunk)
+                    chunk = []
+            ArchivedTicket.objects.bulk_create(chunk)
+            archived += len(chunk)
+
+            # Plain DELETEs rather than QuerySet.delete(): the collector would
+            # load every ticket into memory to send post_delete, which would
+            # announce the seats of past shows as released. Ticket is the
+            # only model referencing Performance, so no cascade is skipped.
+            placeholders = ", ".join(["%s"] * len(ids))
+            quote_name = connection.ops.quote_name
+            with connection.cursor() as cursor:
+                for model, column in (
+                    (Ticket, "performance_id"),
+                    (Performance, "id"),
+                ):
+                    cursor.execute(
+                        f"DELETE FROM {quote_name(model._meta.db_table)} "
+                        f"WHERE {quote_name(column)} IN ({placeholders})",
+                        ids,
+                    )
+        return archived
@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from theatre.images import image_storage, stored_files
+from theatre.models import Play
+
+IMAGE_DIRECTORY = "uploads/plays"
+
+
+def walk(storage, directory):
+    directories, files = storage.listdir(directory)
+    for name in files:
+        yield f"{directory}/{name}"
+    for subdirectory in directories:
+        yield from walk(storage, f"{directory}/{subdirectory}")
+
+
+class Command(BaseCommand):
+    """Django command to delete Play image files no play refers to"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=60,
+            help="Only delete files last written more than N minutes ago, "
+            "so uploads in flight are kept.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report what would be deleted.",
+        )
+
+    def handle(self, *args, **options):
+        storage = image_storage()
+        if not storage.exists(IMAGE_DIRECTORY):
+            self.stdout.write("No image files.")
+            return
+        referenced = set()
+        plays = Play.objects.values_list("image", "image_variants")
+        for image, variants in plays.iterator():
+            referenced |= stored_files(image, variants)
+
+        cutoff = timezone.now() - timedelta(minutes=options["min_age"])
+        orphans = {
+            name: storage.size(name)
+            for name in walk(storage, IMAGE_DIRECTORY)
+            if name not in referenced
+            and storage.get_modified_time(name) < cutoff
+        }
+        if options["dry_run"]:
+            self.stdout.write(
+                f"{len(orphans)} unreferenced files "
+                f"({sum(orphans.values())} bytes) would be deleted."
+            )
+            return
+        # Checked again under the storage lock: an upload may have been
+        # deduplicated onto an orphan since it was listed.
+        deleted = [
+            name
+            for name in orphans
+            if storage.delete_if_unused_since(name, cutoff)
+        ]
+        size = sum(orphans[name] for name in deleted)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Deleted {len(deleted)} unreferenced files ({size} bytes)."
+            )
+        )
@@ -0,0 +1,66 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from theatre.exports import (
+    CHUNK_SIZE,
+    RENDERERS,
+    export_querysets,
+    stream_export,
+)
+
+
+class Command(BaseCommand):
+    """
+    Django command to stream sold tickets with their performance, play,
+    hall and buyer as CSV or NDJSON in constant memory
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format",
+            dest="file_format",
+            choices=sorted(RENDERERS),
+            default="csv",
+        )
+        parser.add_argument(
+            "--date-from",
+            type=date.fromisoformat,
+            help="Only tickets sold on or after this day (YYYY-MM-DD).",
+        )
+        parser.add_argument(
+            "--date-to",
+            type=date.fromisoformat,
+            help="Only tickets sold on or before this day (YYYY-MM-DD).",
+        )
+        parser.add_argument(
+            "--performance",
+            type=int,
+            help="Only tickets of this performance.",
+        )
+        parser.add_argument(
+            "--output",
+            help="File to write to instead of stdout.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=CHUNK_SIZE,
+            help="Rows fetched per round trip.",
+        )
+
+    def handle(self, *args, **options):
+        querysets = export_querysets(
+            date_from=options["date_from"],
+            date_to=options["date_to"],
+            performance=options["performance"],
+        )
+        blocks = stream_export(
+            querysets, options["file_format"], options["chunk_size"]
+        )
+        if options["output"]:
+            with open(options["output"], "w", newline="") as file:
+                file.writelines(blocks)
+            return
+        for block in blocks:
+            self.stdout.write(block, ending="")
@@ -0,0 +1,395 @@
+import random
+from bisect import bisect
+from datetime import date, datetime, time, timedelta
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from theatre.management.commands._private import (
+    Progress,
+    batched,
+    copy_supported,
+    next_id,
+    reset_sequences,
+    write_rows,
+)
+from theatre.models import (
+    Actor,
+    Genre,
+    Performance,
+    Play,
+    Reservation,
+    TheatreHall,
+    Ticket,
+)
+
+GENRES = (
+    "Drama",
+    "Comedy",
+    "Tragedy",
+    "Musical",
+    "Opera",
+    "Ballet",
+    "Farce",
+    "Satire",
+    "Melodrama",
+    "Thriller",
+    "Puppetry",
+    "Improv",
+)
+FIRST_NAMES = (
+    "Anna", "Ben", "Clara", "David", "Eva", "Felix", "Greta", "Hugo",
+    "Iris", "Jonas", "Kira", "Leo", "Mila", "Nico", "Olga", "Paul",
+    "Rosa", "Sam", "Tara", "Victor",
+)
+LAST_NAMES = (
+    "Adams", "Bauer", "Costa", "Dubois", "Evans", "Fischer", "Garcia",
+    "Hansen", "Ivanova", "Jensen", "Kowalski", "Lopez", "Moreau",
+    "Novak", "Olsen", "Petrov", "Rossi", "Schmidt", "Tanaka", "Weber",
+)
+ADJECTIVES = (
+    "Silent", "Crimson", "Last", "Golden", "Broken", "Winter", "Hidden",
+    "Restless", "Paper", "Distant", "Little", "Burning", "Glass", "Wild",
+)
+NOUNS = (
+    "Garden", "Crown", "Letter", "Harbour", "Mirror", "Orchard", "Tower",
+    "Voyage", "Bargain", "Lantern", "Wedding", "Storm", "Masquerade",
+)
+DURATIONS = tuple(timedelta(minutes=minutes) for minutes in (90, 120, 150))
+# Group sizes of reservations and how often they occur.
+GROUP_SIZES = (1, 2, 3, 4, 5, 6)
+GROUP_WEIGHTS = (20, 45, 10, 15, 5, 5)
+
+
+class Command(BaseCommand):
+    """
+    Django command to generate a large synthetic dataset for benchmarks:
+    halls of varying sizes, plays with power-law cast sizes and Zipf
+    popularity, a run of daily performances and tickets that fill hot
+    shows while long-tail plays stay mostly empty. The same --seed and
+    --start produce the same data on an empty database.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--halls", type=int, default=20)
+        parser.add_argument("--actors", type=int, default=20000)
+        parser.add_argument("--plays", type=int, default=5000)
+        parser.add_argument("--users", type=int, default=20000)
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=365,
+            help="Days of performances from --start.",
+        )
+        parser.add_argument(
+            "--start",
+            type=date.fromisoformat,
+            default=None,
+            help="First performance day (YYYY-MM-DD), today by default.",
+        )
+        parser.add_argument(
+            "--shows-per-day",
+            type=int,
+            default=2,
+            choices=(1, 2, 3),
+            help="Performances per hall and day.",
+        )
+        parser.add_argument(
+            "--occupancy",
+            type=float,
+            default=0.35,
+            help="Mean share of seats sold.",
+        )
+        parser.add_argument(
+            "--skew",
+            type=float,
+            default=1.1,
+            help="Zipf exponent of play popularity; 0 is uniform.",
+        )
+        parser.add_argument("--batch-size", type=int, default=20000)
+        parser.add_argument(
+            "--no-copy",
+            action="store_true",
+            help="Use bulk_create even on PostgreSQL.",
+        )
+
+    def handle(self, *args, **options):
+        if not 0 < options["occupancy"] <= 1:
+            raise CommandError("--occupancy must be in (0, 1].")
+        self.options = options
+        self.rng = random.Random(options["seed"])
+        self.use_copy = copy_supported() and not options["no_copy"]
+        self.start = options["start"] or timezone.localdate()
+
+        halls = self.generate_halls()
+        genre_ids = self.generate_genres()
+        actor_ids = self.generate_actors()
+        popularity = self.generate_plays(actor_ids, genre_ids)
+        user_ids = self.generate_users()
+        performances = self.generate_performances(halls, popularity)
+        self.generate_tickets(performances, popularity, user_ids)
+
+        reset_sequences(
+            [
+                TheatreHall,
+                Genre,
+                Actor,
+                Play,
+                get_user_model(),
+                Performance,
+                Reservation,
+                Ticket,
+            ]
+        )
+
+    def write(self, label, model, fields, rows):
+        progress = Progress(self.stdout, label, self.options["verbosity"])
+        for batch in batched(rows, self.options["batch_size"]):
+            with transaction.atomic():
+                write_rows(model, fields, batch, use_copy=self.use_copy)
+            progress.advance(len(batch))
+        self.stdout.write(self.style.SUCCESS(progress.summary()))
+
+    def generate_halls(self):
+        """Return (id, rows, seats_in_row) of the new halls."""
+        first_id = next_id(TheatreHall)
+        halls = [
+            (
+                hall_id,
+                self.rng.randint(8, 40),
+                self.rng.randint(12, 40),
+            )
+            for hall_id in range(first_id, first_id + self.options["halls"])
+        ]
+        self.write(
+            "halls",
+            TheatreHall,
+            ("id", "name", "rows", "seats_in_row"),
+            ((pk, f"Hall {pk}", rows, seats) for pk, rows, seats in halls),
+        )
+        return halls
+
+    def generate_genres(self):
+        existing = dict(Genre.objects.values_list("name", "id"))
+        first_id = next_id(Genre)
+        new = [name for name in GENRES if name not in existing]
+        self.write(
+            "genres",
+            Genre,
+            ("id", "name"),
+            enumerate(new, start=first_id),
+        )
+        return sorted(existing.values()) + list(
+            range(first_id, first_id + len(new))
+        )
+
+    def generate_actors(self):
+        first_id = next_id(Actor)
+        ids = range(first_id, first_id + self.options["actors"])
+        self.write(
+            "actors",
+            Actor,
+            ("id", "first_name", "last_name"),
+            (
+                (
+                    pk,
+                    self.rng.choice(FIRST_NAMES),
+                    self.rng.choice(LAST_NAMES),
+                )
+                for pk in ids
+            ),
+        )
+        return ids
+
+    def generate_plays(self, actor_ids, genre_ids):
+        """Write plays and their links; return {play id: popularity}."""
+        rng = self.rng
+        first_id = next_id(Play)
+        play_ids = list(range(first_id, first_id + self.options["plays"]))
+        self.write(
+            "plays",
+            Play,
+            ("id", "title", "description"),
+            (
+                (
+                    pk,
+                    f"The {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {pk}",
+                    "A synthetic play.",
+                )
+                for pk in play_ids
+            ),
+        )
+
+        def cast():
+            for play_id in play_ids:
+                # Most casts are small; a few productions are huge.
+                size = min(len(actor_ids), int(rng.paretovariate(1.2)) + 1)
+                for actor_id in rng.sample(actor_ids, min(size, 80)):
+                    yield play_id, actor_id
+
+        self.write(
+            "play actors",
+            Play.actors.through,
+            ("play_id", "actor_id"),
+            cast(),
+        )
+        self.write(
+            "play genres",
+            Play.genres.through,
+            ("play_id", "genre_id"),
+            (
+                (play_id, genre_id)
+                for play_id in play_ids
+                for genre_id in rng.sample(
+                    genre_ids, min(len(genre_ids), rng.randint(1, 3))
+                )
+            ),
+        )
+
+        ranked = play_ids[:]
+        rng.shuffle(ranked)
+        return {
+            play_id: 1 / rank ** self.options["skew"]
+            for rank, play_id in enumerate(ranked, start=1)
+        }
+
+    def generate_users(self):
+        first_id = next_id(get_user_model())
+        ids = range(first_id, first_id + self.options["users"])
+        joined = timezone.make_aware(
+            datetime.combine(self.start - timedelta(days=365), time())
+        )
+        self.write(
+            "users",
+            get_user_model(),
+            (
+                "id",
+                "email",
+                "password",
+                "first_name",
+                "last_name",
+                "is_staff",
+                "is_superuser",
+                "is_active",
+                "date_joined",
+            ),
+            (
+                # "!" marks an unusable password.
+                (pk, f"user{pk}@example.com", "!", "", "")
+                + (False, False, True, joined)
+                for pk in ids
+            ),
+        )
+        return ids
+
+    def generate_performances(self, halls, popularity):
+        """Return (id, show_time, hall, play id) of the new performances."""
+        rng = self.rng
+        plays = list(popularity)
+        cumulative = list(accumulate(popularity.values()))
+        shows_per_day = self.options["shows_per_day"]
+        # Shows start between 12:00 and 20:00, at least four hours apart.
+        if shows_per_day == 1:
+            starts = [time(19)]
+        else:
+            starts = [
+                time(12 + index * 8 // (shows_per_day - 1))
+                for index in range(shows_per_day)
+            ]
+
+        performances = []
+        pk = next_id(Performance)
+        for day in range(self.options["days"]):
+            day = self.start + timedelta(days=day)
+            for hall in halls:
+                for start in starts:
+                    show_time = timezone.make_aware(
+                        datetime.combine(day, start)
+                    )
+                    play_id = plays[
+                        bisect(cumulative, rng.random() * cumulative[-1])
+                    ]
+                    performances.append((pk, show_time, hall, play_id))
+                    pk += 1
+
+        self.write(
+            "performances",
+            Performance,
+            (
+                "id",
+                "show_time",
+                "duration",
+                "end_time",
+                "play_id",
+                "theatre_hall_id",
+            ),
+            (
+                (pk, show_time, duration, show_time + duration, play, hall[0])
+                for pk, show_time, hall, play in performances
+                for duration in [rng.choice(DURATIONS)]
+            ),
+        )
+        return performances
+
+    def generate_tickets(self, performances, popularity, user_ids):
+        rng = self.rng
+        occupancy = self.options["occupancy"]
+        # Mean popularity of a show, weighted by how often plays are shown.
+        mean = sum(p * p for p in popularity.values()) / sum(
+            popularity.values()
+        )
+        reservations = []
+        progress = Progress(
+            self.stdout, "tickets", self.options["verbosity"]
+        )
+        reservation_id = next_id(Reservation)
+        ticket_id = next_id(Ticket)
+
+        def tickets():
+            nonlocal reservation_id, ticket_id
+            for pk, show_time, hall, play_id in performances:
+                _, rows, seats_in_row = hall
+                capacity = rows * seats_in_row
+                hotness = (popularity[play_id] / mean) ** 0.5
+                fill = min(1.0, occupancy * hotness * rng.uniform(0.5, 1.5))
+                seats = rng.sample(range(capacity), int(capacity * fill))
+                position = 0
+                while position < len(seats):
+                    size = rng.choices(GROUP_SIZES, GROUP_WEIGHTS)[0]
+                    group = seats[position:position + size]
+                    position += size
+                    created_at = show_time - timedelta(
+                        minutes=rng.randint(60, 60 * 24 * 60)
+                    )
+                    reservations.append(
+                        (reservation_id, created_at, rng.choice(user_ids))
+                    )
+                    for index in sorted(group):
+                        row, seat = divmod(index, seats_in_row)
+                        yield ticket_id, row + 1, seat + 1, pk, reservation_id
+                        ticket_id += 1
+                    reservation_id += 1
+
+        # bulk_create stamps created_at with the current time; only COPY
+        # keeps the generated booking times.
+        for batch in batched(tickets(), self.options["batch_size"]):
+            with transaction.atomic():
+                write_rows(
+                    Reservation,
+                    ("id", "created_at", "user_id"),
+                    reservations,
+                    use_copy=self.use_copy,
+                )
+                write_rows(
+                    Ticket,
+                    ("id", "row", "seat", "performance_id", "reservation_id"),
+                    batch,
+                    use_copy=self.use_copy,
+                )
+            reservations.clear()
+            progress.advance(len(batch))
+        self.stdout.write(self.style.SUCCESS(progress.summary()))
@@ -0,0 +1,53 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from theatre.images import run_in_worker, get_setting, process_play_image
+from theatre.models import Play
+
+
+class Command(BaseCommand):
+    """Django command to render missing variants of existing Play images"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Re-render variants of plays that already have them.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Images rendered in parallel (PLAY_IMAGES['WORKERS'] "
+            "by default).",
+        )
+
+    def handle(self, *args, **options):
+        plays = Play.objects.exclude(image="").exclude(image__isnull=True)
+        if not options["force"]:
+            plays = plays.filter(image_variants={})
+        pending = list(plays.values_list("id", "image"))
+        workers = options["workers"]
+        if workers is None:
+            workers = get_setting("WORKERS")
+
+        if workers:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(
+                    pool.map(lambda job: run_in_worker(*job), pending)
+                )
+        else:
+            results = [process_play_image(*job) for job in pending]
+
+        failed = results.count(False)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rendered variants for {len(results) - failed} of "
+                f"{len(pending)} plays."
+            )
+        )
+        if failed:
+            self.stderr.write(
+                f"{failed} images could not be processed, see the log."
+            )
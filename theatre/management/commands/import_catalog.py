@@ -0,0 +1,295 @@
+import csv
+import json
+from collections import Counter
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime, parse_duration
+
+from theatre.management.commands._private import (
+    Progress,
+    batched,
+    copy_supported,
+    write_rows,
+)
+from theatre.models import (
+    DEFAULT_PERFORMANCE_DURATION,
+    Actor,
+    Genre,
+    Performance,
+    Play,
+    TheatreHall,
+)
+from theatre.scheduling import MAX_DURATION, HallSchedule
+
+# Files are loaded in this order so references always resolve.
+KINDS = (
+    "genres",
+    "actors",
+    "plays",
+    "play_genres",
+    "play_actors",
+    "halls",
+    "performances",
+)
+
+
+def read_records(path):
+    """Yield (line number, record dict) from a CSV or NDJSON file."""
+    with open(path, newline="", encoding="utf-8") as file:
+        if path.suffix == ".csv":
+            yield from enumerate(csv.DictReader(file), start=2)
+            return
+        for line, text in enumerate(file, start=1):
+            if not text.strip():
+                continue
+            try:
+                yield line, json.loads(text)
+            except json.JSONDecodeError as error:
+                raise CommandError(f"{path}:{line}: {error}")
+
+
+class Command(BaseCommand):
+    """
+    Django command to bulk load a catalog from CSV or NDJSON files named
+    after their content: genres, actors, plays, play_genres, play_actors,
+    halls and performances (e.g. plays.csv, play_actors.ndjson).
+    Rows reference each other by natural keys: genre name, actor
+    "first_name last_name", play title and hall name.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", type=Path)
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Rows written per COPY or bulk_create.",
+        )
+        parser.add_argument(
+            "--no-copy",
+            action="store_true",
+            help="Use bulk_create even on PostgreSQL.",
+        )
+
+    def handle(self, *args, **options):
+        self.batch_size = options["batch_size"]
+        self.use_copy = copy_supported() and not options["no_copy"]
+        self.verbosity = options["verbosity"]
+        self._keys = {}
+
+        files = []
+        for path in options["paths"]:
+            kind = path.name.split(".")[0]
+            if kind not in KINDS or path.suffix not in (
+                ".csv",
+                ".ndjson",
+                ".jsonl",
+            ):
+                raise CommandError(
+                    f"{path}: expected <kind>.csv or <kind>.ndjson with "
+                    f"kind one of {', '.join(KINDS)}."
+                )
+            files.append((KINDS.index(kind), kind, path))
+
+        for _, kind, path in sorted(files):
+            self.import_file(kind, path)
+
+    def import_file(self, kind, path):
+        self.path = path
+        self.skipped = Counter()
+        model, fields, rows = getattr(self, f"{kind}_rows")(
+            read_records(path)
+        )
+        progress = Progress(self.stdout, kind, self.verbosity)
+        with transaction.atomic():
+            for batch in batched(rows, self.batch_size):
+                write_rows(model, fields, batch, use_copy=self.use_copy)
+                progress.advance(len(batch))
+        # Newly inserted rows change the natural key maps.
+        self._keys.pop(model, None)
+
+        summary = progress.summary()
+        if self.skipped:
+            summary += "; skipped " + ", ".join(
+                f"{count} {reason}" for reason, count in self.skipped.items()
+            )
+        self.stdout.write(self.style.SUCCESS(summary))
+
+    def natural_keys(self, model):
+        """Map of natural key -> primary key, loaded in one query."""
+        if model not in self._keys:
+            if model is Actor:
+                values = (
+                    (f"{first_name} {last_name}", pk)
+                    for pk, first_name, last_name in (
+                        Actor.objects.values_list(
+                            "pk", "first_name", "last_name"
+                        )
+                    )
+                )
+            else:
+                key = {Genre: "name", Play: "title", TheatreHall: "name"}
+                values = model.objects.values_list(key[model], "pk")
+            self._keys[model] = dict(values)
+        return self._keys[model]
+
+    def value(self, record, name, line, required=True):
+        value = record.get(name)
+        if isinstance(value, str):
+            value = value.strip()
+        if required and value in (None, ""):
+            raise CommandError(f"{self.path}:{line}: `{name}` is required.")
+        return value
+
+    def resolve(self, model, record, name, line):
+        pk = self.natural_keys(model).get(self.value(record, name, line))
+        if pk is None:
+            self.skipped[f"unknown {name}"] += 1
+        return pk
+
+    def genres_rows(self, records):
+        def rows():
+            names = set(self.natural_keys(Genre))
+            for line, record in records:
+                name = self.value(record, "name", line)
+                if name in names:
+                    self.skipped["existing"] += 1
+                    continue
+                names.add(name)
+                yield (name,)
+
+        return Genre, ("name",), rows()
+
+    def actors_rows(self, records):
+        def rows():
+            names = set(self.natural_keys(Actor))
+            for line, record in records:
+                first_name = self.value(record, "first_name", line)
+                last_name = self.value(record, "last_name", line)
+                if f"{first_name} {last_name}" in names:
+                    self.skipped["existing"] += 1
+                    continue
+                names.add(f"{first_name} {last_name}")
+                yield first_name, last_name
+
+        return Actor, ("first_name", "last_name"), rows()
+
+    def plays_rows(self, records):
+        def rows():
+            titles = set(self.natural_keys(Play))
+            for line, record in records:
+                title = self.value(record, "title", line)
+                if title in titles:
+                    self.skipped["existing"] += 1
+                    continue
+                titles.add(title)
+                description = self.value(
+                    record, "description", line, required=False
+                )
+                yield title, description or ""
+
+        return Play, ("title", "description"), rows()
+
+    def _link_rows(self, records, through, model, name):
+        def rows():
+            links = set(
+                through.objects.values_list("play_id", f"{name}_id")
+            )
+            for line, record in records:
+                play_id = self.resolve(Play, record, "play", line)
+                other_id = self.resolve(model, record, name, line)
+                if play_id is None or other_id is None:
+                    continue
+                if (play_id, other_id) in links:
+                    self.skipped["existing"] += 1
+                    continue
+                links.add((play_id, other_id))
+                yield play_id, other_id
+
+        return through, ("play_id", f"{name}_id"), rows()
+
+    def play_genres_rows(self, records):
+        return self._link_rows(records, Play.genres.through, Genre, "genre")
+
+    def play_actors_rows(self, records):
+        return self._link_rows(records, Play.actors.through, Actor, "actor")
+
+    def halls_rows(self, records):
+        def rows():
+            names = set(self.natural_keys(TheatreHall))
+            for line, record in records:
+                name = self.value(record, "name", line)
+                if name in names:
+                    self.skipped["existing"] += 1
+                    continue
+                names.add(name)
+                try:
+                    size = (
+                        int(self.value(record, "rows", line)),
+                        int(self.value(record, "seats_in_row", line)),
+                    )
+                except ValueError as error:
+                    raise CommandError(f"{self.path}:{line}: {error}")
+                yield name, *size
+
+        return TheatreHall, ("name", "rows", "seats_in_row"), rows()
+
+    def parse_show(self, record, line):
+        show_time = parse_datetime(self.value(record, "show_time", line))
+        duration = self.value(record, "duration", line, required=False)
+        duration = (
+            parse_duration(duration)
+            if duration
+            else DEFAULT_PERFORMANCE_DURATION
+        )
+        if show_time is None or duration is None:
+            raise CommandError(
+                f"{self.path}:{line}: invalid show_time or duration."
+            )
+        if not duration.total_seconds() > 0 or duration > MAX_DURATION:
+            raise CommandError(
+                f"{self.path}:{line}: duration must be positive and at "
+                f"most {MAX_DURATION}."
+            )
+        if timezone.is_naive(show_time):
+            show_time = timezone.make_aware(show_time)
+        return show_time, duration
+
+    def performances_rows(self, records):
+        def rows():
+            schedules = {}
+            for line, record in records:
+                show_time, duration = self.parse_show(record, line)
+                play_id = self.resolve(Play, record, "play", line)
+                hall_id = self.resolve(
+                    TheatreHall, record, "theatre_hall", line
+                )
+                if play_id is None or hall_id is None:
+                    continue
+                if hall_id not in schedules:
+                    # Every booking of the hall in one query, then a
+                    # binary search per imported show.
+                    schedules[hall_id] = HallSchedule(
+                        (start, end, None)
+                        for start, end in Performance.objects.filter(
+                            theatre_hall_id=hall_id
+                        ).values_list("show_time", "end_time")
+                    )
+                end_time = show_time + duration
+                if schedules[hall_id].conflicts(show_time, end_time):
+                    self.skipped["overlapping"] += 1
+                    continue
+                schedules[hall_id].add(show_time, end_time, None)
+                yield show_time, duration, end_time, play_id, hall_id
+
+        fields = (
+            "show_time",
+            "duration",
+            "end_time",
+            "play_id",
+            "theatre_hall_id",
+        )
+        return Performance, fields, rows()
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from theatre.idempotency import purge_expired_keys
+
+
+class Command(BaseCommand):
+    """Django command to delete expired Idempotency-Key records"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Keys deleted per query.",
+        )
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_keys(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Deleted {deleted} expired idempotency keys.")
+        )
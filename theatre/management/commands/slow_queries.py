@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from theatre.querylog import aggregate, get_setting, read_log
+
+ORDERS = {
+    "total": "total_ms",
+    "count": "count",
+    "p95": "p95_ms",
+    "max": "max_ms",
+}
+
+
+class Command(BaseCommand):
+    """Django command to print the worst queries of the slow query log"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--file",
+            help="Slow query log to read, SLOW_QUERY_LOG by default.",
+        )
+        parser.add_argument("--limit", type=int, default=10)
+        parser.add_argument(
+            "--order",
+            choices=ORDERS,
+            default="total",
+            help="Rank fingerprints by total time (default), count, p95 "
+            "or max duration.",
+        )
+        parser.add_argument(
+            "--plans",
+            action="store_true",
+            help="Print the last captured EXPLAIN of each query.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["file"] or get_setting("PATH")
+        if not path:
+            raise CommandError(
+                "No slow query log configured, set SLOW_QUERY_LOG or --file."
+            )
+        try:
+            statistics = aggregate(read_log(path))
+        except FileNotFoundError:
+            raise CommandError(f"{path} does not exist.")
+        if not statistics:
+            self.stdout.write("No slow queries logged.")
+            return
+
+        key = ORDERS[options["order"]]
+        statistics.sort(key=lambda group: group[key], reverse=True)
+        for rank, group in enumerate(statistics[: options["limit"]], 1):
+            views = ", ".join(
+                f"{view} ({count})"
+                for view, count in group["views"].most_common(3)
+            )
+            self.stdout.write(
+                self.style.MIGRATE_HEADING(
+                    f"#{rank} {group['count']} queries, "
+                    f"{group['total_ms']:.0f} ms total, "
+                    f"p50 {group['p50_ms']:.1f} / p95 {group['p95_ms']:.1f}"
+                    f" / p99 {group['p99_ms']:.1f} / max "
+                    f"{group['max_ms']:.1f} ms"
+                )
+            )
+            self.stdout.write(f"  views: {views}")
+            self.stdout.write(f"  {group['fingerprint']}")
+            if options["plans"] and group["plan"]:
+                for line in group["plan"].splitlines():
+                    self.stdout.write(f"    {line}")
+        self.stdout.write(
+            f"{len(statistics)} distinct queries, "
+            f"{sum(group['count'] for group in statistics)} slow executions."
+        )
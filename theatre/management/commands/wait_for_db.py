@@ -1,8 +1,9 @@
 import time
 from django.core.management.base import BaseCommand
-from django.db import connections
 from django.db.utils import OperationalError
 
+from theatre.health import database_is_available
+
 
 class Command(BaseCommand):
     """Django command to wait for the database to be available"""
@@ -12,16 +13,13 @@ class Command(BaseCommand):
         max_retries = 5
         retry_delay = 2
         for _ in range(max_retries):
-            try:
-                db_conn = connections["default"]
-                db_conn.cursor()
+            if database_is_available():
                 self.stdout.write(self.style.SUCCESS("Database is available!"))
                 break
-            except OperationalError:
-                self.stdout.write(
-                    f"Database unavailable, retrying in {retry_delay}s..."
-                )
-                time.sleep(retry_delay)
+            self.stdout.write(
+                f"Database unavailable, retrying in {retry_delay}s..."
+            )
+            time.sleep(retry_delay)
         else:
             self.stderr.write(
                 self.style.ERROR(
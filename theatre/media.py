@@ -0,0 +1,172 @@
+"""
+Media file serving.
+
+``serve_media`` answers conditional requests (ETag, If-None-Match,
+If-Modified-Since) with 304 from a single ``stat()``. Behind a front server
+configured with ``settings.MEDIA_SERVING["OFFLOAD"]`` it only returns an
+``X-Sendfile`` or ``X-Accel-Redirect`` header and the front server sends
+the bytes, so the worker is free as soon as the headers are built.
+Otherwise it returns a ``FileResponse`` over the open file, which WSGI
+servers with ``wsgi.file_wrapper`` (gunicorn) send with ``sendfile()``;
+single byte ranges are answered with 206 the same way.
+
+Content-addressed names (see ``theatre.storage``) never change content, so
+they are served with a year-long ``immutable`` Cache-Control: browsers and
+CDNs reuse them without revalidating.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from theatre.storage import is_content_addressed
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+DEFAULTS = {
+    # "", "x-sendfile" (Apache, lighttpd) or "x-accel-redirect" (nginx).
+    "OFFLOAD": "",
+    # nginx `internal` location aliased to MEDIA_ROOT.
+    "ACCEL_REDIRECT_LOCATION": "/protected-media/",
+}
+
+BYTE_RANGE = re.compile(r"^\s*bytes=(\d*)-(\d*)\s*$")
+
+
+def get_setting(name):
+    return getattr(settings, "MEDIA_SERVING", {}).get(name, DEFAULTS[name])
+
+
+def file_etag(path, stat):
+    if is_content_addressed(path):
+        digest, _ = os.path.splitext(posixpath.basename(path))
+        return f'"{digest}"'
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def byte_range(header, size):
+    """
+    (start, end) of a single ``bytes=`` range of a `size`-byte file, None
+    if the whole file should be sent, or False if the range is not
+    satisfiable. Multiple ranges are answered with the whole file.
+    """
+    match = BYTE_RANGE.match(header or "")
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if not first:
+        suffix = int(last)
+        return (max(0, size - suffix), size - 1) if suffix and size else False
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if last and int(last) < start:
+        return None
+    return (start, end) if start < size else False
+
+
+class FileRange:
+    """
+    Reads at most `length` bytes of `fileobj` from its current position.
+    Exposes fileno() so WSGI servers can still sendfile() the range.
+    """
+
+    def __init__(self, fileobj, length):
+        self.file = fileobj
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def offload_response(path, fullpath, **kwargs):
+    response = HttpResponse(**kwargs)
+    if get_setting("OFFLOAD") == "x-accel-redirect":
+        location = get_setting("ACCEL_REDIRECT_LOCATION").rstrip("/")
+        response["X-Accel-Redirect"] = f"{location}/{quote(path)}"
+    else:
+        response["X-Sendfile"] = fullpath
+    return response
+
+
+@require_safe
+def serve_media(request, path, document_root=None):
+    path = posixpath.normpath(path).lstrip("/")
+    fullpath = safe_join(document_root or settings.MEDIA_ROOT, path)
+    try:
+        stat = os.stat(fullpath)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404("File not found.")
+    if os.path.isdir(fullpath):
+        raise Http404("Directories are not listed.")
+
+    etag = file_etag(path, stat)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(stat.st_mtime),
+        "Accept-Ranges": "bytes",
+    }
+    if is_content_addressed(path):
+        headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    conditional = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(stat.st_mtime),
+        response=HttpResponse(headers=headers),
+    )
+    if conditional.status_code != 200:
+        return conditional
+
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    content_type = content_type or "application/octet-stream"
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    if get_setting("OFFLOAD"):
+        # The front server handles ranges itself.
+        return offload_response(
+            path, fullpath, content_type=content_type, headers=headers
+        )
+
+    requested = None
+    if_range = request.headers.get("If-Range")
+    if if_range is None or if_range in (etag, headers["Last-Modified"]):
+        requested = byte_range(request.headers.get("Range"), stat.st_size)
+    if requested is False:
+        response = HttpResponse(status=416, headers=headers)
+        response["Content-Range"] = f"bytes */{stat.st_size}"
+        return response
+
+    fileobj = open(fullpath, "rb")
+    if requested:
+        start, end = requested
+        fileobj.seek(start)
+        response = FileResponse(
+            FileRange(fileobj, end - start + 1),
+            status=206,
+            content_type=content_type,
+            headers=headers,
+        )
+        response["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+        response["Content-Length"] = end - start + 1
+    else:
+        response = FileResponse(
+            fileobj, content_type=content_type, headers=headers
+        )
+    return response
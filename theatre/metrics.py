@@ -0,0 +1,444 @@
+"""
+Process metrics in the Prometheus data model.
+
+Counters, histograms and gauges live in a process-local registry keyed by
+name and labels. ``render()`` returns them in the Prometheus text format,
+prefixed with ``theatre_``; the ``/metrics`` view serves it to admins and
+to scrapers sending ``settings.METRICS["SCRAPE_TOKEN"]`` as a bearer token.
+
+A multi-worker server runs one registry per process. When
+``settings.METRICS["MULTIPROCESS_DIR"]`` is set, every process writes a
+snapshot of its registry there after a request (at most once per
+FLUSH_INTERVAL seconds), from a background thread once its last snapshot
+is older than that, and at exit. ``render()`` merges the snapshots of all
+processes: counters and histograms are summed, including those of workers
+that have exited, while gauges are reported per live process with a
+``pid`` label. Empty the directory when the server starts.
+"""
+import atexit
+import glob
+import hmac
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.authentication import (
+    BaseAuthentication,
+    get_authorization_header,
+)
+from rest_framework.permissions import BasePermission
+
+DEFAULTS = {
+    "MULTIPROCESS_DIR": "",
+    "FLUSH_INTERVAL": 1.0,
+    "SCRAPE_TOKEN": "",
+}
+NAMESPACE = "theatre"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name: (type, help)
+METRICS = {
+    "http_request_duration_seconds": (
+        "histogram",
+        "Request latency by view action, method and status.",
+    ),
+    "db_queries_total": ("counter", "SQL queries executed."),
+    "db_query_seconds_total": (
+        "counter",
+        "Time spent executing SQL queries.",
+    ),
+    "reservations_created_total": ("counter", "Reservations written."),
+    "reservation_conflicts_total": (
+        "counter",
+        "Reservations rejected because a seat was already taken.",
+    ),
+    "reservation_transient_errors_total": (
+        "counter",
+        "Serialization failures and deadlocks while writing reservations.",
+    ),
+    "reservation_retries_total": (
+        "counter",
+        "Reservation transactions retried.",
+    ),
+    "reservation_retries_exhausted_total": (
+        "counter",
+        "Reservations that still failed after the last retry.",
+    ),
+    "cache_requests_total": ("counter", "Cache lookups by result."),
+    "db_pool_size": ("gauge", "Open connections in the pool."),
+    "db_pool_max_size": ("gauge", "Maximum size of the pool."),
+    "db_pool_available": ("gauge", "Idle connections in the pool."),
+    "db_pool_in_use": ("gauge", "Connections lent out by the pool."),
+    "db_pool_waiting": ("gauge", "Requests waiting for a connection."),
+}
+# pool_stats() key: gauge
+POOL_GAUGES = {
+    "size": "db_pool_size",
+    "max_size": "db_pool_max_size",
+    "available": "db_pool_available",
+    "in_use": "db_pool_in_use",
+    "waiting": "db_pool_waiting",
+}
+
+_lock = threading.Lock()
+_counters = defaultdict(float)
+# key: [observations per bucket, the last one for +Inf, then the sum]
+_histograms = {}
+_gauges = {}
+_last_flush = 0.0
+_flusher_pid = None
+
+
+def get_setting(name):
+    return getattr(settings, "METRICS", {}).get(name, DEFAULTS[name])
+
+
+def _key(name, labels):
+    return name, tuple(
+        sorted((label, str(value)) for label, value in labels.items())
+    )
+
+
+def increment(name, value=1, **labels):
+    with _lock:
+        _counters[_key(name, labels)] += value
+
+
+def observe(name, value, **labels):
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+        histogram[bisect_left(BUCKETS, value)] += 1
+        histogram[-1] += value
+
+
+def set_gauge(name, value, **labels):
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def record_query(alias, seconds):
+    with _lock:
+        _counters[("db_queries_total", (("alias", alias),))] += 1
+        _counters[("db_query_seconds_total", (("alias", alias),))] += seconds
+
+
+def format_sample(name, labels):
+    if not labels:
+        return name
+    values = ",".join(
+        '{}="{}"'.format(
+            label,
+            str(value)
+            .replace("\\", r"\\")
+            .replace('"', r"\"")
+            .replace("\n", r"\n"),
+        )
+        for label, value in labels
+    )
+    return f"{name}{{{values}}}"
+
+
+def format_value(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def get_counters():
+    with _lock:
+        return {
+            format_sample(name, labels): value
+            for (name, labels), value in _counters.items()
+        }
+
+
+def reset_counters():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _gauges.clear()
+
+
+def update_pool_gauges():
+    # Imported here: theatre.health is not needed by the counters above.
+    from theatre.health import pool_stats
+
+    for alias in settings.DATABASES:
+        stats = pool_stats(alias)
+        if stats is None:
+            continue
+        for key, name in POOL_GAUGES.items():
+            set_gauge(name, stats[key], alias=alias)
+
+
+def snapshot():
+    update_pool_gauges()
+    with _lock:
+        return {
+            "counters": [
+                [name, labels, value]
+                for (name, labels), value in _counters.items()
+            ],
+            "histograms": [
+                [name, labels, histogram]
+                for (name, labels), histogram in _histograms.items()
+            ],
+            "gauges": [
+                [name, labels, value]
+                for (name, labels), value in _gauges.items()
+            ],
+        }
+
+
+def flush(force=False):
+    """Write this process's snapshot to MULTIPROCESS_DIR, if configured."""
+    global _last_flush
+    directory = get_setting("MULTIPROCESS_DIR")
+    if not directory:
+        return
+    start_flusher()
+    now = time.monotonic()
+    if not force and now - _last_flush < get_setting("FLUSH_INTERVAL"):
+        return
+    _last_flush = now
+    path = os.path.join(directory, f"metrics-{os.getpid()}.json")
+    temporary = f"{path}.{threading.get_ident()}.tmp"
+    with open(temporary, "w") as output:
+        json.dump(snapshot(), output)
+    os.replace(temporary, path)
+
+
+def _flush_quietly(force=False):
+    try:
+        flush(force=force)
+    except OSError:
+        # The directory was removed; the next flush tries again.
+        pass
+
+
+def _flush_periodically(pid):
+    # A forked worker gets its own flusher; this one belongs to `pid`.
+    while _flusher_pid == pid:
+        time.sleep(get_setting("FLUSH_INTERVAL"))
+        _flush_quietly()
+
+
+def start_flusher():
+    """
+    Flush from a daemon thread and at exit, so a worker's last requests
+    reach MULTIPROCESS_DIR even if it goes idle or exits before its next
+    request. Started once per process, including forked workers.
+    """
+    global _flusher_pid
+    pid = os.getpid()
+    with _lock:
+        if _flusher_pid == pid:
+            return
+        _flusher_pid = pid
+    threading.Thread(
+        target=_flush_periodically,
+        args=(pid,),
+        name="metrics-flusher",
+        daemon=True,
+    ).start()
+    atexit.register(_flush_quietly, force=True)
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def snapshots():
+    """(pid or None, snapshot) of every process."""
+    directory = get_setting("MULTIPROCESS_DIR")
+    if not directory:
+        return [(None, snapshot())]
+    flush(force=True)
+    found = []
+    for path in glob.glob(os.path.join(directory, "metrics-*.json")):
+        pid = int(os.path.basename(path)[len("metrics-"): -len(".json")])
+        try:
+            with open(path) as source:
+                found.append((pid, json.load(source)))
+        except (OSError, ValueError):
+            # Removed or replaced while listing.
+            continue
+    return found
+
+
+def collect():
+    """Merged counters, histograms and gauges, keyed by (name, labels)."""
+    counters = defaultdict(float)
+    histograms = {}
+    gauges = {}
+    for pid, data in snapshots():
+        for name, labels, value in data["counters"]:
+            counters[name, tuple(map(tuple, labels))] += value
+        for name, labels, histogram in data["histograms"]:
+            key = name, tuple(map(tuple, labels))
+            if key in histograms:
+                histogram = [a + b for a, b in zip(histograms[key], histogram)]
+            histograms[key] = histogram
+        if pid is not None and not process_alive(pid):
+            continue
+        for name, labels, value in data["gauges"]:
+            labels = tuple(map(tuple, labels))
+            if pid is not None:
+                labels += (("pid", str(pid)),)
+            gauges[name, labels] = value
+    return counters, histograms, gauges
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    counters, histograms, gauges = collect()
+    samples = defaultdict(list)
+    for (name, labels), value in sorted(counters.items()):
+        samples[name].append(
+            f"{format_sample(name, labels)} {format_value(value)}"
+        )
+    for (name, labels), value in sorted(gauges.items()):
+        samples[name].append(
+            f"{format_sample(name, labels)} {format_value(value)}"
+        )
+    for (name, labels), histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ("+Inf",), histogram):
+            cumulative += count
+            samples[name].append(
+                f"{format_sample(f'{name}_bucket', labels + (('le', bound),))}"
+                f" {cumulative}"
+            )
+        samples[name].append(
+            f"{format_sample(f'{name}_sum', labels)} "
+            f"{format_value(histogram[-1])}"
+        )
+        samples[name].append(
+            f"{format_sample(f'{name}_count', labels)} {cumulative}"
+        )
+
+    lines = []
+    for name in sorted(samples):
+        metric_type, description = METRICS.get(name, ("untyped", name))
+        lines.append(f"# HELP {NAMESPACE}_{name} {description}")
+        lines.append(f"# TYPE {NAMESPACE}_{name} {metric_type}")
+        lines.extend(f"{NAMESPACE}_{sample}" for sample in samples[name])
+    return "\n".join(lines) + "\n"
+
+
+def view_label(request):
+    """`ViewSet.action` (or view name) of the view that served `request`."""
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        # Unmatched paths are not labelled to keep the series bounded.
+        return "unmatched"
+    view = match.func
+    view_class = getattr(view, "cls", None) or getattr(
+        view, "view_class", None
+    )
+    if view_class is None:
+        return match.view_name or view.__name__
+    action = (getattr(view, "actions", None) or {}).get(
+        request.method.lower()
+    )
+    return f"{view_class.__name__}.{action}" if action else view_class.__name__
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def record(self, request, response, seconds):
+        observe(
+            "http_request_duration_seconds",
+            seconds,
+            view=view_label(request),
+            method=request.method,
+            status=response.status_code,
+        )
+        flush()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - started)
+        return response
+
+
+_MISSING = object()
+
+
+class CacheMetricsMixin:
+    """Count hits and misses of get() in cache_requests_total."""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        if value is _MISSING:
+            increment("cache_requests_total", result="miss")
+            return default
+        increment("cache_requests_total", result="hit")
+        return value
+
+
+class MeteredLocMemCache(CacheMetricsMixin, LocMemCache):
+    pass
+
+
+class ScrapeTokenAuthentication(BaseAuthentication):
+    """
+    Accept the static SCRAPE_TOKEN as a bearer token, so Prometheus can
+    scrape without an expiring JWT. Other credentials are left to the next
+    authentication class.
+    """
+
+    keyword = b"bearer"
+
+    def authenticate(self, request):
+        token = get_setting("SCRAPE_TOKEN")
+        parts = get_authorization_header(request).split()
+        if not token or len(parts) != 2 or parts[0].lower() != self.keyword:
+            return None
+        if not hmac.compare_digest(parts[1], token.encode()):
+            return None
+        return AnonymousUser(), None
+
+    def authenticate_header(self, request):
+        return "Bearer"
+
+
+class IsScraper(BasePermission):
+    """Allow requests authenticated with the scrape token."""
+
+    def has_permission(self, request, view):
+        return isinstance(
+            request.successful_authenticator, ScrapeTokenAuthentication
+        )
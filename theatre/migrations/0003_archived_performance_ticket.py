@@ -0,0 +1,68 @@
+# Generated by Django 5.1.3 on 2026-10-19 01:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("theatre", "0002_idempotencykey"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedPerformance",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("show_time", models.DateTimeField(db_index=True)),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "play",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_performances",
+                        to="theatre.play",
+                    ),
+                ),
+                (
+                    "theatre_hall",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_performances",
+                        to="theatre.theatrehall",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-show_time"],
+            },
+        ),
+        migrations.CreateModel(
+            name="ArchivedTicket",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("row", models.PositiveIntegerField()),
+                ("seat", models.PositiveIntegerField()),
+                (
+                    "performance",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="tickets",
+                        to="theatre.archivedperformance",
+                    ),
+                ),
+                (
+                    "reservation",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_tickets",
+                        to="theatre.reservation",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["row", "seat"],
+            },
+        ),
+    ]
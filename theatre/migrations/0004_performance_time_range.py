@@ -0,0 +1,125 @@
+import datetime
+
+from django.core.management.base import CommandError
+from django.db import migrations, models
+from django.db.models import F
+
+EXCLUSION_CONSTRAINT = "performance_hall_no_overlap"
+# Overlapping pairs listed when the constraint cannot be added.
+OVERLAPS_SHOWN = 50
+
+
+def fill_end_time(apps, schema_editor):
+    Performance = apps.get_model("theatre", "Performance")
+    Performance.objects.using(schema_editor.connection.alias).update(
+        end_time=F("show_time") + F("duration")
+    )
+
+
+def check_no_overlaps(connection):
+    """
+    Fail with a list of the performances sharing a hall at the same time.
+    Nothing prevented them before the constraint, and adding it over them
+    would fail with a bare constraint violation.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT a.theatre_hall_id, a.id, a.show_time, a.end_time, "
+            "b.id, b.show_time, b.end_time "
+            "FROM theatre_performance a JOIN theatre_performance b "
+            "ON b.theatre_hall_id = a.theatre_hall_id AND b.id > a.id "
+            "AND b.show_time < a.end_time AND b.end_time > a.show_time "
+            "ORDER BY a.theatre_hall_id, a.show_time, b.show_time"
+        )
+        overlaps = cursor.fetchall()
+    if not overlaps:
+        return
+    lines = [
+        f"  hall {hall}: performance {first} ({first_start} to "
+        f"{first_end}) and {second} ({second_start} to {second_end})"
+        for (
+            hall,
+            first,
+            first_start,
+            first_end,
+            second,
+            second_start,
+            second_end,
+        ) in overlaps[:OVERLAPS_SHOWN]
+    ]
+    if len(overlaps) > OVERLAPS_SHOWN:
+        lines.append(f"  and {len(overlaps) - OVERLAPS_SHOWN} more")
+    raise CommandError(
+        f"Cannot add {EXCLUSION_CONSTRAINT}: performances overlap in "
+        f"their hall ({len(overlaps)} found). Move or delete one of each "
+        f"pair, then migrate again.\n" + "\n".join(lines)
+    )
+
+
+def add_exclusion_constraint(apps, schema_editor):
+    # Range exclusion constraints only exist on PostgreSQL; elsewhere the
+    # serializers' indexed overlap check is the only guard.
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    check_no_overlaps(schema_editor.connection)
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    schema_editor.execute(
+        f"ALTER TABLE theatre_performance ADD CONSTRAINT "
+        f"{EXCLUSION_CONSTRAINT} EXCLUDE USING gist ("
+        f"theatre_hall_id WITH =, "
+        f"tstzrange(show_time, end_time, '[)') WITH &&)"
+    )
+
+
+def remove_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        f"ALTER TABLE theatre_performance DROP CONSTRAINT IF EXISTS "
+        f"{EXCLUSION_CONSTRAINT}"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("theatre", "0003_archived_performance_ticket"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="performance",
+            name="duration",
+            field=models.DurationField(
+                default=datetime.timedelta(seconds=7200)
+            ),
+        ),
+        migrations.AddField(
+            model_name="performance",
+            name="end_time",
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_end_time, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="performance",
+            name="end_time",
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="performance",
+            index=models.Index(
+                fields=["theatre_hall", "show_time"],
+                name="performance_hall_show_time",
+            ),
+        ),
+        migrations.AddField(
+            model_name="archivedperformance",
+            name="duration",
+            field=models.DurationField(
+                default=datetime.timedelta(seconds=7200)
+            ),
+        ),
+        migrations.RunPython(
+            add_exclusion_constraint, remove_exclusion_constraint
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-19 02:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("theatre", "0004_performance_time_range"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="play",
+            name="image_variants",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.3 on 2026-10-19 02:25
+
+import theatre.models
+import theatre.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("theatre", "0005_play_image_variants"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="play",
+            name="image",
+            field=models.ImageField(
+                null=True,
+                storage=theatre.storage.play_image_storage,
+                upload_to=theatre.models.play_image_file_path,
+            ),
+        ),
+    ]
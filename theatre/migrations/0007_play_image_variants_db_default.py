@@ -0,0 +1,20 @@
+# Generated by Django 5.1.3 on 2026-10-19 03:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("theatre", "0006_play_image_storage"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="play",
+            name="image_variants",
+            field=models.JSONField(
+                blank=True, db_default={}, default=dict, editable=False
+            ),
+        ),
+    ]
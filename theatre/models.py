@@ -1,12 +1,15 @@
 import os
-import uuid
+from datetime import timedelta
 from typing import Any
 
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils.text import slugify
 
+from theatre.storage import play_image_storage
+
 
 # Create your models here.
 
@@ -37,8 +40,10 @@ class Genre(models.Model):
 
 
 def play_image_file_path(instance, filename):
+    # The storage renames the file after its content hash and keeps only
+    # the directory and the extension.
     _, extension = os.path.splitext(filename)
-    filename = f"{slugify(instance.title)}-{uuid.uuid4()}{extension}"
+    filename = f"{slugify(instance.title)}{extension}"
 
     return os.path.join("uploads/plays/", filename)
 
@@ -48,7 +53,14 @@ class Play(models.Model):
     description = models.TextField()
     actors = models.ManyToManyField(Actor, related_name="plays", blank=True)
     genres = models.ManyToManyField(Genre, related_name="plays", blank=True)
-    image = models.ImageField(null=True, upload_to=play_image_file_path)
+    image = models.ImageField(
+        null=True, upload_to=play_image_file_path, storage=play_image_storage
+    )
+    # {variant: {format: stored name}}, filled in by theatre.images. The
+    # database default covers rows written by COPY, which skips the field.
+    image_variants = models.JSONField(
+        default=dict, db_default={}, blank=True, editable=False
+    )
 
     class Meta:
         ordering = ("title",)
@@ -70,8 +82,15 @@ class TheatreHall(models.Model):
         return self.name
 
 
+DEFAULT_PERFORMANCE_DURATION = timedelta(hours=2)
+
+
 class Performance(models.Model):
     show_time = models.DateTimeField()
+    duration = models.DurationField(default=DEFAULT_PERFORMANCE_DURATION)
+    # Denormalized show_time + duration: the hall overlap check and the
+    # PostgreSQL exclusion constraint need the end as a plain column.
+    end_time = models.DateTimeField(editable=False)
     play = models.ForeignKey(Play, on_delete=models.CASCADE)
     theatre_hall = models.ForeignKey(
         TheatreHall, related_name="performances", on_delete=models.CASCADE
@@ -79,6 +98,27 @@ class Performance(models.Model):
 
     class Meta:
         ordering = ["-show_time"]
+        indexes = [
+            models.Index(
+                fields=["theatre_hall", "show_time"],
+                name="performance_hall_show_time",
+            )
+        ]
+
+    def set_end_time(self):
+        show_time = self._meta.get_field("show_time").to_python(
+            self.show_time
+        )
+        self.end_time = show_time + self.duration
+
+    def save(self, *args, **kwargs):
+        self.set_end_time()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"show_time", "duration"} & set(
+            update_fields
+        ):
+            kwargs["update_fields"] = {*update_fields, "end_time"}
+        return super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.play.title} {str(self.show_time)}"
@@ -155,3 +195,77 @@ class Ticket(models.Model):
     class Meta:
         unique_together = ("performance", "row", "seat")
         ordering = ["row", "seat"]
+
+
+class ArchivedPerformance(models.Model):
+    """
+    A past performance moved out of the hot Performance table by the
+    archive_performances command. Keeps the original primary key.
+    """
+
+    id = models.BigIntegerField(primary_key=True)  # noqa: VNE003
+    show_time = models.DateTimeField(db_index=True)
+    duration = models.DurationField(default=DEFAULT_PERFORMANCE_DURATION)
+    play = models.ForeignKey(
+        Play, related_name="archived_performances", on_delete=models.CASCADE
+    )
+    theatre_hall = models.ForeignKey(
+        TheatreHall,
+        related_name="archived_performances",
+        on_delete=models.CASCADE,
+    )
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-show_time"]
+
+    def __str__(self):
+        return f"{self.play.title} {str(self.show_time)}"
+
+
+class ArchivedTicket(models.Model):
+    """A ticket of an archived performance, still linked to its reservation."""
+
+    id = models.BigIntegerField(primary_key=True)  # noqa: VNE003
+    row = models.PositiveIntegerField()
+    seat = models.PositiveIntegerField()
+    performance = models.ForeignKey(
+        ArchivedPerformance,
+        related_name="tickets",
+        on_delete=models.CASCADE,
+    )
+    reservation = models.ForeignKey(
+        Reservation, related_name="archived_tickets", on_delete=models.CASCADE
+    )
+
+    class Meta:
+        ordering = ["row", "seat"]
+
+    def __str__(self):
+        return f"{str(self.performance)} (row: {self.row}, seat: {self.seat})"
+
+
+class IdempotencyKey(models.Model):
+    """Response of the first request sent with a given Idempotency-Key."""
+
+    key = models.CharField(max_length=255)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name="idempotency_keys",
+        on_delete=models.CASCADE,
+    )
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response_body = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    @property
+    def is_complete(self):
+        return self.status_code is not None
+
+    def __str__(self):
+        return f"{self.user} {self.key}"
+
+    class Meta:
+        unique_together = ("user", "key")
@@ -0,0 +1,178 @@
+"""
+On-demand request profiling for staff.
+
+A staff user adds ``X-Profile: sample`` (or ``cprofile``), or the query
+parameter ``?profile=sample``, to a request, and ProfilerMiddleware runs
+that one request under a profiler:
+
+- ``sample``: a thread records the request thread's stack every
+  ``settings.PROFILING["INTERVAL"]`` seconds and the result is stored as
+  folded stacks (``<id>.folded``), the input of flamegraph.pl and
+  speedscope. The overhead stays low, so timings remain realistic.
+- ``cprofile``: cProfile's deterministic profile, stored as pstats
+  (``<id>.prof``) for snakeviz or flameprof.
+
+The response carries ``X-Request-ID`` and ``X-Profile`` with the URL of
+the stored profile, which ProfileView serves to staff. For anybody else
+the flag is ignored; requests without it cost one header lookup. Async
+views are not profiled.
+"""
+import cProfile
+import os
+import sys
+import threading
+import uuid
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.urls import reverse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+DEFAULTS = {
+    "DIRECTORY": "profiles",
+    "INTERVAL": 0.001,
+}
+HEADER = "X-Profile"
+QUERY_PARAMETER = "profile"
+# mode: file extension
+MODES = {
+    "sample": "folded",
+    "cprofile": "prof",
+}
+
+
+def get_setting(name):
+    return getattr(settings, "PROFILING", {}).get(name, DEFAULTS[name])
+
+
+def profile_path(profile_id, extension):
+    return os.path.join(
+        get_setting("DIRECTORY"), f"{profile_id}.{extension}"
+    )
+
+
+def requested_mode(request):
+    mode = request.headers.get(HEADER) or request.GET.get(QUERY_PARAMETER)
+    return mode if mode in MODES else None
+
+
+def is_staff(request):
+    """Whether the session or JWT user of `request` is staff."""
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+    try:
+        authenticated = JWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return bool(authenticated) and authenticated[0].is_staff
+
+
+def stack_depth(frame):
+    depth = 0
+    while frame is not None:
+        depth += 1
+        frame = frame.f_back
+    return depth
+
+
+class StackSampler:
+    """
+    Counts the folded stacks of thread `thread_id` every `interval`
+    seconds, leaving out the `skip` outermost frames (the server and the
+    middleware above the profiled code).
+    """
+
+    def __init__(self, thread_id, interval, skip=0):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.skip = skip
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(
+            target=self.run, name="request-profiler", daemon=True
+        )
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[self.fold(frame)] += 1
+
+    def fold(self, frame):
+        names = []
+        while frame is not None:
+            module = frame.f_globals.get("__name__", "?")
+            names.append(f"{module}.{frame.f_code.co_qualname}")
+            frame = frame.f_back
+        names.reverse()
+        return ";".join(names[self.skip:])
+
+    def write(self, path):
+        with open(path, "w") as output:
+            for stack, count in self.stacks.most_common():
+                if stack:
+                    output.write(f"{stack} {count}\n")
+
+
+class ProfilerMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def profile(self, request, mode, profile_id):
+        path = profile_path(profile_id, MODES[mode])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if mode == "cprofile":
+            profiler = cProfile.Profile()
+            try:
+                return profiler.runcall(self.get_response, request)
+            finally:
+                profiler.dump_stats(path)
+
+        sampler = StackSampler(
+            threading.get_ident(),
+            get_setting("INTERVAL"),
+            # Everything up to and including this frame.
+            skip=stack_depth(sys._getframe()),
+        )
+        sampler.start()
+        try:
+            return self.get_response(request)
+        finally:
+            sampler.stop()
+            sampler.write(path)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        mode = requested_mode(request)
+        if mode is None or not is_staff(request):
+            return self.get_response(request)
+
+        profile_id = uuid.uuid4().hex
+        response = self.profile(request, mode, profile_id)
+        response["X-Request-ID"] = profile_id
+        response[HEADER] = request.build_absolute_uri(
+            reverse(
+                "theatre:profile",
+                kwargs={"profile_id": profile_id, "extension": MODES[mode]},
+            )
+        )
+        return response
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
@@ -0,0 +1,241 @@
+"""
+Slow query log.
+
+``log_slow_query`` wraps every database connection. A query that takes at
+least ``settings.SLOW_QUERIES["THRESHOLD_MS"]`` is logged as one JSON line
+on the ``theatre.queries`` logger and appended to ``SLOW_QUERIES["PATH"]``.
+The record holds its duration, its fingerprint (the SQL with literals and
+IN lists collapsed, so the same query from any call shares one) and the
+view action, method and path of the request that issued it. Parameter
+values are never logged.
+
+A share of the slow SELECTs (``EXPLAIN_SAMPLE_RATE``) is run again under
+``EXPLAIN (ANALYZE, BUFFERS)`` on PostgreSQL, or ``EXPLAIN QUERY PLAN`` on
+SQLite, and the plan is added to the record. ANALYZE executes the query a
+second time, so keep the rate low.
+
+``manage.py slow_queries`` aggregates the file per fingerprint: count,
+total time and percentiles, worst first.
+"""
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DatabaseError, NotSupportedError, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils import timezone
+
+from theatre.metrics import view_label
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "THRESHOLD_MS": 100.0,
+    "EXPLAIN_SAMPLE_RATE": 0.0,
+    "PATH": "",
+}
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|\?")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_LISTS = re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+")
+_SPACE = re.compile(r"\s+")
+
+_request = ContextVar("slow_query_request", default=None)
+_explaining = ContextVar("slow_query_explaining", default=False)
+_write_lock = threading.Lock()
+
+
+def get_setting(name):
+    return getattr(settings, "SLOW_QUERIES", {}).get(name, DEFAULTS[name])
+
+
+def fingerprint(sql):
+    """`sql` with literals, placeholders and value lists collapsed."""
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _LIST.sub("(...)", sql)
+    sql = _LISTS.sub("(...)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+def request_labels():
+    request = _request.get()
+    if request is None:
+        return {"view": None, "method": None, "path": None}
+    return {
+        "view": view_label(request),
+        "method": request.method,
+        "path": request.path,
+    }
+
+
+def explain_sampled(sql):
+    rate = get_setting("EXPLAIN_SAMPLE_RATE")
+    return (
+        rate > 0
+        and sql.lstrip()[:6].upper() == "SELECT"
+        and (rate >= 1 or random.random() < rate)
+    )
+
+
+def explain(connection, sql, params):
+    """The plan of `sql`, run again under EXPLAIN in a savepoint."""
+    if connection.vendor == "postgresql":
+        prefix = connection.ops.explain_query_prefix(
+            analyze=True, buffers=True
+        )
+    else:
+        prefix = connection.ops.explain_query_prefix()
+    token = _explaining.set(True)
+    try:
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(f"{prefix} {sql}", params)
+                rows = cursor.fetchall()
+    except (DatabaseError, NotSupportedError) as error:
+        return f"EXPLAIN failed: {error}"
+    finally:
+        _explaining.reset(token)
+    # PostgreSQL returns one line per row, SQLite the detail last.
+    return "\n".join(str(row[-1]) for row in rows)
+
+
+def write(record):
+    path = get_setting("PATH")
+    if not path:
+        return
+    line = json.dumps(record) + "\n"
+    try:
+        with _write_lock, open(path, "a") as output:
+            output.write(line)
+    except OSError:
+        logger.exception("Cannot write the slow query log to %s.", path)
+
+
+def log_query(connection, sql, params, many, seconds, failed):
+    record = {
+        "time": timezone.now().isoformat(),
+        "alias": connection.alias,
+        "fingerprint": fingerprint(sql),
+        "sql": sql,
+        "duration_ms": round(seconds * 1000, 2),
+        "many": many,
+        "failed": failed,
+        **request_labels(),
+    }
+    if not failed and not many and explain_sampled(sql):
+        record["plan"] = explain(connection, sql, params)
+    logger.info(json.dumps(record), extra={"slow_query": record})
+    write(record)
+
+
+def log_slow_query(execute, sql, params, many, context):
+    if _explaining.get():
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    failed = True
+    try:
+        result = execute(sql, params, many, context)
+        failed = False
+        return result
+    finally:
+        elapsed = time.perf_counter() - started
+        if elapsed * 1000 >= get_setting("THRESHOLD_MS"):
+            log_query(
+                context["connection"], sql, params, many, elapsed, failed
+            )
+
+
+@receiver(connection_created)
+def install_slow_query_log(sender, connection, **kwargs):
+    if log_slow_query not in connection.execute_wrappers:
+        # See theatre.timing.install_query_timer.
+        connection.execute_wrappers.insert(0, log_slow_query)
+
+
+def read_log(path):
+    """The records of the slow query log at `path`, skipping torn lines."""
+    with open(path) as source:
+        for line in source:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def aggregate(records):
+    """Per-fingerprint statistics of `records`, by total time, worst first."""
+    groups = {}
+    for record in records:
+        group = groups.setdefault(
+            record["fingerprint"],
+            {
+                "fingerprint": record["fingerprint"],
+                "durations": [],
+                "views": Counter(),
+                "plan": None,
+            },
+        )
+        group["durations"].append(record["duration_ms"])
+        group["views"][record.get("view") or "-"] += 1
+        if record.get("plan"):
+            group["plan"] = record["plan"]
+
+    statistics = []
+    for group in groups.values():
+        durations = group.pop("durations")
+        group.update(
+            count=len(durations),
+            total_ms=sum(durations),
+            p50_ms=percentile(durations, 0.5),
+            p95_ms=percentile(durations, 0.95),
+            p99_ms=percentile(durations, 0.99),
+            max_ms=max(durations),
+        )
+        statistics.append(group)
+    statistics.sort(key=lambda group: group["total_ms"], reverse=True)
+    return statistics
+
+
+class SlowQueryMiddleware:
+    """Make the current request known to the slow query log."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _request.reset(token)
+
+    async def __acall__(self, request):
+        token = _request.set(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            _request.reset(token)
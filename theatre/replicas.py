@@ -0,0 +1,166 @@
+"""
+Read-replica routing.
+
+ReplicaRoutingMiddleware marks safe (GET/HEAD/OPTIONS) requests as eligible
+for replica reads; ReplicaRouter then sends their reads to one of the
+aliases in ``settings.REPLICA_ROUTING["REPLICAS"]``. Everything else, paths
+listed in PRIMARY_ONLY_PATHS and, for PIN_SECONDS after they wrote, every
+request of a user, stays on the primary so users always read their own
+writes.
+
+The pin travels with the client as a signed, timestamped cookie, so every
+worker process sees it. It is also stored in the default cache for clients
+that drop cookies; that only spans workers with a shared cache backend.
+"""
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+DEFAULTS = {
+    "REPLICAS": [],
+    "PIN_SECONDS": 5,
+    "PRIMARY_ONLY_PATHS": [],
+}
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+PIN_COOKIE = "replica_pin"
+PIN_SALT = "theatre.replicas.pin"
+
+_use_replica = ContextVar("use_replica", default=False)
+
+
+def get_setting(name):
+    return getattr(settings, "REPLICA_ROUTING", {}).get(name, DEFAULTS[name])
+
+
+def pin_cache_key(user_id):
+    return f"replicas:pinned:{user_id}"
+
+
+def is_pinned(request, user_id):
+    """Whether `user_id` wrote within PIN_SECONDS, per cookie or cache."""
+    pinned_id = request.get_signed_cookie(
+        PIN_COOKIE,
+        default=None,
+        salt=PIN_SALT,
+        max_age=get_setting("PIN_SECONDS"),
+    )
+    return pinned_id == str(user_id) or bool(
+        cache.get(pin_cache_key(user_id))
+    )
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = get_setting("REPLICAS")
+        if not replicas or not _use_replica.get():
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+
+def request_user_id(request, use_session=True):
+    """
+    Identify the caller from the JWT claim without touching the database,
+    falling back to the session user when `use_session` is set.
+    """
+    if use_session:
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            return user.pk
+
+    authentication = JWTAuthentication()
+    raw_token = authentication.get_raw_token(
+        authentication.get_header(request) or b""
+    )
+    if raw_token is None:
+        return None
+    try:
+        token = authentication.get_validated_token(raw_token)
+    except AuthenticationFailed:
+        return None
+    return token.get(settings.SIMPLE_JWT["USER_ID_CLAIM"])
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _replica_allowed(self, request, user_id):
+        if request.method not in SAFE_METHODS:
+            return False
+        primary_only = tuple(get_setting("PRIMARY_ONLY_PATHS"))
+        if request.path.startswith(primary_only):
+            return False
+        return user_id is None or not is_pinned(request, user_id)
+
+    def _after_response(self, request, response, user_id):
+        if request.method in SAFE_METHODS:
+            return
+        # DRF sets the authenticated user on the underlying request.
+        user = getattr(request, "user", None)
+        if user_id is None and user is not None and user.is_authenticated:
+            user_id = user.pk
+        if user_id is not None:
+            seconds = get_setting("PIN_SECONDS")
+            cache.set(pin_cache_key(user_id), True, seconds)
+            response.set_signed_cookie(
+                PIN_COOKIE,
+                str(user_id),
+                salt=PIN_SALT,
+                max_age=seconds,
+                secure=request.is_secure(),
+                httponly=True,
+                samesite="Lax",
+            )
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not get_setting("REPLICAS"):
+            return self.get_response(request)
+        user_id = request_user_id(request)
+        token = _use_replica.set(self._replica_allowed(request, user_id))
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_replica.reset(token)
+        self._after_response(request, response, user_id)
+        return response
+
+    async def __acall__(self, request):
+        # Resolving a session user would query the database, which is not
+        # allowed on the event loop; async views authenticate with JWT.
+        if not get_setting("REPLICAS"):
+            return await self.get_response(request)
+        user_id = request_user_id(request, use_session=False)
+        token = _use_replica.set(self._replica_allowed(request, user_id))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _use_replica.reset(token)
+        if request.method not in SAFE_METHODS:
+            await sync_to_async(self._after_response)(
+                request, response, user_id
+            )
+        return response
@@ -0,0 +1,77 @@
+import logging
+import random
+import time
+
+from django.db import connection, OperationalError
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from theatre import metrics
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 4
+BASE_DELAY = 0.02
+MAX_DELAY = 0.5
+
+# Postgres SQLSTATEs for serialization_failure and deadlock_detected.
+TRANSIENT_SQLSTATES = {"40001", "40P01"}
+TRANSIENT_MESSAGES = ("database is locked", "deadlock")
+
+
+class RetriesExhausted(OperationalError):
+    """A transient error that persisted through every attempt."""
+
+
+class DatabaseBusy(APIException):
+    """Response to a booking whose retries ran out."""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many concurrent bookings, please retry."
+    default_code = "database_busy"
+    # Sent as Retry-After by DRF's exception handler.
+    wait = 1
+
+
+def is_transient(error):
+    """Whether an OperationalError is worth retrying in a new transaction."""
+    sqlstate = getattr(error.__cause__, "sqlstate", None)
+    if sqlstate in TRANSIENT_SQLSTATES:
+        return True
+    message = str(error).lower()
+    return any(text in message for text in TRANSIENT_MESSAGES)
+
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff for the given (1-based) attempt."""
+    return random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempt))
+
+
+def run_with_retry(func, max_attempts=MAX_ATTEMPTS):
+    """
+    Call `func`, which must open its own transaction, retrying it on
+    deadlocks and serialization failures. Raises RetriesExhausted when
+    the last attempt fails too.
+
+    Inside an outer transaction the failed statement has already aborted
+    the whole block, so no retry is attempted there.
+    """
+    attempt = 1
+    while True:
+        try:
+            return func()
+        except OperationalError as error:
+            if connection.in_atomic_block or not is_transient(error):
+                raise
+            metrics.increment("reservation_transient_errors_total")
+            if attempt >= max_attempts:
+                metrics.increment("reservation_retries_exhausted_total")
+                raise RetriesExhausted(*error.args) from error
+            delay = backoff_delay(attempt)
+            logger.warning(
+                f"Transient error on attempt {attempt}, "
+                f"retrying in {delay:.3f}s: {error}"
+            )
+            metrics.increment("reservation_retries_total")
+            time.sleep(delay)
+            attempt += 1
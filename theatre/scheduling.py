@@ -0,0 +1,176 @@
+"""
+Hall schedule conflicts.
+
+A performance occupies its hall for the half-open range
+[show_time, end_time). On PostgreSQL an exclusion constraint over
+``tstzrange(show_time, end_time)`` per hall rejects overlapping rows; on
+every backend conflicts are looked up before writing so they can be
+reported. Performances last at most MAX_DURATION, so only shows starting
+within that window before a slot can reach into it, which keeps each
+lookup a bounded range scan of the (theatre_hall, show_time) index.
+"""
+from bisect import bisect_left, insort
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from theatre.models import Performance
+
+MAX_DURATION = timedelta(hours=12)
+MAX_SCHEDULE_SLOTS = 1000
+
+DAILY = "daily"
+WEEKLY = "weekly"
+
+
+def overlapping_performances(theatre_hall_id, start, end, exclude_id=None):
+    """Performances in the hall overlapping [start, end)."""
+    queryset = (
+        Performance.objects.filter(
+            theatre_hall_id=theatre_hall_id,
+            show_time__gt=start - MAX_DURATION,
+            show_time__lt=end,
+            end_time__gt=start,
+        )
+        .select_related("play")
+        .order_by("show_time")
+    )
+    if exclude_id is not None:
+        queryset = queryset.exclude(id=exclude_id)
+    return list(queryset)
+
+
+def describe_conflict(performance):
+    if performance.id is None:
+        return (
+            f"Clashes with another slot of this schedule from "
+            f"{performance.show_time.isoformat()} to "
+            f"{performance.end_time.isoformat()}."
+        )
+    return (
+        f"Clashes with '{performance.play.title}' (performance "
+        f"{performance.id}) from {performance.show_time.isoformat()} "
+        f"to {performance.end_time.isoformat()}."
+    )
+
+
+class HallSchedule:
+    """
+    In-memory index of one hall's bookings for checking many slots at once:
+    loaded with a single query over the slots' window, then each check is a
+    binary search over the bookings sorted by start.
+    """
+
+    def __init__(self, bookings=()):
+        self._bookings = sorted(bookings, key=self._key)
+        self._starts = [start for start, _, _ in self._bookings]
+
+    @staticmethod
+    def _key(booking):
+        return booking[0]
+
+    @classmethod
+    def load(cls, theatre_hall_id, start, end):
+        """Bookings of the hall that may overlap anything in [start, end)."""
+        return cls(
+            (performance.show_time, performance.end_time, performance)
+            for performance in Performance.objects.filter(
+                theatre_hall_id=theatre_hall_id,
+                show_time__gt=start - MAX_DURATION,
+                show_time__lt=end,
+            ).select_related("play")
+        )
+
+    def conflicts(self, start, end):
+        """Items of the bookings overlapping [start, end), earliest first."""
+        found = []
+        index = bisect_left(self._starts, end) - 1
+        while index >= 0 and self._starts[index] > start - MAX_DURATION:
+            _, booking_end, item = self._bookings[index]
+            if booking_end > start:
+                found.append(item)
+            index -= 1
+        return found[::-1]
+
+    def add(self, start, end, item):
+        insort(self._bookings, (start, end, item), key=self._key)
+        insort(self._starts, start)
+
+
+def recurrence(
+    first_show,
+    frequency=DAILY,
+    interval=1,
+    weekdays=None,
+    until=None,
+    count=None,
+    limit=MAX_SCHEDULE_SLOTS,
+):
+    """
+    Start times of a recurring run beginning at `first_show`: every
+    `interval` days (DAILY) or weeks (WEEKLY), optionally only on
+    `weekdays` (0 is Monday), until `count` slots or `until`. Slots keep
+    the wall-clock time of `first_show` in its time zone across DST
+    changes. Raises ValueError when the run would exceed `limit` slots.
+    """
+    local = timezone.localtime(first_show)
+    wall_clock, zone = local.replace(tzinfo=None), local.tzinfo
+    if frequency == WEEKLY:
+        weekdays = set(weekdays or [local.weekday()])
+
+    slots = []
+    day = 0
+    while count is None or len(slots) < count:
+        candidate = wall_clock + timedelta(days=day)
+        show_time = timezone.make_aware(candidate, zone)
+        if until is not None and show_time > until:
+            break
+        period = day if frequency == DAILY else day // 7
+        if period % interval == 0 and (
+            not weekdays or candidate.weekday() in weekdays
+        ):
+            if len(slots) == limit:
+                raise ValueError(f"A schedule is limited to {limit} shows.")
+            slots.append(show_time)
+        day += 1
+    return slots
+
+
+def plan_schedule(theatre_hall_id, play, duration, slots):
+    """
+    Split `slots` into unsaved performances that fit the hall and
+    (show_time, clashing performances) pairs, with a single query.
+    """
+    schedule = HallSchedule.load(
+        theatre_hall_id, min(slots), max(slots) + duration
+    )
+    performances, conflicts = [], []
+    for show_time in sorted(slots):
+        performance = Performance(
+            show_time=show_time,
+            duration=duration,
+            end_time=show_time + duration,
+            play=play,
+            theatre_hall_id=theatre_hall_id,
+        )
+        clashes = schedule.conflicts(show_time, performance.end_time)
+        if clashes:
+            conflicts.append((show_time, clashes))
+            continue
+        schedule.add(show_time, performance.end_time, performance)
+        performances.append(performance)
+    return performances, conflicts
+
+
+def create_schedule(theatre_hall_id, play, duration, slots):
+    """
+    Create a performance for every free slot in one transaction and return
+    (created performances, conflicts) as for plan_schedule.
+    """
+    with transaction.atomic():
+        performances, conflicts = plan_schedule(
+            theatre_hall_id, play, duration, slots
+        )
+        Performance.objects.bulk_create(performances)
+    return performances, conflicts
@@ -0,0 +1,131 @@
+from django.db import connection, transaction, IntegrityError
+
+from theatre import metrics
+from theatre.events import publish_seats, SEAT_TAKEN
+from theatre.models import Performance, Reservation, Ticket
+from theatre.retry import run_with_retry, MAX_ATTEMPTS
+
+
+def build_occupancy(theatre_hall, taken_seats):
+    """
+    Return a list of per-row bitmaps where bit (seat - 1) is taken.
+
+    Seats outside the hall are ignored: a hall can be made smaller after
+    tickets for its last rows or seats were sold.
+    """
+    occupancy = [0] * theatre_hall.rows
+    for row, seat in taken_seats:
+        if 1 <= row <= theatre_hall.rows and (
+            1 <= seat <= theatre_hall.seats_in_row
+        ):
+            occupancy[row - 1] |= 1 << (seat - 1)
+    return occupancy
+
+
+def _run_starts(free_mask, count):
+    """Bitmap of positions where `count` consecutive free seats begin."""
+    starts = free_mask
+    for shift in range(1, count):
+        starts &= free_mask >> shift
+    return starts
+
+
+def _rows_by_preference(rows):
+    """Row numbers ordered from the centre of the hall outwards."""
+    centre = (rows + 1) / 2
+    return sorted(range(1, rows + 1), key=lambda row: (abs(row - centre), row))
+
+
+def find_adjacent_seats(theatre_hall, occupancy, count):
+    """
+    Find `count` adjacent free seats, preferring centre rows and,
+    within a row, the run closest to the middle of the row.
+
+    Returns a list of (row, seat) tuples or None if no row has room.
+    """
+    seats_in_row = theatre_hall.seats_in_row
+    if count > seats_in_row:
+        return None
+
+    full_row = (1 << seats_in_row) - 1
+    centre = (seats_in_row - count) / 2
+
+    for row in _rows_by_preference(theatre_hall.rows):
+        free_mask = ~occupancy[row - 1] & full_row
+        starts = _run_starts(free_mask, count)
+        if not starts:
+            continue
+
+        best_start = None
+        while starts:
+            lowest = starts & -starts
+            start = lowest.bit_length() - 1
+            if best_start is None or abs(start - centre) < abs(
+                best_start - centre
+            ):
+                best_start = start
+            starts ^= lowest
+
+        return [
+            (row, seat)
+            for seat in range(best_start + 1, best_start + count + 1)
+        ]
+    return None
+
+
+def reserve_best_available(performance_id, user, count):
+    """
+    Atomically pick and reserve `count` adjacent seats for a performance.
+
+    The performance row is locked for the duration of the transaction so
+    concurrent allocations for the same show are serialized instead of
+    colliding on the ticket unique constraint. Seats taken meanwhile by a
+    regular reservation make the allocation start over.
+    Returns the created reservation or None if no seats are available.
+    """
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            reservation = run_with_retry(
+                lambda: _allocate(performance_id, user, count)
+            )
+        except IntegrityError:
+            metrics.increment("reservation_conflicts_total")
+            if attempt == MAX_ATTEMPTS or connection.in_atomic_block:
+                raise
+        else:
+            if reservation is not None:
+                metrics.increment("reservations_created_total")
+            return reservation
+
+
+def _allocate(performance_id, user, count):
+    with transaction.atomic():
+        performance = (
+            Performance.objects.select_for_update(of=("self",))
+            .select_related("theatre_hall")
+            .get(id=performance_id)
+        )
+        theatre_hall = performance.theatre_hall
+        occupancy = build_occupancy(
+            theatre_hall,
+            Ticket.objects.filter(performance=performance).values_list(
+                "row", "seat"
+            ),
+        )
+        seats = find_adjacent_seats(theatre_hall, occupancy, count)
+        if seats is None:
+            return None
+
+        reservation = Reservation.objects.create(user=user)
+        Ticket.objects.bulk_create(
+            Ticket(
+                row=row,
+                seat=seat,
+                performance=performance,
+                reservation=reservation,
+            )
+            for row, seat in seats
+        )
+        # bulk_create sends no post_save signals, so publish the delta here.
+        publish_seats(SEAT_TAKEN, performance.id, seats)
+        return reservation
@@ -1,7 +1,14 @@
-from django.db import transaction
+from datetime import timedelta
+
+from django.core.exceptions import NON_FIELD_ERRORS
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction, IntegrityError
+from django.db.models.fields.files import FieldFile
 from rest_framework import serializers
 
+from theatre import metrics
 from theatre.models import (
+    DEFAULT_PERFORMANCE_DURATION,
     Genre,
     Actor,
     TheatreHall,
@@ -9,6 +16,17 @@ from theatre.models import (
     Performance,
     Ticket,
     Reservation,
+    ArchivedPerformance,
+    ArchivedTicket,
+)
+from theatre.retry import DatabaseBusy, RetriesExhausted, run_with_retry
+from theatre.scheduling import (
+    DAILY,
+    MAX_DURATION,
+    WEEKLY,
+    describe_conflict,
+    overlapping_performances,
+    recurrence,
 )
 
 
@@ -30,6 +48,27 @@ class TheatreHallSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "rows", "seats_in_row", "capacity")
 
 
+class ImageVariantField(serializers.ImageField):
+    """
+    URL of a precomputed JPEG variant of an image, or of the original
+    until its variants are rendered
+    """
+
+    def __init__(self, variant, **kwargs):
+        self.variant = variant
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if value:
+            variants = value.instance.image_variants.get(self.variant, {})
+            if "jpeg" in variants:
+                value = FieldFile(
+                    value.instance, value.field, variants["jpeg"]
+                )
+        return super().to_representation(value)
+
+
 class PlaySerializer(serializers.ModelSerializer):
     class Meta:
         model = Play
@@ -43,6 +82,7 @@ class PlayListSerializer(PlaySerializer):
     actors = serializers.SlugRelatedField(
         many=True, read_only=True, slug_field="full_name"
     )
+    image = ImageVariantField("card")
 
     class Meta:
         model = Play
@@ -52,10 +92,35 @@ class PlayListSerializer(PlaySerializer):
 class PlayDetailSerializer(PlaySerializer):
     genres = GenreSerializer(many=True, read_only=True)
     actors = ActorSerializer(many=True, read_only=True)
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Play
-        fields = ("id", "title", "description", "actors", "genres", "image")
+        fields = (
+            "id",
+            "title",
+            "description",
+            "actors",
+            "genres",
+            "image",
+            "image_variants",
+        )
+
+    def get_image_variants(self, play) -> dict:
+        """{variant: {format: URL}} of the rendered image variants"""
+        request = self.context.get("request")
+        storage = play.image.storage
+        return {
+            variant: {
+                image_format: (
+                    request.build_absolute_uri(storage.url(name))
+                    if request
+                    else storage.url(name)
+                )
+                for image_format, name in formats.items()
+            }
+            for variant, formats in play.image_variants.items()
+        }
 
 
 class PlayImageSerializer(serializers.ModelSerializer):
@@ -64,15 +129,68 @@ class PlayImageSerializer(serializers.ModelSerializer):
         fields = ("id", "image")
 
 
+def validate_duration(value):
+    if not timedelta(0) < value <= MAX_DURATION:
+        raise serializers.ValidationError(
+            f"Duration must be positive and at most {MAX_DURATION}."
+        )
+    return value
+
+
 class PerformanceSerializer(serializers.ModelSerializer):
     class Meta:
         model = Performance
-        fields = ("id", "show_time", "play", "theatre_hall")
+        fields = (
+            "id",
+            "show_time",
+            "duration",
+            "end_time",
+            "play",
+            "theatre_hall",
+        )
+
+    def validate_duration(self, value):
+        return validate_duration(value)
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+
+        def current(name, default=None):
+            return data.get(name, getattr(self.instance, name, default))
+
+        show_time = current("show_time")
+        theatre_hall = current("theatre_hall")
+        duration = current("duration", DEFAULT_PERFORMANCE_DURATION)
+        conflicts = overlapping_performances(
+            theatre_hall.id,
+            show_time,
+            show_time + duration,
+            exclude_id=self.instance.id if self.instance else None,
+        )
+        if conflicts:
+            raise serializers.ValidationError(
+                {"show_time": [describe_conflict(p) for p in conflicts]}
+            )
+        return data
+
+    def save(self, **kwargs):
+        # A concurrent write can still win the race between the check and
+        # the insert; PostgreSQL's exclusion constraint then rejects it.
+        try:
+            with transaction.atomic():
+                return super().save(**kwargs)
+        except IntegrityError:
+            raise serializers.ValidationError(
+                {
+                    "show_time": "The hall was booked for an overlapping "
+                    "performance in the meantime."
+                }
+            )
 
 
 class PerformanceListSerializer(PerformanceSerializer):
     play_title = serializers.CharField(source="play.title", read_only=True)
-    play_image = serializers.ImageField(source="play.image", read_only=True)
+    play_image = ImageVariantField("thumb", source="play.image")
     theatre_hall_name = serializers.CharField(
         source="theatre_hall.name", read_only=True
     )
@@ -129,14 +247,137 @@ class ReservationSerializer(serializers.ModelSerializer):
         model = Reservation
         fields = ("id", "tickets", "created_at")
 
+    @staticmethod
+    def _ticket_order(ticket_data):
+        return (
+            ticket_data["performance"].id,
+            ticket_data["row"],
+            ticket_data["seat"],
+        )
+
+    @staticmethod
+    def _seats_taken():
+        metrics.increment("reservation_conflicts_total")
+        return serializers.ValidationError(
+            {"tickets": "Some of the requested seats are already taken."}
+        )
+
     def create(self, validated_data):
-        with transaction.atomic():
-            tickets_data = validated_data.pop("tickets")
-            reservation = Reservation.objects.create(**validated_data)
-            for ticket_data in tickets_data:
-                Ticket.objects.create(reservation=reservation, **ticket_data)
-            return reservation
+        # Writing tickets in one global order means two overlapping group
+        # bookings lock seats in the same sequence and cannot deadlock.
+        tickets_data = sorted(
+            validated_data.pop("tickets"), key=self._ticket_order
+        )
+
+        def write_reservation():
+            with transaction.atomic():
+                reservation = Reservation.objects.create(**validated_data)
+                for ticket_data in tickets_data:
+                    Ticket.objects.create(
+                        reservation=reservation, **ticket_data
+                    )
+                return reservation
+
+        try:
+            reservation = run_with_retry(write_reservation)
+        except RetriesExhausted:
+            raise DatabaseBusy()
+        except IntegrityError:
+            raise self._seats_taken()
+        except DjangoValidationError as error:
+            # Ticket.save runs full_clean, so a seat committed by another
+            # reservation since validation fails its unique check instead of
+            # the constraint, and a seat outside the hall its range check.
+            if NON_FIELD_ERRORS in error.message_dict:
+                raise self._seats_taken()
+            raise serializers.ValidationError({"tickets": error.messages})
+        metrics.increment("reservations_created_total")
+        return reservation
+
+
+class ArchivedPerformanceListSerializer(PerformanceListSerializer):
+    class Meta(PerformanceListSerializer.Meta):
+        model = ArchivedPerformance
+
+
+class ArchivedTicketListSerializer(serializers.ModelSerializer):
+    performance = ArchivedPerformanceListSerializer(many=False, read_only=True)
+
+    class Meta:
+        model = ArchivedTicket
+        fields = ("id", "row", "seat", "performance")
 
 
 class ReservationListSerializer(ReservationSerializer):
     tickets = TicketListSerializer(many=True, read_only=True)
+
+    def to_representation(self, instance):
+        """List tickets of archived performances alongside current ones"""
+        data = super().to_representation(instance)
+        data["tickets"] += ArchivedTicketListSerializer(
+            instance.archived_tickets.all(), many=True, context=self.context
+        ).data
+        return data
+
+
+class SeatAllocationSerializer(serializers.Serializer):
+    count = serializers.IntegerField(min_value=1, max_value=50)
+
+
+class PerformanceScheduleSerializer(serializers.Serializer):
+    """A recurring run of performances of one play in one hall"""
+
+    play = serializers.PrimaryKeyRelatedField(queryset=Play.objects.all())
+    theatre_hall = serializers.PrimaryKeyRelatedField(
+        queryset=TheatreHall.objects.all()
+    )
+    duration = serializers.DurationField(
+        default=DEFAULT_PERFORMANCE_DURATION,
+        validators=[validate_duration],
+    )
+    first_show = serializers.DateTimeField()
+    frequency = serializers.ChoiceField(choices=(DAILY, WEEKLY), default=DAILY)
+    interval = serializers.IntegerField(min_value=1, max_value=52, default=1)
+    weekdays = serializers.ListField(
+        child=serializers.IntegerField(min_value=0, max_value=6),
+        required=False,
+        allow_empty=False,
+    )
+    until = serializers.DateTimeField(required=False)
+    count = serializers.IntegerField(min_value=1, required=False)
+
+    def validate(self, attrs):
+        if "until" not in attrs and "count" not in attrs:
+            raise serializers.ValidationError(
+                "Either `until` or `count` is required."
+            )
+        try:
+            attrs["slots"] = recurrence(
+                attrs["first_show"],
+                frequency=attrs["frequency"],
+                interval=attrs["interval"],
+                weekdays=attrs.get("weekdays"),
+                until=attrs.get("until"),
+                count=attrs.get("count"),
+            )
+        except ValueError as error:
+            raise serializers.ValidationError(str(error))
+        if not attrs["slots"]:
+            raise serializers.ValidationError(
+                "The recurrence rule produces no shows."
+            )
+        return attrs
+
+
+class TicketExportFilterSerializer(serializers.Serializer):
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    performance = serializers.IntegerField(min_value=1, required=False)
+
+    def validate(self, attrs):
+        if attrs.get("date_from") and attrs.get("date_to"):
+            if attrs["date_from"] > attrs["date_to"]:
+                raise serializers.ValidationError(
+                    "`date_from` must not be after `date_to`."
+                )
+        return attrs
@@ -0,0 +1,26 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from theatre.events import publish_seats, SEAT_TAKEN, SEAT_RELEASED
+from theatre.models import Ticket
+
+
+@receiver(post_save, sender=Ticket)
+def publish_seat_taken(sender, instance, created, using, **kwargs):
+    if created:
+        publish_seats(
+            SEAT_TAKEN,
+            instance.performance_id,
+            [(instance.row, instance.seat)],
+            using=using,
+        )
+
+
+@receiver(post_delete, sender=Ticket)
+def publish_seat_released(sender, instance, using, **kwargs):
+    publish_seats(
+        SEAT_RELEASED,
+        instance.performance_id,
+        [(instance.row, instance.seat)],
+        using=using,
+    )
@@ -0,0 +1,94 @@
+"""
+Content-addressed media storage.
+
+Files are stored as ``<directory>/<hh>/<sha256>.<ext>``: the directory and
+extension come from the requested name, the rest from the bytes. Identical
+uploads share one file, and a stored name never changes content, so its
+URL can be cached forever.
+
+Saving content that is already stored refreshes the file's modification
+time, and ``delete_if_unused_since`` only deletes files that were not
+written or saved again since a cutoff. Both run under a lock file shared
+by every process using the storage, so a file is never deleted between a
+save finding it and that save's caller recording the name.
+"""
+import fcntl
+import hashlib
+import os
+import re
+from contextlib import contextmanager
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+CONTENT_ADDRESSED_NAME = re.compile(r"(^|/)([0-9a-f]{2})/\2[0-9a-f]{62}\.\w+$")
+LOCK_FILE = ".content-addressed.lock"
+
+
+def content_digest(content):
+    # Set by theatre.uploads.ImageUploadHandler while receiving the file.
+    known = getattr(content, "content_sha256", None)
+    if known:
+        return known
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def is_content_addressed(name):
+    return bool(CONTENT_ADDRESSED_NAME.search(name))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def __init__(self, **kwargs):
+        # Two saves of the same name always carry the same bytes.
+        kwargs.setdefault("allow_overwrite", True)
+        super().__init__(**kwargs)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        digest = content_digest(content)
+        _, extension = os.path.splitext(name)
+        name = "/".join(
+            part
+            for part in (
+                os.path.dirname(name),
+                digest[:2],
+                digest + extension.lower(),
+            )
+            if part
+        )
+        with self.lock():
+            if self.exists(name):
+                os.utime(self.path(name))
+                return name
+        return super().save(name, content, max_length)
+
+    @contextmanager
+    def lock(self):
+        """Exclusive lock over the storage, across processes."""
+        os.makedirs(self.location, exist_ok=True)
+        with open(os.path.join(self.location, LOCK_FILE), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def delete_if_unused_since(self, name, cutoff):
+        """
+        Delete `name` unless it was written, or saved again, after
+        `cutoff`. Return whether it was deleted.
+        """
+        with self.lock():
+            if not self.exists(name) or self.get_modified_time(name) >= cutoff:
+                return False
+            self.delete(name)
+            return True
+
+
+def play_image_storage():
+    return ContentAddressedStorage()
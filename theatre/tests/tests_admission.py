@@ -0,0 +1,242 @@
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import (
+    TestCase,
+    SimpleTestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from theatre.admission import (
+    LocalAdmissionStore,
+    AdmissionGate,
+    get_store,
+    release_connections,
+)
+from theatre.models import Performance, Play, TheatreHall, Reservation
+
+RESERVATION_URL = reverse("theatre:reservation-list")
+
+
+class LocalAdmissionStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.store = LocalAdmissionStore()
+
+    def test_admits_up_to_limit(self):
+        first = self.store.acquire("show", limit=2, timeout=0)
+        second = self.store.acquire("show", limit=2, timeout=0)
+        third = self.store.acquire("show", limit=2, timeout=0)
+
+        self.assertTrue(first.admitted)
+        self.assertTrue(second.admitted)
+        self.assertFalse(third.admitted)
+        self.assertEqual(third.position, 0)
+
+    def test_release_admits_next_in_line(self):
+        first = self.store.acquire("show", limit=1, timeout=0)
+        second = self.store.acquire("show", limit=1, timeout=0)
+        third = self.store.acquire("show", limit=1, timeout=0)
+        self.assertEqual(third.position, 1)
+
+        self.store.release("show", first.ticket)
+
+        resumed_second = self.store.acquire(
+            "show", limit=1, timeout=0, ticket=second.ticket
+        )
+        self.assertTrue(resumed_second.admitted)
+        resumed_third = self.store.acquire(
+            "show", limit=1, timeout=0, ticket=third.ticket
+        )
+        self.assertFalse(resumed_third.admitted)
+        self.assertEqual(resumed_third.position, 0)
+
+    @override_settings(ADMISSION_QUEUE={"TICKET_TTL": 30})
+    def test_parked_ticket_does_not_block_live_waiters(self):
+        first = self.store.acquire("show", limit=1, timeout=0)
+        parked = self.store.acquire("show", limit=1, timeout=0)
+        self.store.release("show", first.ticket)
+
+        live = self.store.acquire("show", limit=1, timeout=1)
+        self.assertTrue(live.admitted)
+
+        resumed = self.store.acquire(
+            "show", limit=1, timeout=0, ticket=parked.ticket
+        )
+        self.assertFalse(resumed.admitted)
+        self.assertEqual(resumed.position, 0)
+        self.store.release("show", live.ticket)
+        resumed = self.store.acquire(
+            "show", limit=1, timeout=0, ticket=parked.ticket
+        )
+        self.assertTrue(resumed.admitted)
+
+    def test_admitted_ticket_cannot_be_presented_again(self):
+        first = self.store.acquire("show", limit=1, timeout=0)
+
+        again = self.store.acquire(
+            "show", limit=1, timeout=0, ticket=first.ticket
+        )
+        self.assertFalse(again.admitted)
+        self.assertNotEqual(again.ticket, first.ticket)
+
+    def test_ticket_belongs_to_its_owner(self):
+        first = self.store.acquire("show", limit=1, timeout=0, owner=1)
+        parked = self.store.acquire("show", limit=1, timeout=0, owner=1)
+        self.store.acquire("show", limit=1, timeout=0, owner=2)
+
+        stolen = self.store.acquire(
+            "show", limit=1, timeout=0, ticket=parked.ticket, owner=2
+        )
+        self.assertNotEqual(stolen.ticket, parked.ticket)
+        self.assertEqual(stolen.position, 2)
+
+        self.store.release("show", first.ticket)
+        resumed = self.store.acquire(
+            "show", limit=1, timeout=0, ticket=parked.ticket, owner=1
+        )
+        self.assertTrue(resumed.admitted)
+
+    def test_before_wait_only_called_when_waiting(self):
+        before_wait = mock.Mock()
+        first = self.store.acquire(
+            "show", limit=1, timeout=1, before_wait=before_wait
+        )
+        self.assertTrue(first.admitted)
+        before_wait.assert_not_called()
+
+        second = self.store.acquire(
+            "show", limit=1, timeout=0.01, before_wait=before_wait
+        )
+        self.assertFalse(second.admitted)
+        before_wait.assert_called_once_with()
+
+    def test_waiter_is_woken_by_release(self):
+        first = self.store.acquire("show", limit=1, timeout=0)
+        result = {}
+
+        def wait_for_slot():
+            result["admission"] = self.store.acquire(
+                "show", limit=1, timeout=5
+            )
+
+        waiter = threading.Thread(target=wait_for_slot)
+        waiter.start()
+        time.sleep(0.05)
+        self.store.release("show", first.ticket)
+        waiter.join()
+
+        self.assertTrue(result["admission"].admitted)
+
+    def test_queues_are_independent(self):
+        self.store.acquire("show-1", limit=1, timeout=0)
+        self.assertTrue(self.store.acquire("show-2", limit=1, timeout=0).admitted)
+
+    @override_settings(ADMISSION_QUEUE={"TICKET_TTL": 0})
+    def test_expired_ticket_does_not_block_queue(self):
+        first = self.store.acquire("show", limit=1, timeout=0)
+        self.store.acquire("show", limit=1, timeout=0)
+        self.store.release("show", first.ticket)
+
+        self.assertTrue(self.store.acquire("show", limit=1, timeout=0).admitted)
+
+
+@override_settings(
+    ADMISSION_QUEUE={"MAX_CONCURRENT_BOOKERS": 1, "MAX_WAIT": 0}
+)
+class ReservationAdmissionTests(TestCase):
+    def setUp(self):
+        get_store().reset()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="user@theatre.com", password="password"
+        )
+        self.client.force_authenticate(self.user)
+        self.performance = Performance.objects.create(
+            play=Play.objects.create(title="Play", description="Text"),
+            theatre_hall=TheatreHall.objects.create(
+                name="Hall", rows=5, seats_in_row=5
+            ),
+            show_time="2024-12-01T19:00:00+00:00",
+        )
+        self.payload = {
+            "tickets": [
+                {"row": 1, "seat": 1, "performance": self.performance.id}
+            ]
+        }
+
+    def test_admitted_request_creates_reservation(self):
+        res = self.client.post(RESERVATION_URL, self.payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_overloaded_request_gets_queue_ticket(self):
+        with AdmissionGate([self.performance.id]):
+            res = self.client.post(
+                RESERVATION_URL, self.payload, format="json"
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res.data["position"], 0)
+        self.assertIn("Retry-After", res)
+        self.assertFalse(Reservation.objects.exists())
+
+        res = self.client.post(
+            RESERVATION_URL,
+            self.payload,
+            format="json",
+            headers={"Queue-Ticket": res.data["queue_ticket"]},
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_slot_released_after_request(self):
+        self.client.post(RESERVATION_URL, self.payload, format="json")
+
+        with AdmissionGate([self.performance.id]) as gate:
+            self.assertIsNone(gate.blocked)
+        self.assertEqual(get_store()._queues, {})
+
+    def test_queue_ticket_of_another_user_is_not_resumed(self):
+        with AdmissionGate([self.performance.id]):
+            res = self.client.post(
+                RESERVATION_URL, self.payload, format="json"
+            )
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        ticket = res.data["queue_ticket"]
+
+        other = get_user_model().objects.create_user(
+            email="other@theatre.com", password="password"
+        )
+        self.client.force_authenticate(other)
+        with AdmissionGate([self.performance.id]):
+            res = self.client.post(
+                RESERVATION_URL,
+                self.payload,
+                format="json",
+                headers={"Queue-Ticket": ticket},
+            )
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertNotEqual(res.data["queue_ticket"], ticket)
+        self.assertEqual(res.data["position"], 1)
+
+
+class ReleaseConnectionsTests(TransactionTestCase):
+    def test_closes_idle_connection(self):
+        Play.objects.exists()
+        self.assertIsNotNone(connection.connection)
+
+        release_connections()
+        self.assertIsNone(connection.connection)
+
+    def test_keeps_connection_in_transaction(self):
+        with transaction.atomic():
+            Play.objects.exists()
+            release_connections()
+            self.assertIsNotNone(connection.connection)
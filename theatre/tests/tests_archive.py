@@ -0,0 +1,104 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from theatre.models import (
+    ArchivedPerformance,
+    ArchivedTicket,
+    Performance,
+    Play,
+    Reservation,
+    TheatreHall,
+    Ticket,
+)
+
+PERFORMANCE_URL = reverse("theatre:performance-list")
+RESERVATION_URL = reverse("theatre:reservation-list")
+
+
+class ArchivePerformancesTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="user@theatre.com", password="password"
+        )
+        self.client.force_authenticate(self.user)
+        play = Play.objects.create(title="Play", description="Text")
+        hall = TheatreHall.objects.create(name="Hall", rows=5, seats_in_row=5)
+        now = timezone.now()
+        self.past = Performance.objects.create(
+            play=play, theatre_hall=hall, show_time=now - timedelta(days=60)
+        )
+        self.upcoming = Performance.objects.create(
+            play=play, theatre_hall=hall, show_time=now + timedelta(days=1)
+        )
+        self.reservation = Reservation.objects.create(user=self.user)
+        for performance in (self.past, self.upcoming):
+            for seat in (1, 2):
+                Ticket.objects.create(
+                    row=1,
+                    seat=seat,
+                    performance=performance,
+                    reservation=self.reservation,
+                )
+        self.past_ticket_ids = set(
+            self.past.tickets.values_list("id", flat=True)
+        )
+
+    def test_moves_old_performances_and_tickets(self):
+        call_command("archive_performances", days=30, stdout=StringIO())
+
+        self.assertEqual(
+            list(Performance.objects.values_list("id", flat=True)),
+            [self.upcoming.id],
+        )
+        self.assertEqual(Ticket.objects.count(), 2)
+        archived = ArchivedPerformance.objects.get()
+        self.assertEqual(archived.id, self.past.id)
+        self.assertEqual(archived.show_time, self.past.show_time)
+        self.assertEqual(
+            set(ArchivedTicket.objects.values_list("id", flat=True)),
+            self.past_ticket_ids,
+        )
+
+    def test_small_batches(self):
+        call_command(
+            "archive_performances", days=30, batch_size=1, stdout=StringIO()
+        )
+        self.assertEqual(ArchivedPerformance.objects.count(), 1)
+
+    def test_dry_run(self):
+        out = StringIO()
+        call_command(
+            "archive_performances", days=30, dry_run=True, stdout=out
+        )
+        self.assertIn("1 performances before", out.getvalue())
+        self.assertEqual(Performance.objects.count(), 2)
+        self.assertFalse(ArchivedPerformance.objects.exists())
+
+    def test_performance_list_only_shows_current(self):
+        call_command("archive_performances", days=30, stdout=StringIO())
+
+        res = self.client.get(PERFORMANCE_URL)
+
+        self.assertEqual(
+            [item["id"] for item in res.data["results"]], [self.upcoming.id]
+        )
+
+    def test_reservation_history_includes_archived_tickets(self):
+        call_command("archive_performances", days=30, stdout=StringIO())
+
+        res = self.client.get(RESERVATION_URL)
+
+        tickets = res.data["results"][0]["tickets"]
+        self.assertEqual(len(tickets), 4)
+        self.assertEqual(
+            {ticket["performance"]["id"] for ticket in tickets},
+            {self.past.id, self.upcoming.id},
+        )
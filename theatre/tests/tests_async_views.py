@@ -0,0 +1,140 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from theatre.models import (
+    Actor,
+    Genre,
+    Performance,
+    Play,
+    Reservation,
+    TheatreHall,
+    Ticket,
+)
+
+
+class AsyncReadViewsTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@theatre.com", password="password"
+        )
+        self.auth = {
+            "Authorization": f"Bearer {AccessToken.for_user(self.user)}"
+        }
+        self.genre = Genre.objects.create(name="Drama")
+        self.actor = Actor.objects.create(first_name="John", last_name="Doe")
+        self.hall = TheatreHall.objects.create(
+            name="Hall", rows=5, seats_in_row=5
+        )
+        self.plays = []
+        for index in range(3):
+            play = Play.objects.create(
+                title=f"Play {index}", description="Text"
+            )
+            play.genres.add(self.genre)
+            play.actors.add(self.actor)
+            self.plays.append(play)
+            Performance.objects.create(
+                play=play,
+                theatre_hall=self.hall,
+                show_time=f"2024-12-0{index + 1}T19:00:00+00:00",
+            )
+        self.performance = Performance.objects.first()
+        Ticket.objects.create(
+            row=1,
+            seat=1,
+            performance=self.performance,
+            reservation=Reservation.objects.create(user=self.user),
+        )
+
+    async def assert_same_as_sync(
+        self, sync_name, async_name, args=None, query=None
+    ):
+        sync_res = await self.async_client.get(
+            reverse(f"theatre:{sync_name}", args=args),
+            query,
+            headers=self.auth,
+        )
+        async_res = await self.async_client.get(
+            reverse(f"theatre:{async_name}", args=args),
+            query,
+            headers=self.auth,
+        )
+        self.assertEqual(async_res.status_code, status.HTTP_200_OK)
+        sync_data, async_data = sync_res.json(), async_res.json()
+        if "results" in sync_data:
+            # Pagination links point at the endpoint that was called.
+            for link in ("next", "previous"):
+                if sync_data[link]:
+                    self.assertEqual(
+                        async_data.pop(link),
+                        sync_data.pop(link).replace(
+                            "/api/theatre/", "/api/theatre/async/"
+                        ),
+                    )
+        self.assertEqual(async_data, sync_data)
+        return async_res
+
+    async def test_genre_list(self):
+        await self.assert_same_as_sync("genre-list", "async-genre-list")
+
+    async def test_actor_list(self):
+        await self.assert_same_as_sync("actor-list", "async-actor-list")
+
+    async def test_play_list_with_filters_and_pagination(self):
+        await self.assert_same_as_sync("play-list", "async-play-list")
+        await self.assert_same_as_sync(
+            "play-list", "async-play-list", query={"title": "1"}
+        )
+        res = await self.assert_same_as_sync(
+            "play-list", "async-play-list", query={"limit": 1, "offset": 1}
+        )
+        self.assertEqual(res.json()["count"], 3)
+        self.assertEqual(len(res.json()["results"]), 1)
+
+    async def test_play_detail(self):
+        await self.assert_same_as_sync(
+            "play-detail", "async-play-detail", args=[self.plays[0].id]
+        )
+
+    async def test_performance_list(self):
+        await self.assert_same_as_sync(
+            "performance-list", "async-performance-list"
+        )
+        await self.assert_same_as_sync(
+            "performance-list",
+            "async-performance-list",
+            query={"date": "2024-12-02"},
+        )
+
+    async def test_performance_detail(self):
+        res = await self.assert_same_as_sync(
+            "performance-detail",
+            "async-performance-detail",
+            args=[self.performance.id],
+        )
+        self.assertEqual(
+            res.json()["taken_places"], [{"row": 1, "seat": 1}]
+        )
+
+    async def test_missing_object(self):
+        res = await self.async_client.get(
+            reverse("theatre:async-play-detail", args=[0]), headers=self.auth
+        )
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_auth_required(self):
+        res = await self.async_client.get(
+            reverse("theatre:async-performance-list")
+        )
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_read_only(self):
+        res = await self.async_client.post(
+            reverse("theatre:async-genre-list"), {}, headers=self.auth
+        )
+        self.assertEqual(
+            res.status_code, status.HTTP_405_METHOD_NOT_ALLOWED
+        )
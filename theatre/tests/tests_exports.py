@@ -0,0 +1,187 @@
+import csv
+import json
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from theatre.exports import HEADER, export_querysets, stream_export
+from theatre.models import (
+    Performance,
+    Play,
+    Reservation,
+    TheatreHall,
+    Ticket,
+)
+
+
+def export_url(file_format):
+    return reverse("theatre:ticket-export", args=[file_format])
+
+
+class TicketExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_user(
+            email="admin@theatre.com", password="password", is_staff=True
+        )
+        self.buyer = get_user_model().objects.create_user(
+            email="buyer@theatre.com", password="password"
+        )
+        play = Play.objects.create(title="Hamlet", description="...")
+        hall = TheatreHall.objects.create(name="Main", rows=5, seats_in_row=5)
+        self.performances = [
+            Performance.objects.create(
+                play=play,
+                theatre_hall=hall,
+                show_time=datetime(2024, 12, day, 19, tzinfo=timezone.utc),
+            )
+            for day in (1, 2)
+        ]
+        for day, performance in zip((10, 20), self.performances):
+            reservation = Reservation.objects.create(user=self.buyer)
+            Reservation.objects.filter(id=reservation.id).update(
+                created_at=datetime(2024, 11, day, 12, tzinfo=timezone.utc)
+            )
+            for seat in (1, 2):
+                Ticket.objects.create(
+                    row=1,
+                    seat=seat,
+                    performance=performance,
+                    reservation=reservation,
+                )
+
+    def get_export(self, file_format, **params):
+        self.client.force_authenticate(self.admin)
+        res = self.client.get(export_url(file_format), params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        return b"".join(res.streaming_content).decode()
+
+    def test_admin_required(self):
+        res = self.client.get(export_url("csv"))
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.force_authenticate(self.buyer)
+        res = self.client.get(export_url("csv"))
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_csv_export(self):
+        rows = list(csv.reader(StringIO(self.get_export("csv"))))
+
+        self.assertEqual(rows[0], list(HEADER))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(
+            rows[1][1:],
+            [
+                "1",
+                "1",
+                str(self.performances[0].id),
+                "2024-12-01T19:00:00+00:00",
+                "Hamlet",
+                "Main",
+                rows[1][7],
+                "2024-11-10T12:00:00+00:00",
+                "buyer@theatre.com",
+            ],
+        )
+
+    def test_ndjson_export_filters(self):
+        body = self.get_export(
+            "ndjson", date_from="2024-11-15", date_to="2024-11-20"
+        )
+        records = [json.loads(line) for line in body.splitlines()]
+
+        self.assertEqual(len(records), 2)
+        self.assertEqual(
+            {record["performance"] for record in records},
+            {self.performances[1].id},
+        )
+        self.assertEqual(records[0]["user"], "buyer@theatre.com")
+
+        body = self.get_export(
+            "ndjson", performance=self.performances[0].id
+        )
+        self.assertEqual(len(body.splitlines()), 2)
+
+    def test_archived_tickets_are_exported(self):
+        call_command("archive_performances", days=30, stdout=StringIO())
+        self.assertFalse(Ticket.objects.exists())
+
+        rows = list(csv.reader(StringIO(self.get_export("csv"))))[1:]
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0][4], "2024-12-01T19:00:00+00:00")
+        self.assertEqual(rows[0][5:7], ["Hamlet", "Main"])
+        self.assertEqual(rows[0][9], "buyer@theatre.com")
+
+        body = self.get_export(
+            "ndjson",
+            date_from="2024-11-15",
+            performance=self.performances[1].id,
+        )
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(records), 2)
+        self.assertEqual(
+            {record["performance"] for record in records},
+            {self.performances[1].id},
+        )
+
+    def test_invalid_requests(self):
+        self.client.force_authenticate(self.admin)
+
+        res = self.client.get(
+            export_url("csv"),
+            {"date_from": "2024-12-01", "date_to": "2024-11-01"},
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        res = self.client.get("/api/theatre/exports/tickets.xlsx")
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_rows_are_read_lazily_in_blocks(self):
+        with self.assertNumQueries(0):
+            blocks = stream_export(
+                export_querysets(), "ndjson", chunk_size=2
+            )
+        # Archived tickets are only read once the current ones are out.
+        with self.assertNumQueries(1):
+            first = next(blocks)
+            second = next(blocks)
+        with self.assertNumQueries(1):
+            rest = list(blocks)
+
+        self.assertEqual(first.count("\n"), 1)
+        self.assertEqual(second.count("\n"), 2)
+        self.assertEqual([block.count("\n") for block in rest], [1])
+
+    async def test_asgi_export_is_streamed_asynchronously(self):
+        res = await self.async_client.get(
+            export_url("csv"),
+            headers={
+                "Authorization": f"Bearer {AccessToken.for_user(self.admin)}"
+            },
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.is_async)
+
+        body = b"".join([block async for block in res.streaming_content])
+        rows = list(csv.reader(StringIO(body.decode())))
+        self.assertEqual(rows[0], list(HEADER))
+        self.assertEqual(len(rows), 5)
+
+    def test_command(self):
+        out = StringIO()
+        call_command(
+            "export_tickets",
+            file_format="ndjson",
+            performance=self.performances[1].id,
+            stdout=out,
+        )
+
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([record["seat"] for record in records], [1, 2])
@@ -0,0 +1,88 @@
+from collections import Counter
+from datetime import date
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import TestCase
+
+from theatre.models import (
+    Actor,
+    Genre,
+    Performance,
+    Play,
+    Reservation,
+    TheatreHall,
+    Ticket,
+)
+
+OPTIONS = {
+    "halls": 3,
+    "actors": 50,
+    "plays": 30,
+    "users": 20,
+    "days": 7,
+    "start": date(2025, 3, 1),
+    "batch_size": 500,
+}
+
+
+def generate(**options):
+    call_command(
+        "generate_dataset", stdout=StringIO(), **{**OPTIONS, **options}
+    )
+
+
+def snapshot():
+    return (
+        list(TheatreHall.objects.values_list().order_by("id")),
+        list(Play.objects.values_list("id", "title").order_by("id")),
+        list(Performance.objects.values_list().order_by("id")),
+        list(Ticket.objects.values_list().order_by("id")),
+    )
+
+
+class GenerateDatasetTests(TestCase):
+    def test_generates_requested_volumes(self):
+        generate()
+
+        self.assertEqual(TheatreHall.objects.count(), 3)
+        self.assertEqual(Actor.objects.count(), 50)
+        self.assertEqual(Play.objects.count(), 30)
+        self.assertEqual(get_user_model().objects.count(), 20)
+        self.assertTrue(Genre.objects.exists())
+        # Two shows per hall and day.
+        self.assertEqual(Performance.objects.count(), 3 * 7 * 2)
+        self.assertGreater(Ticket.objects.count(), 0)
+        self.assertFalse(
+            Reservation.objects.annotate(n=Count("tickets"))
+            .filter(n=0)
+            .exists()
+        )
+        for ticket in Ticket.objects.select_related(
+            "performance__theatre_hall"
+        )[:200]:
+            ticket.clean()
+
+    def test_same_seed_same_data(self):
+        generate()
+        first = snapshot()
+        for model in (Ticket, Reservation, Performance, Play, TheatreHall):
+            model.objects.all().delete()
+
+        generate()
+
+        self.assertEqual(snapshot(), first)
+
+    def test_popularity_skew(self):
+        generate(skew=2.0, days=30)
+
+        shows = Counter(Performance.objects.values_list("play", flat=True))
+        [(_, top)] = shows.most_common(1)
+        self.assertGreater(top, Performance.objects.count() / 4)
+        sold = Counter(
+            Ticket.objects.values_list("performance__play", flat=True)
+        )
+        [(top_play, _)] = shows.most_common(1)
+        self.assertEqual(sold.most_common(1)[0][0], top_play)
@@ -0,0 +1,58 @@
+from unittest import mock
+
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from theatre.health import pool_stats
+
+READINESS_URL = reverse("readiness")
+
+
+class ReadinessTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_ready_without_authentication(self):
+        res = self.client.get(READINESS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["status"], "ready")
+        self.assertTrue(res.data["database"]["available"])
+
+    def test_unavailable_database(self):
+        with mock.patch(
+            "theatre.health.database_is_available", return_value=False
+        ):
+            res = self.client.get(READINESS_URL)
+
+        self.assertEqual(
+            res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+
+class PoolStatsTests(TestCase):
+    def test_no_pool(self):
+        with mock.patch("theatre.health.connections") as connections:
+            connections.__getitem__.return_value.pool = None
+            self.assertIsNone(pool_stats())
+
+    def test_saturation(self):
+        pool = mock.Mock(min_size=2, max_size=10)
+        pool.get_stats.return_value = {
+            "pool_min": 2,
+            "pool_max": 10,
+            "pool_size": 8,
+            "pool_available": 0,
+            "requests_waiting": 3,
+            "requests_num": 100,
+        }
+        with mock.patch("theatre.health.connections") as connections:
+            connections.__getitem__.return_value.pool = pool
+            stats = pool_stats()
+
+        self.assertEqual(stats["in_use"], 8)
+        self.assertEqual(stats["saturation"], 0.8)
+        self.assertEqual(stats["waiting"], 3)
+        self.assertEqual(stats["requests_total"], 100)
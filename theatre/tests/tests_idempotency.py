@@ -0,0 +1,148 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from theatre.models import (
+    IdempotencyKey,
+    Performance,
+    Play,
+    Reservation,
+    TheatreHall,
+    Ticket,
+)
+
+RESERVATION_URL = reverse("theatre:reservation-list")
+
+
+class IdempotentReservationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="user@theatre.com", password="password"
+        )
+        self.client.force_authenticate(self.user)
+        self.performance = Performance.objects.create(
+            play=Play.objects.create(title="Play", description="Text"),
+            theatre_hall=TheatreHall.objects.create(
+                name="Hall", rows=5, seats_in_row=5
+            ),
+            show_time="2024-12-01T19:00:00+00:00",
+        )
+        self.payload = {
+            "tickets": [
+                {"row": 1, "seat": 1, "performance": self.performance.id}
+            ]
+        }
+
+    def post(self, key, payload=None):
+        return self.client.post(
+            RESERVATION_URL,
+            payload or self.payload,
+            format="json",
+            headers={"Idempotency-Key": key},
+        )
+
+    def test_replay_returns_stored_response(self):
+        first = self.post("key-1")
+        with self.assertNumQueries(1):
+            second = self.post("key-1")
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(Reservation.objects.count(), 1)
+        self.assertEqual(Ticket.objects.count(), 1)
+
+    def test_keys_are_scoped_per_user(self):
+        self.post("key-1")
+        other = get_user_model().objects.create_user(
+            email="other@theatre.com", password="password"
+        )
+        self.client.force_authenticate(other)
+        payload = {
+            "tickets": [
+                {"row": 2, "seat": 2, "performance": self.performance.id}
+            ]
+        }
+
+        res = self.post("key-1", payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Reservation.objects.count(), 2)
+
+    def test_reused_key_with_different_body(self):
+        self.post("key-1")
+        payload = {
+            "tickets": [
+                {"row": 2, "seat": 2, "performance": self.performance.id}
+            ]
+        }
+
+        res = self.post("key-1", payload)
+
+        self.assertEqual(
+            res.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+
+    def test_client_errors_are_stored(self):
+        payload = {"tickets": []}
+        first = self.post("key-1", payload)
+        second = self.post("key-1", payload)
+
+        self.assertEqual(first.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+
+    @override_settings(IDEMPOTENCY={"WAIT": 0})
+    def test_in_progress_duplicate_gets_conflict(self):
+        self.post("key-1")
+        IdempotencyKey.objects.update(status_code=None, response_body=None)
+
+        res = self.post("key-1")
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_expired_key_is_reused(self):
+        self.post("key-1")
+        IdempotencyKey.objects.update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        payload = {
+            "tickets": [
+                {"row": 2, "seat": 2, "performance": self.performance.id}
+            ]
+        }
+
+        res = self.post("key-1", payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Reservation.objects.count(), 2)
+
+    def test_requests_without_key_are_not_stored(self):
+        self.client.post(RESERVATION_URL, self.payload, format="json")
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_purge_deletes_expired_keys(self):
+        self.post("key-1")
+        self.post("key-2")
+        self.post("key-3")
+        IdempotencyKey.objects.exclude(key="key-3").update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        out = StringIO()
+
+        call_command("purge_idempotency_keys", batch_size=1, stdout=out)
+
+        self.assertEqual(
+            list(IdempotencyKey.objects.values_list("key", flat=True)),
+            ["key-3"],
+        )
+        self.assertIn("Deleted 2 expired idempotency keys.", out.getvalue())
@@ -0,0 +1,284 @@
+import os
+import shutil
+import tempfile
+import time
+from io import BytesIO, StringIO
+
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from theatre.images import VARIANTS, render_variants, stored_files
+from theatre.models import Performance, Play, TheatreHall
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def image_file(name="poster.png", size=(1200, 1800), mode="RGBA"):
+    buffer = BytesIO()
+    Image.new(mode, size, (200, 30, 30, 128)[: len(mode)]).save(
+        buffer, format="PNG"
+    )
+    return SimpleUploadedFile(name, buffer.getvalue(), "image/png")
+
+
+def backdate(storage, names, hours=1):
+    """Make stored files look last written `hours` ago."""
+    past = time.time() - hours * 3600
+    for name in names:
+        os.utime(storage.path(name), (past, past))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, PLAY_IMAGES={"WORKERS": 0})
+class PlayImageTestCase(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_superuser(
+                "admin@theatre.com", "password"
+            )
+        )
+        self.play = Play.objects.create(title="Hamlet", description="...")
+
+    def upload(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(
+                reverse("theatre:play-upload-image", args=[self.play.id]),
+                {"image": image_file(**kwargs)},
+                format="multipart",
+            )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.play.refresh_from_db()
+
+
+class PlayImageVariantTests(PlayImageTestCase):
+    def test_render_variants(self):
+        self.play.image = image_file()
+        self.play.save()
+
+        variants = render_variants(self.play.image.name)
+
+        self.assertEqual(set(variants), set(VARIANTS))
+        storage = self.play.image.storage
+        for variant, (width, height) in VARIANTS.items():
+            with storage.open(variants[variant]["jpeg"]) as file:
+                with Image.open(file) as image:
+                    self.assertEqual(image.format, "JPEG")
+                    self.assertEqual(image.mode, "RGB")
+                    self.assertLessEqual(image.width, width)
+                    self.assertLessEqual(image.height, height)
+            with storage.open(variants[variant]["webp"]) as file:
+                with Image.open(file) as image:
+                    self.assertEqual(image.format, "WEBP")
+        # Never upscaled: the original is smaller than the full box.
+        with storage.open(variants["full"]["jpeg"]) as file:
+            self.assertEqual(Image.open(file).size, (1200, 1800))
+        # Stored like originals, not in the original's shard directory.
+        for formats in variants.values():
+            for name in formats.values():
+                self.assertRegex(
+                    name, r"^uploads/plays/([0-9a-f]{2})/\1[0-9a-f]{62}\."
+                )
+
+    def test_upload_renders_variants(self):
+        self.upload()
+
+        self.assertEqual(set(self.play.image_variants), set(VARIANTS))
+        res = self.client.get(reverse("theatre:play-list"))
+        variants = self.play.image_variants
+        self.assertTrue(
+            res.data["results"][0]["image"].endswith(variants["card"]["jpeg"])
+        )
+        res = self.client.get(
+            reverse("theatre:play-detail", args=[self.play.id])
+        )
+        self.assertTrue(res.data["image"].endswith(".png"))
+        self.assertTrue(
+            res.data["image_variants"]["full"]["webp"].endswith(
+                variants["full"]["webp"]
+            )
+        )
+
+        hall = TheatreHall.objects.create(name="Main", rows=5, seats_in_row=5)
+        Performance.objects.create(
+            play=self.play, theatre_hall=hall, show_time="2024-12-01T19:00Z"
+        )
+        res = self.client.get(reverse("theatre:performance-list"))
+        self.assertTrue(
+            res.data["results"][0]["play_image"].endswith(
+                variants["thumb"]["jpeg"]
+            )
+        )
+
+    def test_original_served_until_variants_exist(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            self.client.post(
+                reverse("theatre:play-upload-image", args=[self.play.id]),
+                {"image": image_file(mode="RGB")},
+                format="multipart",
+            )
+
+        res = self.client.get(reverse("theatre:play-list"))
+        self.assertTrue(res.data["results"][0]["image"].endswith(".png"))
+
+    def test_backfill_command(self):
+        self.play.image = image_file()
+        self.play.save()
+        Play.objects.create(title="No image", description="...")
+
+        call_command("generate_image_variants", workers=0, stdout=StringIO())
+
+        self.play.refresh_from_db()
+        self.assertEqual(set(self.play.image_variants), set(VARIANTS))
+
+
+class PlayImageGarbageTests(PlayImageTestCase):
+    def files(self):
+        return stored_files(self.play.image.name, self.play.image_variants)
+
+    def test_identical_uploads_share_files(self):
+        other = Play.objects.create(title="Macbeth", description="...")
+        other.image = image_file()
+        other.save()
+
+        self.upload()
+
+        self.assertEqual(self.play.image.name, other.image.name)
+
+    def test_replaced_image_is_deleted(self):
+        self.upload()
+        old_files = self.files()
+        storage = self.play.image.storage
+        backdate(storage, old_files)
+
+        self.upload(mode="RGB")
+
+        self.assertEqual(len(old_files), 7)
+        for name in old_files:
+            self.assertFalse(storage.exists(name))
+        for name in self.files():
+            self.assertTrue(storage.exists(name))
+
+    def test_replaced_image_kept_while_upload_in_flight(self):
+        self.upload()
+        storage = self.play.image.storage
+        backdate(storage, self.files())
+        original = self.play.image.name
+        # Another play's upload of the same poster, not yet committed.
+        self.assertEqual(
+            storage.save("uploads/plays/macbeth.png", image_file()), original
+        )
+
+        self.upload(mode="RGB")
+
+        self.assertTrue(storage.exists(original))
+
+    def test_replaced_image_kept_while_referenced(self):
+        self.upload()
+        other = Play.objects.create(
+            title="Macbeth",
+            description="...",
+            image=self.play.image.name,
+            image_variants=self.play.image_variants,
+        )
+
+        self.upload(mode="RGB")
+
+        for name in stored_files(other.image.name, other.image_variants):
+            self.assertTrue(self.play.image.storage.exists(name))
+
+    def test_reuploading_same_image_keeps_it(self):
+        self.upload()
+        files = self.files()
+
+        self.upload()
+
+        self.assertEqual(self.files(), files)
+        for name in files:
+            self.assertTrue(self.play.image.storage.exists(name))
+
+    def test_collect_image_garbage(self):
+        self.upload()
+        storage = self.play.image.storage
+        orphan = storage.save(
+            "uploads/plays/orphan.png", image_file(mode="RGB")
+        )
+
+        out = StringIO()
+        call_command("collect_image_garbage", min_age=0, stdout=out)
+
+        self.assertIn("Deleted 1 unreferenced files", out.getvalue())
+        self.assertFalse(storage.exists(orphan))
+        for name in self.files():
+            self.assertTrue(storage.exists(name))
+
+    def test_collect_image_garbage_keeps_reused_orphans(self):
+        storage = self.play.image.storage
+        orphan = storage.save("uploads/plays/orphan.png", image_file())
+        backdate(storage, [orphan], hours=2)
+        storage.save("uploads/plays/hamlet.png", image_file())
+
+        out = StringIO()
+        call_command("collect_image_garbage", stdout=out)
+
+        self.assertIn("Deleted 0 unreferenced files", out.getvalue())
+        self.assertTrue(storage.exists(orphan))
+
+    def test_collect_image_garbage_keeps_recent_files(self):
+        orphan = self.play.image.storage.save(
+            "uploads/plays/orphan.png", image_file(mode="RGB")
+        )
+
+        out = StringIO()
+        call_command("collect_image_garbage", dry_run=True, stdout=out)
+        call_command("collect_image_garbage", stdout=out)
+
+        self.assertIn("0 unreferenced files", out.getvalue())
+        self.assertTrue(self.play.image.storage.exists(orphan))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, PLAY_IMAGES={"WORKERS": 0})
+class PlayImageReplacementCommitTests(TransactionTestCase):
+    """Uploads outside a test transaction, as in production."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_superuser(
+                "admin@theatre.com", "password"
+            )
+        )
+        self.play = Play.objects.create(title="Hamlet", description="...")
+
+    def upload(self, **kwargs):
+        res = self.client.post(
+            reverse("theatre:play-upload-image", args=[self.play.id]),
+            {"image": image_file(**kwargs)},
+            format="multipart",
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.play.refresh_from_db()
+        return stored_files(self.play.image.name, self.play.image_variants)
+
+    def test_replaced_image_is_deleted(self):
+        old_files = self.upload()
+        storage = self.play.image.storage
+        backdate(storage, old_files)
+
+        new_files = self.upload(mode="RGB")
+
+        self.assertTrue(old_files)
+        for name in old_files:
+            self.assertFalse(storage.exists(name))
+        for name in new_files:
+            self.assertTrue(storage.exists(name))
@@ -0,0 +1,127 @@
+import json
+import tempfile
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from theatre.models import Actor, Genre, Performance, Play, TheatreHall
+
+
+class ImportCatalogTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content):
+        path = Path(self.directory.name) / name
+        path.write_text(content)
+        return str(path)
+
+    def write_ndjson(self, name, records):
+        return self.write(
+            name, "\n".join(json.dumps(record) for record in records)
+        )
+
+    def import_catalog(self, *paths, **options):
+        out = StringIO()
+        call_command(
+            "import_catalog", *paths, stdout=out, batch_size=2, **options
+        )
+        return out.getvalue()
+
+    def test_import_full_catalog(self):
+        Genre.objects.create(name="Drama")
+        paths = [
+            # Passed out of order on purpose: links come after plays.
+            self.write(
+                "play_genres.csv",
+                "play,genre\nHamlet,Drama\nHamlet,Tragedy\nMacbeth,Nope\n",
+            ),
+            self.write("genres.csv", "name\nDrama\nTragedy\nComedy\n"),
+            self.write(
+                "actors.csv",
+                "first_name,last_name\nAnna,Smith\nBen,Jones\nAnna,Smith\n",
+            ),
+            self.write_ndjson(
+                "plays.ndjson",
+                [
+                    {"title": "Hamlet", "description": "Danish prince"},
+                    {"title": "Macbeth"},
+                ],
+            ),
+            self.write_ndjson(
+                "play_actors.ndjson",
+                [
+                    {"play": "Hamlet", "actor": "Anna Smith"},
+                    {"play": "Macbeth", "actor": "Ben Jones"},
+                ],
+            ),
+            self.write("halls.csv", "name,rows,seats_in_row\nMain,10,20\n"),
+            self.write(
+                "performances.csv",
+                "play,theatre_hall,show_time,duration\n"
+                "Hamlet,Main,2024-12-01T19:00:00Z,02:30:00\n"
+                "Macbeth,Main,2024-12-01T20:00:00Z,\n"
+                "Macbeth,Main,2024-12-02T19:00:00Z,\n",
+            ),
+        ]
+
+        out = self.import_catalog(*paths)
+
+        self.assertEqual(
+            sorted(Genre.objects.values_list("name", flat=True)),
+            ["Comedy", "Drama", "Tragedy"],
+        )
+        self.assertEqual(Actor.objects.count(), 2)
+        hamlet = Play.objects.get(title="Hamlet")
+        self.assertEqual(
+            sorted(hamlet.genres.values_list("name", flat=True)),
+            ["Drama", "Tragedy"],
+        )
+        self.assertEqual(
+            list(hamlet.actors.values_list("last_name", flat=True)),
+            ["Smith"],
+        )
+        self.assertEqual(
+            TheatreHall.objects.get(name="Main").capacity, 200
+        )
+        performance = Performance.objects.get(play=hamlet)
+        self.assertEqual(performance.duration, timedelta(hours=2, minutes=30))
+        self.assertEqual(
+            performance.end_time,
+            datetime(2024, 12, 1, 21, 30, tzinfo=timezone.utc),
+        )
+        # The 20:00 Macbeth overlaps Hamlet in the same hall.
+        self.assertEqual(
+            Performance.objects.filter(play__title="Macbeth").count(), 1
+        )
+        self.assertIn("genres: 2 rows", out)
+        self.assertIn("skipped 1 unknown genre", out)
+        self.assertIn("skipped 1 overlapping", out)
+        self.assertIn("rows/s", out)
+
+    def test_reimport_skips_existing_rows(self):
+        path = self.write("genres.csv", "name\nDrama\n")
+        self.import_catalog(path)
+
+        out = self.import_catalog(path)
+
+        self.assertEqual(Genre.objects.count(), 1)
+        self.assertIn("genres: 0 rows", out)
+
+    def test_invalid_files_rejected(self):
+        with self.assertRaises(CommandError):
+            self.import_catalog(self.write("tickets.csv", "row\n1\n"))
+        with self.assertRaisesMessage(CommandError, "halls.csv:2"):
+            self.import_catalog(
+                self.write("halls.csv", "name,rows,seats_in_row\nA,x,1\n")
+            )
+        with self.assertRaisesMessage(CommandError, "`title` is required"):
+            self.import_catalog(
+                self.write_ndjson("plays.ndjson", [{"description": "?"}])
+            )
+        self.assertFalse(TheatreHall.objects.exists())
@@ -0,0 +1,162 @@
+import os
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from theatre.media import IMMUTABLE_CACHE_CONTROL, byte_range
+from theatre.storage import ContentAddressedStorage
+
+MEDIA_ROOT = tempfile.mkdtemp()
+CONTENT = bytes(range(256)) * 40
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ServeMediaTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(f"{MEDIA_ROOT}/uploads", exist_ok=True)
+        with open(f"{MEDIA_ROOT}/uploads/poster.jpg", "wb") as fileobj:
+            fileobj.write(CONTENT)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def get(self, path="uploads/poster.jpg", **headers):
+        return self.client.get(f"/media/{path}", headers=headers)
+
+    def test_full_file(self):
+        res = self.get()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b"".join(res.streaming_content), CONTENT)
+        self.assertEqual(res["Content-Type"], "image/jpeg")
+        self.assertEqual(res["Content-Length"], str(len(CONTENT)))
+        self.assertEqual(res["Accept-Ranges"], "bytes")
+        self.assertIn("ETag", res)
+        self.assertIn("Last-Modified", res)
+        self.assertNotIn("Cache-Control", res)
+
+    def test_missing_file_and_directory(self):
+        self.assertEqual(self.get("uploads/missing.jpg").status_code, 404)
+        self.assertEqual(self.get("uploads").status_code, 404)
+
+    def test_only_safe_methods(self):
+        res = self.client.post("/media/uploads/poster.jpg")
+
+        self.assertEqual(res.status_code, 405)
+
+    def test_if_none_match(self):
+        etag = self.get()["ETag"]
+
+        res = self.get(if_none_match=etag)
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res["ETag"], etag)
+        self.assertEqual(res.content, b"")
+        self.assertEqual(self.get(if_none_match='"other"').status_code, 200)
+
+    def test_if_modified_since(self):
+        last_modified = self.get()["Last-Modified"]
+
+        res = self.get(if_modified_since=last_modified)
+
+        self.assertEqual(res.status_code, 304)
+
+    def test_range(self):
+        res = self.get(range="bytes=10-19")
+
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(b"".join(res.streaming_content), CONTENT[10:20])
+        self.assertEqual(res["Content-Length"], "10")
+        self.assertEqual(
+            res["Content-Range"], f"bytes 10-19/{len(CONTENT)}"
+        )
+
+    def test_open_and_suffix_ranges(self):
+        res = self.get(range="bytes=10000-")
+        self.assertEqual(b"".join(res.streaming_content), CONTENT[10000:])
+
+        res = self.get(range="bytes=-5")
+        self.assertEqual(b"".join(res.streaming_content), CONTENT[-5:])
+
+    def test_unsatisfiable_range(self):
+        res = self.get(range="bytes=20000-")
+
+        self.assertEqual(res.status_code, 416)
+        self.assertEqual(res["Content-Range"], f"bytes */{len(CONTENT)}")
+
+    def test_if_range(self):
+        etag = self.get()["ETag"]
+
+        self.assertEqual(
+            self.get(range="bytes=0-1", if_range=etag).status_code, 206
+        )
+        res = self.get(range="bytes=0-1", if_range='"stale"')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b"".join(res.streaming_content), CONTENT)
+
+    def test_content_addressed_files(self):
+        name = ContentAddressedStorage().save(
+            "uploads/plays/x.txt", ContentFile(b"hello")
+        )
+
+        res = self.get(name)
+
+        self.assertEqual(res["Cache-Control"], IMMUTABLE_CACHE_CONTROL)
+        digest = name.rsplit("/", 1)[1].split(".")[0]
+        self.assertEqual(res["ETag"], f'"{digest}"')
+        res = self.get(name, if_none_match=f'"{digest}"')
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res["Cache-Control"], IMMUTABLE_CACHE_CONTROL)
+
+    @override_settings(
+        MEDIA_SERVING={
+            "OFFLOAD": "x-accel-redirect",
+            "ACCEL_REDIRECT_LOCATION": "/protected-media/",
+        }
+    )
+    def test_accel_redirect(self):
+        res = self.get(range="bytes=0-1")
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            res["X-Accel-Redirect"], "/protected-media/uploads/poster.jpg"
+        )
+        self.assertEqual(res.content, b"")
+        self.assertEqual(res["Content-Type"], "image/jpeg")
+        self.assertIn("ETag", res)
+
+    @override_settings(MEDIA_SERVING={"OFFLOAD": "x-sendfile"})
+    def test_sendfile(self):
+        res = self.get()
+
+        self.assertEqual(
+            res["X-Sendfile"], os.path.join(MEDIA_ROOT, "uploads/poster.jpg")
+        )
+        self.assertEqual(res.content, b"")
+
+
+class ByteRangeTests(TestCase):
+    def test_byte_range(self):
+        cases = {
+            None: None,
+            "bytes=0-9": (0, 9),
+            "bytes=5-": (5, 99),
+            "bytes=90-200": (90, 99),
+            "bytes=-10": (90, 99),
+            "bytes=-200": (0, 99),
+            "bytes=100-": False,
+            "bytes=-0": False,
+            "bytes=9-5": None,
+            "bytes=-": None,
+            "bytes=0-1,5-6": None,
+            "items=0-1": None,
+        }
+        for header, expected in cases.items():
+            with self.subTest(header=header):
+                self.assertEqual(byte_range(header, 100), expected)
@@ -0,0 +1,263 @@
+import json
+import os
+import tempfile
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from theatre import metrics
+from theatre.models import Genre, Performance, Play, TheatreHall
+
+METRICS_URL = "/metrics"
+
+
+def dead_pid():
+    pid = 4_000_000
+    while metrics.process_alive(pid):
+        pid += 1
+    return pid
+
+
+class RegistryTests(TestCase):
+    def setUp(self):
+        metrics.reset_counters()
+
+    def test_render(self):
+        metrics.increment("reservation_conflicts_total")
+        metrics.increment("cache_requests_total", 2, result="hit")
+        metrics.increment("db_queries_total", 1234567, alias="default")
+        metrics.observe("http_request_duration_seconds", 0.02, view="A.list")
+        metrics.observe("http_request_duration_seconds", 3, view="A.list")
+        metrics.set_gauge("db_pool_size", 4, alias="default")
+
+        text = metrics.render()
+
+        self.assertIn(
+            "# TYPE theatre_reservation_conflicts_total counter\n"
+            "theatre_reservation_conflicts_total 1\n",
+            text,
+        )
+        self.assertIn('theatre_cache_requests_total{result="hit"} 2\n', text)
+        self.assertIn(
+            'theatre_db_queries_total{alias="default"} 1234567\n', text
+        )
+        self.assertIn(
+            "# TYPE theatre_http_request_duration_seconds histogram", text
+        )
+        bucket = "theatre_http_request_duration_seconds_bucket"
+        self.assertIn(f'{bucket}{{view="A.list",le="0.01"}} 0\n', text)
+        self.assertIn(f'{bucket}{{view="A.list",le="0.025"}} 1\n', text)
+        self.assertIn(f'{bucket}{{view="A.list",le="5.0"}} 2\n', text)
+        self.assertIn(f'{bucket}{{view="A.list",le="+Inf"}} 2\n', text)
+        self.assertIn(
+            'theatre_http_request_duration_seconds_sum{view="A.list"} 3.02\n',
+            text,
+        )
+        self.assertIn(
+            'theatre_http_request_duration_seconds_count{view="A.list"} 2\n',
+            text,
+        )
+        self.assertIn('theatre_db_pool_size{alias="default"} 4\n', text)
+
+    def test_label_values_are_escaped(self):
+        self.assertEqual(
+            metrics.format_sample("m", (("path", 'a"b\\c\n'),)),
+            'm{path="a\\"b\\\\c\\n"}',
+        )
+
+    def test_cache_hits_and_misses(self):
+        cache.set("metrics-test", 1)
+
+        cache.get("metrics-test")
+        cache.get("metrics-test")
+        self.assertIsNone(cache.get("metrics-test-missing"))
+
+        counters = metrics.get_counters()
+        self.assertEqual(counters['cache_requests_total{result="hit"}'], 2)
+        self.assertEqual(counters['cache_requests_total{result="miss"}'], 1)
+
+    def test_pool_gauges(self):
+        stats = {
+            "size": 3,
+            "max_size": 10,
+            "available": 1,
+            "in_use": 2,
+            "waiting": 0,
+        }
+        with mock.patch("theatre.health.pool_stats", return_value=stats):
+            text = metrics.render()
+
+        self.assertIn('theatre_db_pool_in_use{alias="default"} 2\n', text)
+        self.assertIn('theatre_db_pool_max_size{alias="default"} 10\n', text)
+
+    def test_multiprocess_aggregation(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        pid = dead_pid()
+        with open(f"{directory.name}/metrics-{pid}.json", "w") as output:
+            json.dump(
+                {
+                    "counters": [["reservations_created_total", [], 5]],
+                    "histograms": [
+                        [
+                            "http_request_duration_seconds",
+                            [["view", "A.list"]],
+                            [1] + [0] * len(metrics.BUCKETS) + [0.001],
+                        ]
+                    ],
+                    "gauges": [["db_pool_size", [["alias", "default"]], 7]],
+                },
+                output,
+            )
+        metrics.increment("reservations_created_total", 2)
+        metrics.observe("http_request_duration_seconds", 0.001, view="A.list")
+        metrics.set_gauge("db_pool_size", 3, alias="default")
+
+        with override_settings(METRICS={"MULTIPROCESS_DIR": directory.name}):
+            text = metrics.render()
+
+        self.assertTrue(
+            os.path.exists(f"{directory.name}/metrics-{os.getpid()}.json")
+        )
+        self.assertIn("theatre_reservations_created_total 7\n", text)
+        self.assertIn(
+            'theatre_http_request_duration_seconds_count{view="A.list"} 2\n',
+            text,
+        )
+        # Gauges of exited processes are dropped, live ones get a pid.
+        self.assertIn(
+            f'theatre_db_pool_size{{alias="default",pid="{os.getpid()}"}} 3',
+            text,
+        )
+        self.assertNotIn(f'pid="{pid}"', text)
+
+    def test_idle_worker_flushes_in_the_background(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = f"{directory.name}/metrics-{os.getpid()}.json"
+
+        def flushed_total():
+            try:
+                with open(path) as source:
+                    counters = json.load(source)["counters"]
+            except (OSError, ValueError):
+                return None
+            return sum(
+                value
+                for name, _, value in counters
+                if name == "reservations_created_total"
+            )
+
+        with override_settings(
+            METRICS={
+                "MULTIPROCESS_DIR": directory.name,
+                "FLUSH_INTERVAL": 0.01,
+            }
+        ):
+            metrics.flush(force=True)
+            # Served after the last request-triggered flush.
+            metrics.increment("reservations_created_total", 3)
+            deadline = time.monotonic() + 5
+            while flushed_total() != 3 and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+        self.assertEqual(flushed_total(), 3)
+
+
+class MetricsEndpointTests(TestCase):
+    def setUp(self):
+        metrics.reset_counters()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "user@theatre.com", "password"
+        )
+        self.admin = get_user_model().objects.create_superuser(
+            "admin@theatre.com", "password"
+        )
+
+    def test_admin_only(self):
+        self.assertEqual(
+            self.client.get(METRICS_URL).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+        self.client.force_authenticate(self.user)
+        self.assertEqual(
+            self.client.get(METRICS_URL).status_code,
+            status.HTTP_403_FORBIDDEN,
+        )
+
+    @override_settings(METRICS={"SCRAPE_TOKEN": "scrape-secret"})
+    def test_scrape_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer scrape-secret")
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], metrics.CONTENT_TYPE)
+
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer wrong-secret")
+        self.assertEqual(
+            self.client.get(METRICS_URL).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+        # The token is good for /metrics only.
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer scrape-secret")
+        self.assertEqual(
+            self.client.get(reverse("theatre:genre-list")).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.admin)}"
+        )
+        self.assertEqual(
+            self.client.get(METRICS_URL).status_code, status.HTTP_200_OK
+        )
+
+    @override_settings(METRICS={})
+    def test_scrape_token_disabled_by_default(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer scrape-secret")
+        self.assertEqual(
+            self.client.get(METRICS_URL).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+
+    def test_request_metrics(self):
+        Genre.objects.create(name="Drama")
+        hall = TheatreHall.objects.create(name="Main", rows=5, seats_in_row=5)
+        play = Play.objects.create(title="Hamlet", description="...")
+        performance = Performance.objects.create(
+            play=play, theatre_hall=hall, show_time="2024-12-01T19:00Z"
+        )
+        self.client.force_authenticate(self.user)
+        self.client.get(reverse("theatre:genre-list"))
+        self.client.get(reverse("theatre:performance-list"))
+        tickets = {
+            "tickets": [{"row": 1, "seat": 1, "performance": performance.id}]
+        }
+        url = reverse("theatre:reservation-list")
+        self.client.post(url, tickets, format="json")
+        self.client.post(url, tickets, format="json")
+        self.client.get("/api/theatre/no-such-path/")
+
+        self.client.force_authenticate(self.admin)
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], metrics.CONTENT_TYPE)
+        text = res.content.decode()
+        count = "theatre_http_request_duration_seconds_count"
+        for labels in (
+            'method="GET",status="200",view="GenreViewSet.list"',
+            'method="GET",status="200",view="PerformanceViewSet.list"',
+            'method="POST",status="201",view="ReservationViewSet.create"',
+            'method="POST",status="400",view="ReservationViewSet.create"',
+            'method="GET",status="404",view="unmatched"',
+        ):
+            self.assertIn(f"{count}{{{labels}}} 1\n", text)
+        self.assertIn("theatre_reservations_created_total 1\n", text)
+        self.assertIn('theatre_db_queries_total{alias="default"}', text)
@@ -1,4 +1,5 @@
 import pytz
+from django.db import connection
 from django.test import TestCase
 from theatre.models import Actor, Genre, Play, TheatreHall, Performance, Ticket
 from datetime import datetime
@@ -49,6 +50,18 @@ class PlayModelTest(TestCase):
         self.assertIn(self.genre, self.play.genres.all())
 
 
+    def test_image_variants_database_default(self):
+        # Bulk writers such as COPY only list some columns.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {Play._meta.db_table} (title, description) "
+                "VALUES (%s, %s)",
+                ["Copied", "Text"],
+            )
+        self.assertEqual(
+            Play.objects.get(title="Copied").image_variants, {}
+        )
+
 class TheatreHallModelTest(TestCase):
     def setUp(self):
         self.hall = TheatreHall.objects.create(
@@ -175,3 +175,65 @@ class AuthenticatedStaffPerformanceTests(TestCase):
         self.assertFalse(
             Performance.objects.filter(id=performance.id).exists()
         )
+
+    def test_create_overlapping_performance_rejected(self):
+        existing = sample_performance()
+        payload = {
+            "play": sample_play(title="Other Play").id,
+            "theatre_hall": existing.theatre_hall.id,
+            "show_time": "2024-12-15T20:30:00+00:00",
+            "duration": "01:30:00",
+        }
+        res = self.client.post(PERFORMANCE_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(res.data["show_time"]), 1)
+        self.assertIn(f"performance {existing.id}", res.data["show_time"][0])
+        self.assertEqual(Performance.objects.count(), 1)
+
+    def test_create_back_to_back_performance(self):
+        existing = sample_performance()
+        payload = {
+            "play": existing.play.id,
+            "theatre_hall": existing.theatre_hall.id,
+            "show_time": "2024-12-15T21:00:00+00:00",
+        }
+        res = self.client.post(PERFORMANCE_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data["end_time"], "2024-12-15T23:00:00Z")
+
+    def test_same_time_in_other_hall_allowed(self):
+        existing = sample_performance()
+        payload = {
+            "play": existing.play.id,
+            "theatre_hall": sample_theatre_hall(name="Small Hall").id,
+            "show_time": "2024-12-15T19:00:00+00:00",
+        }
+        res = self.client.post(PERFORMANCE_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_update_into_overlap_rejected(self):
+        existing = sample_performance()
+        later = Performance.objects.create(
+            play=existing.play,
+            theatre_hall=existing.theatre_hall,
+            show_time="2024-12-16T19:00:00Z",
+        )
+        res = self.client.patch(
+            detail_url(later.id), {"show_time": "2024-12-15T18:00:00Z"}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        res = self.client.patch(detail_url(existing.id), {"duration": "3:00:00"})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        existing.refresh_from_db()
+        self.assertEqual(existing.end_time.hour, 22)
+
+    def test_invalid_duration_rejected(self):
+        existing = sample_performance()
+        res = self.client.patch(detail_url(existing.id), {"duration": "0"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("duration", res.data)
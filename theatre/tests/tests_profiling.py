@@ -0,0 +1,165 @@
+import os
+import pstats
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from theatre.models import Genre
+from theatre.profiling import StackSampler, stack_depth
+from theatre.views import GenreViewSet
+
+GENRE_URL = reverse("theatre:genre-list")
+
+
+def busy_loop(stopped):
+    while not stopped.is_set():
+        pass
+
+
+def slow_queryset(viewset):
+    time.sleep(0.05)
+    return Genre.objects.all()
+
+
+class StackSamplerTests(TestCase):
+    def test_folds_stacks_below_the_skipped_frames(self):
+        stopped = threading.Event()
+        worker = threading.Thread(target=busy_loop, args=(stopped,))
+        worker.start()
+        sampler = StackSampler(worker.ident, 0.001)
+        sampler.start()
+        try:
+            while sum(sampler.stacks.values()) < 5:
+                stopped.wait(0.005)
+        finally:
+            sampler.stop()
+            stopped.set()
+            worker.join()
+
+        stack = next(
+            stack
+            for stack in sampler.stacks
+            if "tests_profiling.busy_loop" in stack
+        )
+        self.assertIn("threading.Thread.run;", stack)
+
+        sampler.skip = stack_depth(sys._getframe())
+        self.assertEqual(sampler.fold(sys._getframe()), "")
+
+
+class ProfilerMiddlewareTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        settings_override = override_settings(
+            PROFILING={"DIRECTORY": self.directory, "INTERVAL": 0.0005}
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        Genre.objects.create(name="Drama")
+        self.client = APIClient()
+        self.staff = get_user_model().objects.create_user(
+            "admin@test.com", "testpass", is_staff=True
+        )
+        self.user = get_user_model().objects.create_user(
+            "user@test.com", "testpass"
+        )
+
+    def authorize(self, user):
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}"
+        )
+
+    def test_ordinary_users_are_not_profiled(self):
+        self.authorize(self.user)
+        response = self.client.get(GENRE_URL, HTTP_X_PROFILE="cprofile")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("X-Profile", response)
+        self.assertNotIn("X-Request-ID", response)
+
+        self.client.credentials()
+        self.client.get(GENRE_URL, {"profile": "sample"})
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer invalid")
+        self.client.get(GENRE_URL, {"profile": "sample"})
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_requests_without_the_flag_are_not_profiled(self):
+        self.authorize(self.staff)
+        response = self.client.get(GENRE_URL)
+        self.assertNotIn("X-Profile", response)
+        response = self.client.get(GENRE_URL, HTTP_X_PROFILE="unknown")
+        self.assertNotIn("X-Profile", response)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_cprofile(self):
+        self.authorize(self.staff)
+        response = self.client.get(GENRE_URL, HTTP_X_PROFILE="cprofile")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"][0]["name"], "Drama")
+
+        request_id = response["X-Request-ID"]
+        self.assertEqual(
+            response["X-Profile"],
+            "http://testserver"
+            + reverse(
+                "theatre:profile",
+                kwargs={"profile_id": request_id, "extension": "prof"},
+            ),
+        )
+        path = os.path.join(self.directory, f"{request_id}.prof")
+        functions = {
+            function for _, _, function in pstats.Stats(path).stats
+        }
+        self.assertIn("list", functions)
+
+    @mock.patch.object(GenreViewSet, "get_queryset", slow_queryset)
+    def test_sample(self):
+        self.authorize(self.staff)
+        response = self.client.get(GENRE_URL, {"profile": "sample"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        request_id = response["X-Request-ID"]
+        self.assertTrue(response["X-Profile"].endswith(f"{request_id}.folded"))
+        path = os.path.join(self.directory, f"{request_id}.folded")
+        with open(path) as folded:
+            lines = folded.read().splitlines()
+        samples = 0
+        for line in lines:
+            stack, count = line.rsplit(" ", 1)
+            self.assertNotIn("ProfilerMiddleware", stack)
+            if stack.endswith("tests_profiling.slow_queryset"):
+                samples += int(count)
+        self.assertGreater(samples, 10)
+
+    def test_download(self):
+        self.authorize(self.staff)
+        response = self.client.get(GENRE_URL, HTTP_X_PROFILE="cprofile")
+        url = response["X-Profile"]
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("attachment", response["Content-Disposition"])
+        self.assertIn(b"dispatch", b"".join(response.streaming_content))
+
+        missing = reverse(
+            "theatre:profile",
+            kwargs={"profile_id": "0" * 32, "extension": "prof"},
+        )
+        self.assertEqual(
+            self.client.get(missing).status_code, status.HTTP_404_NOT_FOUND
+        )
+
+        self.authorize(self.user)
+        self.assertEqual(
+            self.client.get(url).status_code, status.HTTP_403_FORBIDDEN
+        )
@@ -0,0 +1,464 @@
+"""
+Query budgets of every API endpoint.
+
+Each route and method of theatre.urls and user.urls declares the most
+queries it may run and how many of them may repeat the fingerprint of an
+earlier one (an N+1 shows up as repeats). The endpoints run against a
+dataset from ``generate_dataset``, so list pages are full and reservations
+hold tickets of several performances. A route added without a budget
+fails test_every_route_has_a_budget.
+"""
+import difflib
+import os
+import shutil
+import tempfile
+from datetime import date
+from io import StringIO
+from typing import Callable, NamedTuple, Optional
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+import theatre.urls
+import user.urls
+from theatre.models import (
+    Actor,
+    Genre,
+    Performance,
+    Play,
+    TheatreHall,
+    Ticket,
+)
+from theatre.querylog import fingerprint
+from theatre.tests.tests_seat_events import captured_streams
+from theatre.tests.tests_uploads import encoded_image
+
+DATASET = {
+    "halls": 4,
+    "actors": 300,
+    "plays": 80,
+    "users": 40,
+    "days": 10,
+    "start": date(2030, 1, 1),
+    "batch_size": 5000,
+}
+PASSWORD = "budget-pass"
+HTTP_METHODS = ("get", "post", "put", "patch", "delete")
+
+
+class Endpoint(NamedTuple):
+    queries: int
+    duplicates: int = 0
+    # "user", "admin" or None for anonymous requests.
+    user: Optional[str] = "user"
+    # case -> URL kwargs
+    kwargs: Optional[Callable] = None
+    # case -> request body
+    data: Optional[Callable] = None
+    multipart: bool = False
+    # Served under ASGI only; the first chunk of the stream is read.
+    asgi: bool = False
+
+
+def genre(case):
+    return {"pk": case.genre.pk}
+
+
+def actor(case):
+    return {"pk": case.actor.pk}
+
+
+def hall(case):
+    return {"pk": case.hall.pk}
+
+
+def play(case):
+    return {"pk": case.play.pk}
+
+
+def performance(case):
+    return {"pk": case.performance.pk}
+
+
+def play_data(case):
+    return {
+        "title": "Budget",
+        "description": "Text",
+        "genres": [case.genre.pk],
+        "actors": [case.actor.pk],
+    }
+
+
+def performance_data(case):
+    return {
+        "show_time": "2031-06-01T19:00:00Z",
+        "play": case.play.pk,
+        "theatre_hall": case.hall.pk,
+    }
+
+
+BUDGETS = {
+    ("theatre:api-root", "get"): Endpoint(1),
+    ("theatre:genre-list", "get"): Endpoint(3),
+    ("theatre:genre-list", "post"): Endpoint(
+        3, user="admin", data=lambda case: {"name": "Pantomime"}
+    ),
+    ("theatre:genre-detail", "get"): Endpoint(2, kwargs=genre),
+    ("theatre:genre-detail", "put"): Endpoint(
+        4, user="admin", kwargs=genre, data=lambda case: {"name": "Mime"}
+    ),
+    ("theatre:genre-detail", "patch"): Endpoint(
+        4, user="admin", kwargs=genre, data=lambda case: {"name": "Mime"}
+    ),
+    ("theatre:genre-detail", "delete"): Endpoint(
+        4, user="admin", kwargs=genre
+    ),
+    ("theatre:actor-list", "get"): Endpoint(3),
+    ("theatre:actor-list", "post"): Endpoint(
+        2,
+        user="admin",
+        data=lambda case: {"first_name": "Ada", "last_name": "Lee"},
+    ),
+    ("theatre:actor-detail", "get"): Endpoint(2, kwargs=actor),
+    ("theatre:actor-detail", "put"): Endpoint(
+        3,
+        user="admin",
+        kwargs=actor,
+        data=lambda case: {"first_name": "Ada", "last_name": "Lee"},
+    ),
+    ("theatre:actor-detail", "patch"): Endpoint(
+        3, user="admin", kwargs=actor, data=lambda case: {"last_name": "Lee"}
+    ),
+    ("theatre:actor-detail", "delete"): Endpoint(
+        4, user="admin", kwargs=actor
+    ),
+    ("theatre:theatrehall-list", "get"): Endpoint(3),
+    ("theatre:theatrehall-list", "post"): Endpoint(
+        3,
+        user="admin",
+        data=lambda case: {"name": "Studio", "rows": 5, "seats_in_row": 8},
+    ),
+    ("theatre:theatrehall-detail", "get"): Endpoint(2, kwargs=hall),
+    ("theatre:theatrehall-detail", "put"): Endpoint(
+        4,
+        user="admin",
+        kwargs=hall,
+        data=lambda case: {"name": "Studio", "rows": 40, "seats_in_row": 40},
+    ),
+    ("theatre:theatrehall-detail", "patch"): Endpoint(
+        4, user="admin", kwargs=hall, data=lambda case: {"name": "Studio"}
+    ),
+    # Cascades delete tickets 100 ids per statement; the seeded hall has
+    # about 1100 sold seats.
+    ("theatre:theatrehall-detail", "delete"): Endpoint(
+        18, 10, user="admin", kwargs=hall
+    ),
+    ("theatre:play-list", "get"): Endpoint(5),
+    ("theatre:play-list", "post"): Endpoint(11, user="admin", data=play_data),
+    ("theatre:play-detail", "get"): Endpoint(4, kwargs=play),
+    ("theatre:play-detail", "put"): Endpoint(
+        15, user="admin", kwargs=play, data=play_data
+    ),
+    ("theatre:play-detail", "patch"): Endpoint(
+        8, user="admin", kwargs=play, data=lambda case: {"title": "Budget"}
+    ),
+    ("theatre:play-detail", "delete"): Endpoint(9, user="admin", kwargs=play),
+    ("theatre:play-upload-image", "post"): Endpoint(
+        # The save and the release of the old image share a transaction,
+        # a savepoint pair inside the test's.
+        7,
+        user="admin",
+        kwargs=play,
+        data=lambda case: {"image": case.image()},
+        multipart=True,
+    ),
+    ("theatre:performance-list", "get"): Endpoint(3),
+    ("theatre:performance-list", "post"): Endpoint(
+        7, user="admin", data=performance_data
+    ),
+    ("theatre:performance-detail", "get"): Endpoint(5, kwargs=performance),
+    ("theatre:performance-detail", "put"): Endpoint(
+        8, user="admin", kwargs=performance, data=performance_data
+    ),
+    ("theatre:performance-detail", "patch"): Endpoint(
+        6,
+        user="admin",
+        kwargs=performance,
+        data=lambda case: {"show_time": "2031-06-02T19:00:00Z"},
+    ),
+    ("theatre:performance-detail", "delete"): Endpoint(
+        8, 3, user="admin", kwargs=performance
+    ),
+    ("theatre:performance-best-available", "post"): Endpoint(
+        9, kwargs=performance, data=lambda case: {"count": 4}
+    ),
+    ("theatre:performance-schedule", "post"): Endpoint(
+        7,
+        user="admin",
+        data=lambda case: {
+            "play": case.play.pk,
+            "theatre_hall": case.hall.pk,
+            "first_show": "2031-07-01T19:00:00Z",
+            "count": 7,
+        },
+    ),
+    ("theatre:performance-seat-events", "get"): Endpoint(
+        3, kwargs=performance, asgi=True
+    ),
+    ("theatre:reservation-list", "get"): Endpoint(8),
+    # Each of the 3 tickets is validated by the serializer (performance,
+    # seat taken) and again by Ticket.full_clean() before its INSERT.
+    ("theatre:reservation-list", "post"): Endpoint(
+        26,
+        15,
+        data=lambda case: {
+            "tickets": [
+                {"row": row, "seat": seat, "performance": case.performance.pk}
+                for row, seat in case.free_seats[:3]
+            ]
+        },
+    ),
+    # Current and archived tickets are read one after the other.
+    ("theatre:ticket-export", "get"): Endpoint(
+        3, user="admin", kwargs=lambda case: {"file_format": "csv"}
+    ),
+    ("theatre:profile", "get"): Endpoint(
+        1,
+        user="admin",
+        kwargs=lambda case: {"profile_id": "0" * 32, "extension": "folded"},
+    ),
+    ("theatre:async-genre-list", "get"): Endpoint(3),
+    ("theatre:async-actor-list", "get"): Endpoint(3),
+    ("theatre:async-play-list", "get"): Endpoint(5),
+    ("theatre:async-play-detail", "get"): Endpoint(4, kwargs=play),
+    ("theatre:async-performance-list", "get"): Endpoint(3),
+    ("theatre:async-performance-detail", "get"): Endpoint(
+        5, kwargs=performance
+    ),
+    ("user:create", "post"): Endpoint(
+        2,
+        user=None,
+        data=lambda case: {"email": "new@test.com", "password": PASSWORD},
+    ),
+    ("user:token_obtain_pair", "post"): Endpoint(
+        1,
+        user=None,
+        data=lambda case: {"email": case.user.email, "password": PASSWORD},
+    ),
+    ("user:token_refresh", "post"): Endpoint(
+        0,
+        user=None,
+        data=lambda case: {"refresh": str(RefreshToken.for_user(case.user))},
+    ),
+    ("user:token_verify", "post"): Endpoint(
+        0,
+        user=None,
+        data=lambda case: {"token": str(AccessToken.for_user(case.user))},
+    ),
+    ("user:manage", "get"): Endpoint(1),
+    ("user:manage", "put"): Endpoint(
+        3,
+        data=lambda case: {"email": case.user.email, "password": PASSWORD},
+    ),
+    ("user:manage", "patch"): Endpoint(
+        3, data=lambda case: {"email": case.user.email}
+    ),
+}
+
+
+def url_patterns(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from url_patterns(pattern.url_patterns)
+        else:
+            yield pattern
+
+
+def routes():
+    """(namespaced route name, method) of theatre.urls and user.urls."""
+    found = set()
+    for module in (theatre.urls, user.urls):
+        for pattern in url_patterns(module.urlpatterns):
+            view = pattern.callback
+            if getattr(view, "actions", None):
+                # DRF adds "head" to the actions on the first request.
+                methods = [
+                    method for method in view.actions if method in HTTP_METHODS
+                ]
+            elif getattr(view, "view_class", None):
+                methods = [
+                    method
+                    for method in HTTP_METHODS
+                    if hasattr(view.view_class, method)
+                ]
+            else:
+                methods = ["get"]
+            for method in methods:
+                found.add((f"{module.app_name}:{pattern.name}", method))
+    return found
+
+
+def report(queries, budget):
+    """The executed SQL, as a diff against each distinct query once."""
+    executed = [fingerprint(query["sql"]) for query in queries]
+    distinct = list(dict.fromkeys(executed))
+    diff = difflib.unified_diff(
+        distinct, executed, "distinct queries", "executed queries", lineterm=""
+    )
+    listing = "\n".join(
+        f"{number:>3}. {query['sql']}"
+        for number, query in enumerate(queries, 1)
+    )
+    return f"{budget}\n" + "\n".join(diff) + f"\n\nAll queries:\n{listing}"
+
+
+# Also in effect while the dataset is generated: sampled EXPLAINs would be
+# counted as queries, and the slow query log may be the repo's own file.
+@override_settings(
+    SLOW_QUERIES={
+        "THRESHOLD_MS": float("inf"),
+        "EXPLAIN_SAMPLE_RATE": 0,
+        "PATH": "",
+    },
+    REQUEST_TIMING={"SAMPLE_RATE": 0},
+)
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("generate_dataset", stdout=StringIO(), **DATASET)
+        # The customer with the most reservations.
+        cls.user = (
+            get_user_model()
+            .objects.annotate(reservation_count=Count("reservations"))
+            .order_by("-reservation_count")
+            .first()
+        )
+        cls.user.set_password(PASSWORD)
+        cls.user.save()
+        cls.admin = get_user_model().objects.create_user(
+            "admin@test.com", PASSWORD, is_staff=True
+        )
+        cls.genre = Genre.objects.annotate(n=Count("plays")).latest("n")
+        cls.actor = Actor.objects.annotate(n=Count("plays")).latest("n")
+        cls.hall = TheatreHall.objects.first()
+        cls.play = Play.objects.annotate(n=Count("actors")).latest("n")
+        # The busiest show that still has seats for group bookings.
+        cls.performance = (
+            Performance.objects.annotate(sold=Count("tickets"))
+            .order_by("-sold")
+            .filter(
+                theatre_hall__rows__gte=10, theatre_hall__seats_in_row__gte=10
+            )
+            .first()
+        )
+        taken = set(
+            Ticket.objects.filter(performance=cls.performance).values_list(
+                "row", "seat"
+            )
+        )
+        theatre_hall = cls.performance.theatre_hall
+        cls.free_seats = [
+            (row, seat)
+            for row in range(1, theatre_hall.rows + 1)
+            for seat in range(1, theatre_hall.seats_in_row + 1)
+            if (row, seat) not in taken
+        ]
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media_root,
+            PLAY_IMAGES={"WORKERS": 0},
+            PROFILING={"DIRECTORY": self.media_root},
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        with open(os.path.join(self.media_root, "0" * 32 + ".folded"), "w"):
+            pass
+        # Throttling counts requests in the cache.
+        cache.clear()
+
+    @staticmethod
+    def image():
+        return SimpleUploadedFile(
+            "poster.png", encoded_image(), content_type="image/png"
+        )
+
+    def headers(self, endpoint):
+        users = {"user": self.user, "admin": self.admin}
+        if endpoint.user is None:
+            return {}
+        token = AccessToken.for_user(users[endpoint.user])
+        return {"Authorization": f"Bearer {token}"}
+
+    def call(self, route, method, endpoint):
+        """Request `route`; return the status and the body, if not streamed."""
+        kwargs = endpoint.kwargs(self) if endpoint.kwargs else None
+        url = reverse(route, kwargs=kwargs)
+        headers = self.headers(endpoint)
+        if endpoint.asgi:
+            return async_to_sync(self.stream)(url, headers), b""
+        response = getattr(APIClient(headers=headers), method)(
+            url,
+            endpoint.data(self) if endpoint.data else None,
+            format="multipart" if endpoint.multipart else "json",
+        )
+        if response.streaming:
+            b"".join(response.streaming_content)
+            return response.status_code, b""
+        return response.status_code, response.content
+
+    async def stream(self, url, headers):
+        """The status of the event stream at `url`, after its first event."""
+        with captured_streams() as streams:
+            response = await self.async_client.get(url, headers=headers)
+        chunks = aiter(response.streaming_content)
+        await anext(chunks)
+        for events in streams:
+            await events.aclose()
+        async for _ in chunks:
+            pass
+        return response.status_code
+
+    def test_every_route_has_a_budget(self):
+        self.assertEqual(sorted(routes() - set(BUDGETS)), [])
+        self.assertEqual(sorted(set(BUDGETS) - routes()), [])
+
+    def test_query_budgets(self):
+        for (route, method), endpoint in BUDGETS.items():
+            with self.subTest(route=route, method=method):
+                # Rolled back, so deletes and updates leave the data as is.
+                with transaction.atomic():
+                    with CaptureQueriesContext(connection) as queries:
+                        status_code, content = self.call(
+                            route, method, endpoint
+                        )
+                    transaction.set_rollback(True)
+                self.assertLess(status_code, 400, content)
+
+                executed = list(queries)
+                duplicates = len(executed) - len(
+                    {fingerprint(query["sql"]) for query in executed}
+                )
+                summary = (
+                    f"{method.upper()} {route}: {len(executed)} queries "
+                    f"(budget {endpoint.queries}), {duplicates} repeated "
+                    f"(budget {endpoint.duplicates})"
+                )
+                self.assertLessEqual(
+                    len(executed), endpoint.queries, report(executed, summary)
+                )
+                self.assertLessEqual(
+                    duplicates, endpoint.duplicates, report(executed, summary)
+                )
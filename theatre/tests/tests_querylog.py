@@ -0,0 +1,186 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, connection, transaction
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from theatre.models import Genre
+from theatre.querylog import aggregate, fingerprint, read_log
+
+GENRE_URL = reverse("theatre:genre-list")
+
+
+def record(sql, duration_ms, view="GenreViewSet.list", plan=None):
+    return {
+        "fingerprint": fingerprint(sql),
+        "duration_ms": duration_ms,
+        "view": view,
+        "plan": plan,
+    }
+
+
+class FingerprintTests(TestCase):
+    def test_literals_and_lists_are_collapsed(self):
+        self.assertEqual(
+            fingerprint(
+                'SELECT "a"."id" FROM "a"\n  WHERE "a"."id" IN (%s, %s, %s)'
+                " AND \"a\".\"name\" = 'O''Neill' LIMIT 21"
+            ),
+            'SELECT "a"."id" FROM "a" WHERE "a"."id" IN (...) '
+            'AND "a"."name" = ? LIMIT ?',
+        )
+        self.assertEqual(
+            fingerprint('SELECT * FROM "t2" WHERE "x" IN (%s)'),
+            fingerprint('SELECT * FROM "t2" WHERE "x" IN (%s, %s)'),
+        )
+        self.assertEqual(
+            fingerprint('INSERT INTO "t" ("a", "b") VALUES (1, 2), (3, 4)'),
+            'INSERT INTO "t" ("a", "b") VALUES (...)',
+        )
+
+
+class AggregateTests(TestCase):
+    def test_statistics_per_fingerprint(self):
+        records = [
+            record("SELECT 1 FROM a WHERE id = %s", duration)
+            for duration in range(101, 201)
+        ]
+        records.append(
+            record("SELECT 1 FROM a WHERE id = 7", 300, view=None, plan="SCAN")
+        )
+        records.append(record("SELECT 1 FROM b", 5000))
+
+        first, second = aggregate(records)
+
+        self.assertEqual(first["fingerprint"], "SELECT ? FROM a WHERE id = ?")
+        self.assertEqual(first["count"], 101)
+        self.assertEqual(first["total_ms"], sum(range(101, 201)) + 300)
+        self.assertEqual(first["p50_ms"], 151)
+        self.assertEqual(first["p95_ms"], 196)
+        self.assertEqual(first["max_ms"], 300)
+        self.assertEqual(first["views"], {"GenreViewSet.list": 100, "-": 1})
+        self.assertEqual(first["plan"], "SCAN")
+        self.assertEqual(second["count"], 1)
+
+
+class SlowQueryLogTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "slow.jsonl")
+        Genre.objects.create(name="Drama")
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_user("user@test.com", "testpass")
+        )
+
+    def records(self):
+        if not os.path.exists(self.path):
+            return []
+        return list(read_log(self.path))
+
+    def log_settings(self, **kwargs):
+        return override_settings(
+            SLOW_QUERIES={
+                "THRESHOLD_MS": 0,
+                "EXPLAIN_SAMPLE_RATE": 0,
+                "PATH": self.path,
+                **kwargs,
+            }
+        )
+
+    def test_fast_queries_are_not_logged(self):
+        with self.log_settings(THRESHOLD_MS=10_000):
+            self.client.get(GENRE_URL)
+        self.assertEqual(self.records(), [])
+
+    def test_slow_queries_are_logged_with_their_view(self):
+        with self.log_settings(EXPLAIN_SAMPLE_RATE=1):
+            response = self.client.get(GENRE_URL, {"name": "Drama"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        records = self.records()
+        self.assertTrue(records)
+        for logged in records:
+            self.assertEqual(logged["view"], "GenreViewSet.list")
+            self.assertEqual(logged["method"], "GET")
+            self.assertEqual(logged["path"], GENRE_URL)
+            self.assertEqual(logged["alias"], "default")
+            self.assertFalse(logged["failed"])
+            self.assertNotIn("EXPLAIN", logged["sql"])
+            self.assertIn("plan", logged)
+            self.assertNotIn("EXPLAIN failed", logged["plan"])
+        self.assertIn('"theatre_genre"', records[-1]["sql"])
+
+    def test_queries_outside_requests(self):
+        with self.log_settings():
+            with self.assertLogs("theatre.querylog", "INFO") as logs:
+                list(Genre.objects.filter(name="Drama"))
+        (logged,) = self.records()
+        self.assertIsNone(logged["view"])
+        self.assertNotIn("plan", logged)
+        self.assertEqual(json.loads(logs.records[0].getMessage()), logged)
+
+    def test_failed_queries_are_logged_without_explain(self):
+        with self.log_settings(EXPLAIN_SAMPLE_RATE=1):
+            with self.assertRaises(DatabaseError):
+                with transaction.atomic(), connection.cursor() as cursor:
+                    cursor.execute("SELECT * FROM missing_table")
+        (logged,) = [
+            logged
+            for logged in self.records()
+            if "missing_table" in logged["sql"]
+        ]
+        self.assertTrue(logged["failed"])
+        self.assertNotIn("plan", logged)
+
+
+class SlowQueriesCommandTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "slow.jsonl")
+        with open(self.path, "w") as log:
+            for logged in (
+                record("SELECT * FROM a WHERE id = %s", 120, plan="SCAN a"),
+                record("SELECT * FROM a WHERE id = %s", 180),
+                record("SELECT * FROM b", 900, view="PlayViewSet.list"),
+            ):
+                log.write(json.dumps(logged) + "\n")
+            log.write('{"torn": ')
+
+    def test_prints_the_worst_queries(self):
+        out = StringIO()
+        call_command("slow_queries", file=self.path, plans=True, stdout=out)
+        output = out.getvalue()
+        self.assertLess(
+            output.index("SELECT * FROM b"), output.index("SELECT * FROM a")
+        )
+        self.assertIn("2 queries, 300 ms total", output)
+        self.assertIn("PlayViewSet.list (1)", output)
+        self.assertIn("    SCAN a", output)
+        self.assertIn("2 distinct queries, 3 slow executions.", output)
+
+    def test_order_and_limit(self):
+        out = StringIO()
+        call_command(
+            "slow_queries", file=self.path, order="count", limit=1, stdout=out
+        )
+        self.assertIn("SELECT * FROM a", out.getvalue())
+        self.assertNotIn("SELECT * FROM b", out.getvalue())
+
+    def test_missing_log(self):
+        with self.assertRaises(CommandError):
+            call_command("slow_queries", file=self.path + ".missing")
+        with override_settings(SLOW_QUERIES={"PATH": ""}):
+            with self.assertRaises(CommandError):
+                call_command("slow_queries")
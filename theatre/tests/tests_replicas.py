@@ -0,0 +1,163 @@
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from theatre.models import Genre, Performance, Play, TheatreHall
+
+GENRE_URL = reverse("theatre:genre-list")
+RESERVATION_URL = reverse("theatre:reservation-list")
+REPLICA = "replica"
+
+
+@override_settings(
+    REPLICA_ROUTING={
+        "REPLICAS": [REPLICA],
+        "PIN_SECONDS": 60,
+        "PRIMARY_ONLY_PATHS": ["/api/theatre/reservations/"],
+    }
+)
+class ReplicaRoutingTests(TestCase):
+    """
+    A second, separately migrated SQLite database stands in for the
+    replica, so rows written to the primary are invisible on it and every
+    read shows where it was routed.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Registered after the test case has set up its test databases, so
+        # the replica is a plain, separately migrated SQLite file.
+        cls.replica_dir = tempfile.TemporaryDirectory()
+        connections.settings[REPLICA] = connections.configure_settings(
+            {
+                "default": connections.settings["default"],
+                REPLICA: {
+                    "ENGINE": "django.db.backends.sqlite3",
+                    "NAME": os.path.join(cls.replica_dir.name, "replica.db"),
+                },
+            }
+        )[REPLICA]
+        cls.databases = cls.databases | {REPLICA}
+        call_command("migrate", database=REPLICA, verbosity=0)
+        Genre.objects.using(REPLICA).create(name="Replica genre")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.databases = cls.databases - {REPLICA}
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+        cls.replica_dir.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="user@theatre.com", password="password"
+        )
+        # JWT authentication loads the user, and that read is routed too.
+        get_user_model().objects.using(REPLICA).delete()
+        get_user_model().objects.db_manager(REPLICA).create_user(
+            id=self.user.id, email="user@theatre.com", password="password"
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}"
+        )
+        Genre.objects.create(name="Primary genre")
+
+    def genre_names(self):
+        res = self.client.get(GENRE_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [genre["name"] for genre in res.data["results"]]
+
+    def test_safe_requests_read_from_replica(self):
+        self.assertEqual(self.genre_names(), ["Replica genre"])
+
+    def test_writes_go_to_primary_and_pin_user(self):
+        staff = get_user_model().objects.create_user(
+            email="admin@theatre.com", password="password", is_staff=True
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(staff)}"
+        )
+
+        res = self.client.post(GENRE_URL, {"name": "New genre"})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(
+            Genre.objects.using(REPLICA).filter(name="New genre").exists()
+        )
+        self.assertEqual(
+            self.genre_names(), ["New genre", "Primary genre"]
+        )
+
+    def test_pin_survives_other_workers_cache(self):
+        staff = get_user_model().objects.create_user(
+            email="admin@theatre.com", password="password", is_staff=True
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(staff)}"
+        )
+        self.client.post(GENRE_URL, {"name": "New genre"})
+        # The next request lands on a worker without the pin in its cache.
+        cache.clear()
+
+        self.assertEqual(
+            self.genre_names(), ["New genre", "Primary genre"]
+        )
+
+    def test_pin_cookie_is_per_user(self):
+        staff = get_user_model().objects.create_user(
+            email="admin@theatre.com", password="password", is_staff=True
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(staff)}"
+        )
+        self.client.post(GENRE_URL, {"name": "New genre"})
+        cache.clear()
+
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}"
+        )
+        self.assertEqual(self.genre_names(), ["Replica genre"])
+
+    def test_pin_is_per_user(self):
+        cache.set("replicas:pinned:0", True)
+        self.assertEqual(self.genre_names(), ["Replica genre"])
+
+    def test_primary_only_paths(self):
+        res = self.client.get(RESERVATION_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["count"], 0)
+
+        performance = Performance.objects.create(
+            play=Play.objects.create(title="Play", description="Text"),
+            theatre_hall=TheatreHall.objects.create(
+                name="Hall", rows=5, seats_in_row=5
+            ),
+            show_time="2024-12-01T19:00:00+00:00",
+        )
+        self.client.post(
+            RESERVATION_URL,
+            {"tickets": [{"row": 1, "seat": 1, "performance": performance.id}]},
+            format="json",
+        )
+        cache.clear()
+
+        res = self.client.get(RESERVATION_URL)
+        self.assertEqual(res.data["count"], 1)
+
+    @override_settings(REPLICA_ROUTING={"REPLICAS": []})
+    def test_no_replicas_configured(self):
+        self.assertEqual(self.genre_names(), ["Primary genre"])
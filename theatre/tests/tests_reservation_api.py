@@ -1,10 +1,15 @@
+from unittest import mock
+
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError
 from django.test import TestCase
 from rest_framework import status
 from rest_framework.reverse import reverse
 from rest_framework.test import APIClient
 
+from theatre import metrics
 from theatre.models import Reservation, Ticket, Performance, TheatreHall, Play
+from theatre.retry import RetriesExhausted
 
 RESERVATION_URL = reverse("theatre:reservation-list")
 
@@ -94,3 +99,106 @@ class AuthenticatedReservationTests(TestCase):
 
         reservation = Reservation.objects.get(id=res.data["id"])
         self.assertEqual(reservation.tickets.count(), 1)
+
+    def test_tickets_written_in_deterministic_order(self):
+        performance_1 = sample_performance()
+        performance_2 = Performance.objects.create(
+            play=performance_1.play,
+            theatre_hall=performance_1.theatre_hall,
+            show_time="2024-12-02T19:00:00+00:00",
+        )
+        payload = {
+            "tickets": [
+                {"row": 2, "seat": 1, "performance": performance_2.id},
+                {"row": 1, "seat": 2, "performance": performance_1.id},
+                {"row": 1, "seat": 1, "performance": performance_2.id},
+                {"row": 1, "seat": 1, "performance": performance_1.id},
+            ],
+        }
+
+        res = self.client.post(RESERVATION_URL, payload, format="json")
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        written = Ticket.objects.order_by("id").values_list(
+            "performance_id", "row", "seat"
+        )
+        self.assertEqual(list(written), sorted(written))
+
+    def test_seat_conflict_returns_bad_request(self):
+        metrics.reset_counters()
+        performance = sample_performance()
+        payload = {
+            "tickets": [{"row": 1, "seat": 1, "performance": performance.id}],
+        }
+
+        with mock.patch.object(
+            Ticket.objects, "create", side_effect=IntegrityError
+        ):
+            res = self.client.post(RESERVATION_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            metrics.get_counters()["reservation_conflicts_total"], 1
+        )
+
+    def test_seat_taken_after_validation_returns_bad_request(self):
+        metrics.reset_counters()
+        performance = sample_performance()
+        other = sample_reservation(self.user)
+        create = Ticket.objects.create
+
+        def taken_meanwhile(**kwargs):
+            Ticket.objects.bulk_create(
+                [
+                    Ticket(
+                        reservation=other,
+                        performance=performance,
+                        row=1,
+                        seat=1,
+                    )
+                ]
+            )
+            return create(**kwargs)
+
+        payload = {
+            "tickets": [{"row": 1, "seat": 1, "performance": performance.id}],
+        }
+        with mock.patch.object(
+            Ticket.objects, "create", side_effect=taken_meanwhile
+        ):
+            res = self.client.post(RESERVATION_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("already taken", str(res.data["tickets"]))
+        self.assertEqual(
+            metrics.get_counters()["reservation_conflicts_total"], 1
+        )
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_exhausted_retries_return_service_unavailable(self):
+        performance = sample_performance()
+        payload = {
+            "tickets": [{"row": 1, "seat": 1, "performance": performance.id}],
+        }
+
+        with mock.patch(
+            "theatre.serializers.run_with_retry",
+            side_effect=RetriesExhausted("deadlock detected"),
+        ):
+            res = self.client.post(RESERVATION_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res["Retry-After"], "1")
+        self.assertFalse(Reservation.objects.exists())
+
+    def test_seat_outside_the_hall_returns_bad_request(self):
+        performance = sample_performance()
+        payload = {
+            "tickets": [{"row": 11, "seat": 1, "performance": performance.id}],
+        }
+
+        res = self.client.post(RESERVATION_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("available range", str(res.data["tickets"]))
+        self.assertFalse(Reservation.objects.exists())
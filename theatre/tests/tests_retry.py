@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.db import OperationalError
+from django.test import SimpleTestCase
+
+from theatre import metrics
+from theatre.retry import (
+    is_transient,
+    run_with_retry,
+    MAX_ATTEMPTS,
+    RetriesExhausted,
+)
+
+
+class DeadlockDetected(Exception):
+    sqlstate = "40P01"
+
+
+def deadlock_error():
+    error = OperationalError("deadlock detected")
+    error.__cause__ = DeadlockDetected()
+    return error
+
+
+@mock.patch("theatre.retry.time.sleep")
+class RunWithRetryTests(SimpleTestCase):
+    def setUp(self):
+        metrics.reset_counters()
+
+    def test_returns_result_without_retry(self, sleep):
+        self.assertEqual(run_with_retry(lambda: "ok"), "ok")
+        sleep.assert_not_called()
+
+    def test_retries_transient_errors(self, sleep):
+        func = mock.Mock(side_effect=[deadlock_error(), "ok"])
+
+        self.assertEqual(run_with_retry(func), "ok")
+        self.assertEqual(func.call_count, 2)
+        self.assertEqual(sleep.call_count, 1)
+        self.assertEqual(metrics.get_counters()["reservation_retries_total"], 1)
+
+    def test_gives_up_after_max_attempts(self, sleep):
+        func = mock.Mock(side_effect=deadlock_error())
+
+        with self.assertRaises(RetriesExhausted):
+            run_with_retry(func)
+        self.assertEqual(func.call_count, MAX_ATTEMPTS)
+        self.assertEqual(
+            metrics.get_counters()["reservation_retries_exhausted_total"], 1
+        )
+
+    def test_does_not_retry_other_errors(self, sleep):
+        func = mock.Mock(side_effect=OperationalError("connection refused"))
+
+        with self.assertRaises(OperationalError) as raised:
+            run_with_retry(func)
+        self.assertNotIsInstance(raised.exception, RetriesExhausted)
+        self.assertEqual(func.call_count, 1)
+
+    def test_backoff_is_bounded(self, sleep):
+        func = mock.Mock(side_effect=deadlock_error())
+
+        with self.assertRaises(OperationalError):
+            run_with_retry(func)
+        for call in sleep.call_args_list:
+            self.assertLessEqual(call.args[0], 0.5)
+
+
+class IsTransientTests(SimpleTestCase):
+    def test_sqlstates(self):
+        self.assertTrue(is_transient(deadlock_error()))
+
+    def test_sqlite_lock(self):
+        self.assertTrue(is_transient(OperationalError("database is locked")))
+
+    def test_other(self):
+        self.assertFalse(is_transient(OperationalError("no such table")))
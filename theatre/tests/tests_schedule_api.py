@@ -0,0 +1,161 @@
+from datetime import datetime, timezone
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from theatre.models import Performance, Play, TheatreHall
+
+SCHEDULE_URL = reverse("theatre:performance-schedule")
+
+
+class PerformanceScheduleTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_user(
+            email="admin@test.com", password="password", is_staff=True
+        )
+        self.client.force_authenticate(self.admin)
+        self.play = Play.objects.create(title="Hamlet", description="...")
+        self.hall = TheatreHall.objects.create(
+            name="Main", rows=10, seats_in_row=10
+        )
+
+    def payload(self, **params):
+        payload = {
+            "play": self.play.id,
+            "theatre_hall": self.hall.id,
+            "first_show": "2024-12-01T19:00:00Z",
+            "count": 5,
+        }
+        payload.update(params)
+        return payload
+
+    def test_requires_admin(self):
+        user = get_user_model().objects.create_user(
+            email="user@test.com", password="password"
+        )
+        self.client.force_authenticate(user)
+
+        res = self.client.post(SCHEDULE_URL, self.payload(), format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_daily_schedule_created(self):
+        res = self.client.post(SCHEDULE_URL, self.payload(), format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data["created"]), 5)
+        self.assertEqual(res.data["conflicts"], [])
+        performances = Performance.objects.filter(id__in=res.data["created"])
+        self.assertEqual(
+            sorted(p.show_time.day for p in performances), [1, 2, 3, 4, 5]
+        )
+        self.assertTrue(
+            all(p.end_time.hour == 21 for p in performances)
+        )
+
+    def test_conflicting_slots_reported_and_skipped(self):
+        existing = Performance.objects.create(
+            play=self.play,
+            theatre_hall=self.hall,
+            show_time=datetime(2024, 12, 3, 18, tzinfo=timezone.utc),
+        )
+
+        res = self.client.post(SCHEDULE_URL, self.payload(), format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data["created"]), 4)
+        [conflict] = res.data["conflicts"]
+        self.assertEqual(
+            conflict["show_time"],
+            datetime(2024, 12, 3, 19, tzinfo=timezone.utc),
+        )
+        self.assertIn(f"performance {existing.id}", conflict["clashes"][0])
+
+    def test_duration_limits_slots_to_their_day(self):
+        # Slots are at least a day apart and shows at most 12 hours long,
+        # so a run cannot clash with itself; see PlanScheduleTests.
+        res = self.client.post(
+            SCHEDULE_URL,
+            self.payload(duration="1 12:00:00", count=2),
+            format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("at most 12:00:00", str(res.data["duration"]))
+        self.assertFalse(Performance.objects.exists())
+
+        res = self.client.post(
+            SCHEDULE_URL,
+            self.payload(duration="12:00:00", interval=1, count=2),
+            format="json",
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data["created"]), 2)
+        self.assertEqual(res.data["conflicts"], [])
+
+    def test_all_slots_conflicting(self):
+        self.client.post(SCHEDULE_URL, self.payload(), format="json")
+
+        res = self.client.post(SCHEDULE_URL, self.payload(), format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(res.data["created"], [])
+        self.assertEqual(len(res.data["conflicts"]), 5)
+
+    def test_weekly_on_weekdays_until(self):
+        # 2024-12-02 is a Monday.
+        res = self.client.post(
+            SCHEDULE_URL,
+            {
+                "play": self.play.id,
+                "theatre_hall": self.hall.id,
+                "first_show": "2024-12-02T19:00:00Z",
+                "frequency": "weekly",
+                "weekdays": [4, 5],
+                "until": "2024-12-31T00:00:00Z",
+            },
+            format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        days = sorted(
+            Performance.objects.filter(
+                id__in=res.data["created"]
+            ).values_list("show_time__day", flat=True)
+        )
+        self.assertEqual(days, [6, 7, 13, 14, 20, 21, 27, 28])
+
+    def test_invalid_rules_rejected(self):
+        for payload in (
+            {"play": self.play.id, "theatre_hall": self.hall.id,
+             "first_show": "2024-12-01T19:00:00Z"},
+            self.payload(count=5000),
+            self.payload(count=0),
+            self.payload(weekdays=[7]),
+        ):
+            res = self.client.post(SCHEDULE_URL, payload, format="json")
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Performance.objects.exists())
+
+    def test_query_count_does_not_grow_with_slots(self):
+        query_counts = []
+        for first_show, count in (
+            ("2025-01-01T19:00:00Z", 3),
+            ("2025-06-01T19:00:00Z", 100),
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.post(
+                    SCHEDULE_URL,
+                    self.payload(first_show=first_show, count=count),
+                    format="json",
+                )
+            self.assertEqual(len(res.data["created"]), count)
+            query_counts.append(len(queries))
+
+        self.assertEqual(query_counts[0], query_counts[1])
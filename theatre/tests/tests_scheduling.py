@@ -0,0 +1,188 @@
+from datetime import datetime, timedelta, timezone
+from importlib import import_module
+
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone as django_timezone
+
+from theatre.models import Performance, Play, TheatreHall
+from theatre.scheduling import (
+    WEEKLY,
+    HallSchedule,
+    describe_conflict,
+    overlapping_performances,
+    plan_schedule,
+    recurrence,
+)
+
+
+def at(hour, day=1):
+    return datetime(2024, 12, day, hour, tzinfo=timezone.utc)
+
+
+class OverlapQueryTests(TestCase):
+    def setUp(self):
+        self.play = Play.objects.create(title="Play", description="...")
+        self.hall = TheatreHall.objects.create(
+            name="Hall", rows=5, seats_in_row=5
+        )
+        self.evening = Performance.objects.create(
+            play=self.play, theatre_hall=self.hall, show_time=at(19)
+        )
+
+    def test_end_time_follows_duration(self):
+        self.assertEqual(self.evening.end_time, at(21))
+        self.evening.duration = timedelta(hours=3)
+        self.evening.save(update_fields=["duration"])
+        self.evening.refresh_from_db()
+        self.assertEqual(self.evening.end_time, at(22))
+
+    def test_overlap_is_half_open(self):
+        self.assertEqual(
+            overlapping_performances(self.hall.id, at(20), at(23)),
+            [self.evening],
+        )
+        self.assertEqual(
+            overlapping_performances(self.hall.id, at(21), at(23)), []
+        )
+        self.assertEqual(
+            overlapping_performances(self.hall.id, at(17), at(19)), []
+        )
+
+    def test_exclude_and_other_halls(self):
+        other = TheatreHall.objects.create(
+            name="Other", rows=5, seats_in_row=5
+        )
+        self.assertEqual(
+            overlapping_performances(
+                self.hall.id, at(19), at(21), exclude_id=self.evening.id
+            ),
+            [],
+        )
+        self.assertEqual(overlapping_performances(other.id, at(19), at(21)), [])
+
+
+class OverlapMigrationTests(TestCase):
+    migration = import_module("theatre.migrations.0004_performance_time_range")
+
+    def setUp(self):
+        self.play = Play.objects.create(title="Play", description="...")
+        self.hall = TheatreHall.objects.create(
+            name="Hall", rows=5, seats_in_row=5
+        )
+        self.evening = Performance.objects.create(
+            play=self.play, theatre_hall=self.hall, show_time=at(19)
+        )
+        Performance.objects.create(
+            play=self.play, theatre_hall=self.hall, show_time=at(21)
+        )
+        Performance.objects.create(
+            play=self.play,
+            theatre_hall=TheatreHall.objects.create(
+                name="Other", rows=5, seats_in_row=5
+            ),
+            show_time=at(20),
+        )
+
+    def test_no_overlaps(self):
+        self.migration.check_no_overlaps(connection)
+
+    def test_overlaps_are_listed(self):
+        clash = Performance.objects.create(
+            play=self.play, theatre_hall=self.hall, show_time=at(20)
+        )
+
+        with self.assertRaises(CommandError) as raised:
+            self.migration.check_no_overlaps(connection)
+
+        message = str(raised.exception)
+        self.assertIn("overlap in their hall (2 found)", message)
+        self.assertIn(
+            f"hall {self.hall.id}: performance {self.evening.id} (", message
+        )
+        self.assertIn(f") and {clash.id} (", message)
+
+
+class HallScheduleTests(TestCase):
+    def test_conflicts_and_add(self):
+        schedule = HallSchedule(
+            [(at(19), at(21), "evening"), (at(13), at(15), "matinee")]
+        )
+
+        self.assertEqual(schedule.conflicts(at(14), at(20)), ["matinee", "evening"])
+        self.assertEqual(schedule.conflicts(at(15), at(19)), [])
+
+        schedule.add(at(16), at(18), "afternoon")
+        self.assertEqual(schedule.conflicts(at(17), at(18)), ["afternoon"])
+        self.assertEqual(schedule.conflicts(at(19), at(20)), ["evening"])
+
+    def test_load_queries_window_once(self):
+        play = Play.objects.create(title="Play", description="...")
+        hall = TheatreHall.objects.create(name="Hall", rows=5, seats_in_row=5)
+        for day in range(1, 4):
+            Performance.objects.create(
+                play=play, theatre_hall=hall, show_time=at(19, day)
+            )
+
+        with self.assertNumQueries(1):
+            schedule = HallSchedule.load(hall.id, at(0, 2), at(0, 3))
+            conflicts = schedule.conflicts(at(20, 2), at(22, 2))
+        self.assertEqual([p.show_time for p in conflicts], [at(19, 2)])
+
+
+class PlanScheduleTests(TestCase):
+    def test_slots_clashing_with_each_other(self):
+        play = Play.objects.create(title="Play", description="...")
+        hall = TheatreHall.objects.create(name="Hall", rows=5, seats_in_row=5)
+
+        planned, conflicts = plan_schedule(
+            hall.id, play, timedelta(hours=3), [at(19), at(13), at(15)]
+        )
+
+        self.assertEqual(
+            [performance.show_time for performance in planned],
+            [at(13), at(19)],
+        )
+        [(show_time, clashes)] = conflicts
+        self.assertEqual(show_time, at(15))
+        self.assertEqual(
+            [describe_conflict(clash) for clash in clashes],
+            [
+                "Clashes with another slot of this schedule from "
+                "2024-12-01T13:00:00+00:00 to 2024-12-01T16:00:00+00:00."
+            ],
+        )
+        self.assertFalse(Performance.objects.exists())
+
+
+class RecurrenceTests(TestCase):
+    def test_every_other_day(self):
+        slots = recurrence(at(19), interval=2, count=3)
+
+        self.assertEqual(slots, [at(19, 1), at(19, 3), at(19, 5)])
+
+    def test_weekly_every_other_week(self):
+        # 2024-12-02 is a Monday.
+        slots = recurrence(
+            at(19, 2), frequency=WEEKLY, interval=2, until=at(0, 31)
+        )
+
+        self.assertEqual(slots, [at(19, 2), at(19, 16), at(19, 30)])
+
+    def test_until_before_first_show(self):
+        self.assertEqual(recurrence(at(19, 2), until=at(0, 1)), [])
+
+    def test_limit(self):
+        with self.assertRaises(ValueError):
+            recurrence(at(19), count=11, limit=10)
+
+    def test_keeps_wall_clock_time_across_dst(self):
+        with django_timezone.override("Europe/Kyiv"):
+            first_show = datetime(2024, 10, 26, 16, tzinfo=timezone.utc)
+            slots = recurrence(first_show, count=2)
+
+        # 19:00 local is 16:00 UTC in summer and 17:00 UTC in winter.
+        self.assertEqual(
+            [slot.astimezone(timezone.utc).hour for slot in slots], [16, 17]
+        )
@@ -0,0 +1,161 @@
+import asyncio
+import json
+from contextlib import contextmanager
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from theatre.async_views import seat_event_stream
+from theatre.events import get_broker, LocalBroker
+from theatre.models import Performance, Play, TheatreHall, Reservation, Ticket
+
+
+def seat_events_url(performance_id):
+    return reverse(
+        "theatre:performance-seat-events", args=[performance_id]
+    )
+
+
+@contextmanager
+def captured_streams():
+    """
+    Record the event generators the seat events view creates. Closing a
+    response's `streaming_content` only closes the wrappers around them,
+    leaving the generator to be finalized after the test's event loop is
+    gone; a test closes the generator itself, then drains the response.
+    """
+    streams = []
+
+    def capture(*args, **kwargs):
+        streams.append(seat_event_stream(*args, **kwargs))
+        return streams[-1]
+
+    with mock.patch("theatre.async_views.seat_event_stream", capture):
+        yield streams
+
+
+def parse_event(chunk):
+    lines = dict(
+        line.split(": ", 1) for line in chunk.strip().splitlines()
+    )
+    return lines["event"], json.loads(lines["data"])
+
+
+class LocalBrokerTests(TestCase):
+    async def test_publish_reaches_subscribers_of_channel(self):
+        broker = LocalBroker()
+        async with broker.subscribe("a") as sub_a, broker.subscribe(
+            "b"
+        ) as sub_b:
+            broker.publish("a", {"n": 1})
+            self.assertEqual(
+                await asyncio.wait_for(sub_a.get(), 1), {"n": 1}
+            )
+            self.assertTrue(sub_b.queue.empty())
+
+    async def test_unsubscribe_on_exit(self):
+        broker = LocalBroker()
+        async with broker.subscribe("a"):
+            pass
+        self.assertEqual(broker._subscriptions, {})
+
+
+class SeatEventsTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@theatre.com", password="password"
+        )
+        self.token = str(AccessToken.for_user(self.user))
+        self.performance = Performance.objects.create(
+            play=Play.objects.create(title="Play", description="Text"),
+            theatre_hall=TheatreHall.objects.create(
+                name="Hall", rows=5, seats_in_row=5
+            ),
+            show_time="2024-12-01T19:00:00+00:00",
+        )
+        self.reservation = Reservation.objects.create(user=self.user)
+        Ticket.objects.create(
+            row=1,
+            seat=1,
+            performance=self.performance,
+            reservation=self.reservation,
+        )
+
+    async def test_auth_required(self):
+        res = await self.async_client.get(
+            seat_events_url(self.performance.id)
+        )
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_unknown_performance(self):
+        res = await self.async_client.get(
+            seat_events_url(self.performance.id + 1),
+            headers={"Authorization": f"Bearer {self.token}"},
+        )
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_stream_response(self):
+        with captured_streams() as streams:
+            res = await self.async_client.get(
+                seat_events_url(self.performance.id),
+                headers={"Authorization": f"Bearer {self.token}"},
+            )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], "text/event-stream")
+
+        stream = aiter(res.streaming_content)
+        event, data = parse_event((await anext(stream)).decode())
+        self.assertEqual(event, "snapshot")
+        self.assertEqual(data["taken"], [{"row": 1, "seat": 1}])
+
+        await streams[0].aclose()
+        self.assertEqual([chunk async for chunk in stream], [])
+        self.assertEqual(get_broker()._subscriptions, {})
+
+    def create_and_delete_ticket(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ticket = Ticket.objects.create(
+                row=2,
+                seat=3,
+                performance=self.performance,
+                reservation=self.reservation,
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            ticket.delete()
+
+    async def test_deltas_follow_commits(self):
+        stream = seat_event_stream(self.performance.id)
+        event, _ = parse_event(await anext(stream))
+        self.assertEqual(event, "snapshot")
+
+        await sync_to_async(self.create_and_delete_ticket)()
+
+        event, data = parse_event(await anext(stream))
+        self.assertEqual(event, "seat-taken")
+        self.assertEqual(data["seats"], [{"row": 2, "seat": 3}])
+        event, data = parse_event(await anext(stream))
+        self.assertEqual(event, "seat-released")
+        self.assertEqual(data["seats"], [{"row": 2, "seat": 3}])
+        await stream.aclose()
+
+    async def test_heartbeat(self):
+        stream = seat_event_stream(self.performance.id, heartbeat=0.01)
+        await anext(stream)
+        self.assertEqual(await anext(stream), ": keep-alive\n\n")
+        await stream.aclose()
+        self.assertEqual(get_broker()._subscriptions, {})
+
+    def test_publish_deferred_until_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            Ticket.objects.create(
+                row=3,
+                seat=3,
+                performance=self.performance,
+                reservation=self.reservation,
+            )
+        self.assertEqual(len(callbacks), 1)
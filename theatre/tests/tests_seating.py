@@ -0,0 +1,157 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from theatre.models import Performance, Play, TheatreHall, Reservation, Ticket
+from theatre.retry import RetriesExhausted
+from theatre.seating import build_occupancy, find_adjacent_seats
+
+
+def best_available_url(performance_id):
+    return reverse("theatre:performance-best-available", args=[performance_id])
+
+
+def sample_performance(rows=5, seats_in_row=10):
+    return Performance.objects.create(
+        play=Play.objects.create(title="Play", description="Description"),
+        theatre_hall=TheatreHall.objects.create(
+            name="Hall", rows=rows, seats_in_row=seats_in_row
+        ),
+        show_time="2024-12-15T19:00:00Z",
+    )
+
+
+class FindAdjacentSeatsTests(TestCase):
+    def setUp(self):
+        self.hall = TheatreHall(name="Hall", rows=5, seats_in_row=10)
+
+    def test_empty_hall_picks_centre(self):
+        occupancy = build_occupancy(self.hall, [])
+        seats = find_adjacent_seats(self.hall, occupancy, 2)
+        self.assertEqual(seats, [(3, 5), (3, 6)])
+
+    def test_full_centre_row_falls_back_to_neighbour(self):
+        taken = [(3, seat) for seat in range(1, 11)]
+        occupancy = build_occupancy(self.hall, taken)
+        seats = find_adjacent_seats(self.hall, occupancy, 3)
+        self.assertEqual([row for row, _ in seats], [2, 2, 2])
+
+    def test_gap_too_small_is_skipped(self):
+        hall = TheatreHall(name="Hall", rows=1, seats_in_row=6)
+        occupancy = build_occupancy(hall, [(1, 3), (1, 4)])
+        self.assertIsNone(find_adjacent_seats(hall, occupancy, 3))
+        self.assertEqual(
+            find_adjacent_seats(hall, occupancy, 2), [(1, 1), (1, 2)]
+        )
+
+    def test_seats_outside_hall_are_ignored(self):
+        occupancy = build_occupancy(self.hall, [(6, 1), (3, 11), (3, 5)])
+        self.assertEqual(occupancy, [0, 0, 1 << 4, 0, 0])
+
+    def test_count_larger_than_row(self):
+        occupancy = build_occupancy(self.hall, [])
+        self.assertIsNone(find_adjacent_seats(self.hall, occupancy, 11))
+
+    def test_large_hall(self):
+        hall = TheatreHall(name="Arena", rows=50, seats_in_row=100)
+        taken = [
+            (row, seat) for row in range(1, 51) for seat in range(1, 99)
+        ]
+        occupancy = build_occupancy(hall, taken)
+        self.assertEqual(
+            find_adjacent_seats(hall, occupancy, 2), [(25, 99), (25, 100)]
+        )
+
+
+class BestAvailableApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="user@test.com", password="password"
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_auth_required(self):
+        performance = sample_performance()
+        self.client.force_authenticate(None)
+        res = self.client.post(
+            best_available_url(performance.id), {"count": 2}
+        )
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_reserves_adjacent_seats(self):
+        performance = sample_performance()
+        res = self.client.post(
+            best_available_url(performance.id), {"count": 3}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        reservation = Reservation.objects.get(id=res.data["id"])
+        self.assertEqual(reservation.user, self.user)
+        seats = list(reservation.tickets.values_list("row", "seat"))
+        self.assertEqual(seats, [(3, 4), (3, 5), (3, 6)])
+
+    def test_skips_taken_seats(self):
+        performance = sample_performance(rows=1, seats_in_row=4)
+        reservation = Reservation.objects.create(user=self.user)
+        Ticket.objects.create(
+            row=1, seat=2, performance=performance, reservation=reservation
+        )
+
+        res = self.client.post(
+            best_available_url(performance.id), {"count": 2}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [(t["row"], t["seat"]) for t in res.data["tickets"]],
+            [(1, 3), (1, 4)],
+        )
+
+    def test_hall_shrunk_after_sales(self):
+        performance = sample_performance()
+        reservation = Reservation.objects.create(user=self.user)
+        Ticket.objects.create(
+            row=5, seat=10, performance=performance, reservation=reservation
+        )
+        TheatreHall.objects.filter(id=performance.theatre_hall_id).update(
+            rows=3, seats_in_row=8
+        )
+
+        res = self.client.post(
+            best_available_url(performance.id), {"count": 2}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_no_seats_available(self):
+        performance = sample_performance(rows=1, seats_in_row=2)
+        res = self.client.post(
+            best_available_url(performance.id), {"count": 3}
+        )
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Reservation.objects.exists())
+
+    def test_exhausted_retries_return_service_unavailable(self):
+        performance = sample_performance()
+        with mock.patch(
+            "theatre.seating.run_with_retry",
+            side_effect=RetriesExhausted("deadlock detected"),
+        ):
+            res = self.client.post(
+                best_available_url(performance.id), {"count": 2}
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res["Retry-After"], "1")
+
+    def test_invalid_count(self):
+        performance = sample_performance()
+        res = self.client.post(
+            best_available_url(performance.id), {"count": 0}
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,93 @@
+import threading
+import unittest
+
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.test import TransactionTestCase
+
+from theatre.models import Performance, Play, TheatreHall, Ticket
+from theatre.seating import reserve_best_available
+from theatre.serializers import ReservationSerializer
+
+
+@unittest.skipUnless(
+    connection.vendor == "sqlite", "Runs on the SQLite deployment profile."
+)
+class SqliteProfileTests(TransactionTestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@theatre.com", password="password"
+        )
+        self.performance = Performance.objects.create(
+            play=Play.objects.create(title="Play", description="Text"),
+            theatre_hall=TheatreHall.objects.create(
+                name="Hall", rows=10, seats_in_row=10
+            ),
+            show_time="2024-12-01T19:00:00+00:00",
+        )
+
+    def test_pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], "wal")
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertGreater(cursor.fetchone()[0], 0)
+
+    def run_concurrently(self, target, count):
+        errors = []
+
+        def worker(index):
+            try:
+                target(index)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        threads = [
+            threading.Thread(target=worker, args=(index,))
+            for index in range(count)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return errors
+
+    def test_concurrent_reservations(self):
+        def reserve(index):
+            serializer = ReservationSerializer(
+                data={
+                    "tickets": [
+                        {
+                            "row": index // 10 + 1,
+                            "seat": index % 10 + 1,
+                            "performance": self.performance.id,
+                        }
+                    ]
+                }
+            )
+            serializer.is_valid(raise_exception=True)
+            serializer.save(user=self.user)
+
+        errors = self.run_concurrently(reserve, 40)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Ticket.objects.count(), 40)
+
+    def test_concurrent_best_available_never_oversells(self):
+        errors = self.run_concurrently(
+            lambda _: reserve_best_available(
+                self.performance.id, self.user, 4
+            ),
+            30,
+        )
+
+        self.assertEqual(errors, [])
+        seats = list(Ticket.objects.values_list("row", "seat"))
+        self.assertEqual(len(seats), len(set(seats)))
+        # Centred groups of four leave runs of three on each side, so
+        # every row takes exactly one group.
+        self.assertEqual(len(seats), 10 * 4)
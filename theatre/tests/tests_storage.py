@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from theatre.storage import ContentAddressedStorage, is_content_addressed
+
+MEDIA_ROOT = tempfile.mkdtemp()
+DIGEST = "2cf24dba5fb0a30e26e83b2ac5b9e29e1b161e5c1fa7425e73043362938b9824"
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ContentAddressedStorageTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.storage = ContentAddressedStorage()
+
+    def test_name_is_content_hash(self):
+        name = self.storage.save("uploads/plays/x.TXT", ContentFile(b"hello"))
+
+        self.assertEqual(name, f"uploads/plays/2c/{DIGEST}.txt")
+        self.assertTrue(is_content_addressed(name))
+        with self.storage.open(name) as file:
+            self.assertEqual(file.read(), b"hello")
+
+    def test_same_content_is_stored_once(self):
+        first = self.storage.save("uploads/plays/a.txt", ContentFile(b"x"))
+        second = self.storage.save("uploads/plays/b.txt", ContentFile(b"x"))
+        other = self.storage.save("uploads/plays/c.txt", ContentFile(b"y"))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertEqual(
+            len(self.storage.listdir(f"uploads/plays/{first[14:16]}")[1]), 1
+        )
+
+    def test_saving_again_refreshes_modified_time(self):
+        name = self.storage.save("uploads/plays/a.txt", ContentFile(b"z"))
+        os.utime(self.storage.path(name), (0, 0))
+
+        self.storage.save("uploads/plays/b.txt", ContentFile(b"z"))
+
+        self.assertGreater(
+            self.storage.get_modified_time(name),
+            timezone.now() - timedelta(minutes=1),
+        )
+
+    def test_delete_if_unused_since(self):
+        name = self.storage.save("uploads/plays/a.txt", ContentFile(b"w"))
+        cutoff = timezone.now() - timedelta(minutes=1)
+
+        self.assertFalse(self.storage.delete_if_unused_since(name, cutoff))
+        self.assertTrue(self.storage.exists(name))
+
+        os.utime(self.storage.path(name), (0, 0))
+        self.assertTrue(self.storage.delete_if_unused_since(name, cutoff))
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(self.storage.delete_if_unused_since(name, cutoff))
+
+    def test_is_content_addressed(self):
+        self.assertTrue(is_content_addressed(f"2c/{DIGEST}.png"))
+        self.assertFalse(is_content_addressed(f"ab/{DIGEST}.png"))
+        self.assertFalse(is_content_addressed("uploads/plays/hamlet.png"))
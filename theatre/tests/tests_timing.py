@@ -0,0 +1,104 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from theatre.models import Genre
+from theatre.timing import Timings, _timings, span, time_query
+
+GENRE_URL = reverse("theatre:genre-list")
+
+
+def parse_server_timing(header):
+    metrics = {}
+    for entry in header.split(", "):
+        name, *params = entry.split(";")
+        metrics[name] = dict(param.split("=", 1) for param in params)
+    return metrics
+
+
+class ServerTimingTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "user@theatre.com", "password"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.token = AccessToken.for_user(self.user)
+        Genre.objects.create(name="Drama")
+        Genre.objects.create(name="Comedy")
+
+    def test_not_sampled_by_default(self):
+        res = self.client.get(GENRE_URL)
+
+        self.assertNotIn("Server-Timing", res)
+
+    @override_settings(REQUEST_TIMING={"SAMPLE_RATE": 1})
+    def test_sampled_request(self):
+        with CaptureQueriesContext(connection) as queries:
+            with self.assertLogs("theatre.timing", "INFO") as logs:
+                res = self.client.get(GENRE_URL)
+
+        metrics = parse_server_timing(res["Server-Timing"])
+        self.assertEqual(
+            list(metrics), ["total", "db", "serialize", "render"]
+        )
+        self.assertEqual(
+            metrics["db"]["desc"], f'"{len(queries.captured_queries)} queries"'
+        )
+        for name in ("db", "serialize", "render"):
+            self.assertLessEqual(
+                float(metrics[name]["dur"]), float(metrics["total"]["dur"])
+            )
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["path"], GENRE_URL)
+        self.assertEqual(record["status"], 200)
+        self.assertEqual(record["db_queries"], len(queries.captured_queries))
+        self.assertEqual(logs.records[0].timing, record)
+
+    @override_settings(REQUEST_TIMING={"SAMPLE_RATE": 1})
+    async def test_async_request(self):
+        res = await self.async_client.get(
+            reverse("theatre:async-genre-list"),
+            headers={"Authorization": f"Bearer {self.token}"},
+        )
+
+        metrics = parse_server_timing(res["Server-Timing"])
+        self.assertIn("db", metrics)
+
+    def test_spans_outside_requests_are_ignored(self):
+        with span("db"):
+            pass
+
+        self.assertIsNone(_timings.get())
+
+    def test_nested_spans_counted_once(self):
+        timings = Timings()
+        token = _timings.set(timings)
+        try:
+            with span("serialize"):
+                with span("serialize"):
+                    pass
+            with span("db"):
+                pass
+        finally:
+            _timings.reset(token)
+
+        self.assertEqual(timings.counts, {"serialize": 1, "db": 1})
+
+    def test_query_timer_survives_execute_wrapper_blocks(self):
+        def wrapper(execute, *args):
+            return execute(*args)
+
+        connection.ensure_connection()
+        with connection.execute_wrapper(wrapper):
+            pass
+
+        self.assertIn(time_query, connection.execute_wrappers)
+        self.assertNotIn(wrapper, connection.execute_wrappers)
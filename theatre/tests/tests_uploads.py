@@ -0,0 +1,149 @@
+import hashlib
+import shutil
+import struct
+import tempfile
+import zlib
+from io import BytesIO
+
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import StopUpload
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from theatre.models import Play
+from theatre.uploads import ImageUploadHandler
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def encoded_image(image_format="PNG", size=(300, 450)):
+    buffer = BytesIO()
+    Image.new("RGB", size, "teal").save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def png_header(width, height):
+    """The start of a PNG whose IHDR claims the given dimensions."""
+    content = bytearray(encoded_image(size=(10, 10)))
+    ihdr = struct.pack(">II", width, height) + content[24:29]
+    content[16:33] = ihdr + struct.pack(">I", zlib.crc32(b"IHDR" + ihdr))
+    return bytes(content)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, PLAY_IMAGES={"WORKERS": 0})
+class ImageUploadTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_superuser(
+                "admin@theatre.com", "password"
+            )
+        )
+        self.play = Play.objects.create(title="Hamlet", description="...")
+        self.url = reverse("theatre:play-upload-image", args=[self.play.id])
+
+    def upload(self, content, name="poster.png", **extra):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                self.url,
+                {"image": SimpleUploadedFile(name, content), **extra},
+                format="multipart",
+            )
+
+    def assert_rejected(self, res, status_code, text):
+        self.assertEqual(res.status_code, status_code)
+        self.assertIn(text, res.data["image"][0])
+        self.play.refresh_from_db()
+        self.assertFalse(self.play.image)
+
+    def test_valid_upload_is_stored_under_its_hash(self):
+        content = encoded_image("JPEG")
+
+        res = self.upload(content, name="poster.JPG")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.play.refresh_from_db()
+        digest = hashlib.sha256(content).hexdigest()
+        self.assertEqual(
+            self.play.image.name, f"uploads/plays/{digest[:2]}/{digest}.jpg"
+        )
+        with self.play.image.open() as stored:
+            self.assertEqual(stored.read(), content)
+
+    @override_settings(PLAY_IMAGES={"WORKERS": 0, "MAX_UPLOAD_SIZE": 1000})
+    def test_too_large_while_streaming(self):
+        res = self.upload(encoded_image(size=(600, 900)) + b"\0" * 2000)
+
+        self.assert_rejected(res, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, "")
+
+    @override_settings(PLAY_IMAGES={"WORKERS": 0, "MAX_UPLOAD_SIZE": 1000})
+    def test_too_large_content_length(self):
+        res = self.upload(b"\0" * 100_000)
+
+        self.assert_rejected(
+            res, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, "1000 bytes"
+        )
+
+    def test_not_an_image(self):
+        res = self.upload(b"MZ" + b"\0" * 1000)
+
+        self.assert_rejected(res, status.HTTP_400_BAD_REQUEST, "valid JPEG")
+
+    def test_unsupported_format(self):
+        res = self.upload(encoded_image("GIF"), name="poster.gif")
+
+        self.assert_rejected(res, status.HTTP_400_BAD_REQUEST, "GIF images")
+
+    def test_decompression_bomb(self):
+        res = self.upload(png_header(12_000, 12_000) + b"\0" * 1000)
+
+        self.assert_rejected(res, status.HTTP_400_BAD_REQUEST, "12000x12000")
+
+    def test_beyond_pillow_limit(self):
+        res = self.upload(png_header(30_000, 30_000))
+
+        self.assert_rejected(res, status.HTTP_400_BAD_REQUEST, "pixels")
+
+    def test_unexpected_file_field(self):
+        res = self.upload(
+            encoded_image(),
+            other=SimpleUploadedFile("x.txt", b"hello"),
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_header_checked_before_the_body(self):
+        handler = ImageUploadHandler()
+        handler.new_file("image", "bomb.png", "image/png", None)
+
+        with self.assertRaises(StopUpload):
+            handler.receive_data_chunk(png_header(30_000, 30_000), 0)
+        self.assertEqual(
+            handler.rejection[0], status.HTTP_400_BAD_REQUEST
+        )
+        handler.file.close()
+
+    def test_header_buffered_until_identified(self):
+        content = encoded_image()
+        handler = ImageUploadHandler()
+        handler.new_file("image", "poster.png", "image/png", None)
+
+        handler.receive_data_chunk(content[:10], 0)
+        self.assertEqual(handler.header, content[:10])
+        handler.receive_data_chunk(content[10:], 10)
+        uploaded = handler.file_complete(len(content))
+
+        self.assertIsNone(handler.header)
+        self.assertEqual(
+            uploaded.content_sha256, hashlib.sha256(content).hexdigest()
+        )
+        uploaded.close()
@@ -0,0 +1,200 @@
+"""
+Request timing.
+
+ServerTimingMiddleware times a sample of requests
+(``settings.REQUEST_TIMING["SAMPLE_RATE"]``, 0 to 1): total time, SQL
+query count and time, serializer time (``serializer.data``) and response
+rendering. Sampled requests get a ``Server-Timing`` header, which browser
+dev tools show next to the request, and one JSON log line on the
+``theatre.timing`` logger.
+
+The query timer is installed on every database connection and the
+serializer timer on DRF's BaseSerializer once, at startup. The query timer
+also feeds the always-on query counters of ``theatre.metrics``; otherwise
+both only look up a context variable when the request is not sampled.
+"""
+import json
+import logging
+import random
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from theatre import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "SAMPLE_RATE": 0.0,
+}
+# (span, Server-Timing description)
+SPANS = (
+    ("db", "SQL"),
+    ("serialize", "Serializers"),
+    ("render", "Rendering"),
+)
+
+_timings = ContextVar("request_timings", default=None)
+
+
+def get_setting(name):
+    return getattr(settings, "REQUEST_TIMING", {}).get(name, DEFAULTS[name])
+
+
+class Timings:
+    """Durations (seconds) and counts of the spans of one request."""
+
+    def __init__(self):
+        self.durations = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.open = set()
+
+    def add(self, name, seconds):
+        self.durations[name] += seconds
+        self.counts[name] += 1
+
+
+@contextmanager
+def span(name):
+    """Add the time spent in the block to the current request's `name`."""
+    timings = _timings.get()
+    # Nested spans of the same name (a serializer reading another
+    # serializer's data) are counted once.
+    if timings is None or name in timings.open:
+        yield
+        return
+    timings.open.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.open.discard(name)
+        timings.add(name, time.perf_counter() - started)
+
+
+def time_query(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.record_query(context["connection"].alias, elapsed)
+        timings = _timings.get()
+        if timings is not None:
+            timings.add("db", elapsed)
+
+
+@receiver(connection_created)
+def install_query_timer(sender, connection, **kwargs):
+    if time_query not in connection.execute_wrappers:
+        # First, so the pop() of an execute_wrapper() block around the
+        # connection's creation removes that block's wrapper, not this one.
+        connection.execute_wrappers.insert(0, time_query)
+
+
+def install_serializer_timer():
+    from rest_framework.serializers import BaseSerializer
+
+    data = BaseSerializer.data
+    if getattr(data.fget, "timed", False):
+        return
+
+    def timed_data(self):
+        if _timings.get() is None:
+            return data.fget(self)
+        with span("serialize"):
+            return data.fget(self)
+
+    timed_data.timed = True
+    BaseSerializer.data = property(timed_data)
+
+
+def server_timing(timings, total):
+    entries = [f"total;dur={total * 1000:.1f}"]
+    for name, description in SPANS:
+        if name in timings.counts:
+            if name == "db":
+                description = f"{timings.counts[name]} queries"
+            entries.append(
+                f"{name};dur={timings.durations[name] * 1000:.1f};"
+                f'desc="{description}"'
+            )
+    return ", ".join(entries)
+
+
+def log_record(request, response, timings, total):
+    record = {
+        "method": request.method,
+        "path": request.path,
+        "status": response.status_code,
+        "total_ms": round(total * 1000, 2),
+        "db_queries": timings.counts.get("db", 0),
+    }
+    for name, _ in SPANS:
+        record[f"{name}_ms"] = round(timings.durations.get(name, 0) * 1000, 2)
+    return record
+
+
+class ServerTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def sampled():
+        rate = get_setting("SAMPLE_RATE")
+        return rate >= 1 or (rate > 0 and random.random() < rate)
+
+    def process_template_response(self, request, response):
+        timings = _timings.get()
+        if timings is not None:
+            started = time.perf_counter()
+            response.add_post_render_callback(
+                lambda rendered: timings.add(
+                    "render", time.perf_counter() - started
+                )
+            )
+        return response
+
+    def finish(self, request, response, timings, started):
+        total = time.perf_counter() - started
+        response["Server-Timing"] = server_timing(timings, total)
+        record = log_record(request, response, timings, total)
+        logger.info(json.dumps(record), extra={"timing": record})
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+        timings = Timings()
+        token = _timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.finish(request, response, timings, started)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        timings = Timings()
+        token = _timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.finish(request, response, timings, started)
@@ -0,0 +1,145 @@
+"""
+Streaming Play image uploads.
+
+``ImageUploadHandler`` replaces Django's default upload handlers on the
+``upload-image`` action. It writes the body to a temporary file chunk by
+chunk (hashing it on the way for the content-addressed storage) and stops
+reading as soon as the upload is known to be unacceptable:
+
+- a Content-Length or a running size above
+  ``settings.PLAY_IMAGES["MAX_UPLOAD_SIZE"]`` gives 413;
+- the format and dimensions are read from the first bytes, so anything but
+  JPEG, PNG or WebP, or more than ``PLAY_IMAGES["MAX_PIXELS"]`` pixels, is
+  rejected with 400 before the rest of the body is received. A small file
+  that decodes to a huge bitmap never reaches Pillow's full decoder.
+
+The full image is still verified by the serializer's ImageField afterwards.
+"""
+import hashlib
+import warnings
+from io import BytesIO
+
+from django.core.files.uploadhandler import (
+    StopUpload,
+    TemporaryFileUploadHandler,
+)
+from PIL import Image, UnidentifiedImageError
+from rest_framework import status
+
+from theatre.images import get_setting
+
+FORMATS = {"JPEG", "PNG", "WEBP"}
+# Bytes buffered to find the dimensions; JPEG EXIF blocks can be large.
+HEADER_LIMIT = 256 * 1024
+# Room for the multipart boundaries and other fields of the request.
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def sniff_image(header):
+    """(format, (width, height)) read from the first bytes of an image."""
+    with warnings.catch_warnings():
+        # Size limits are checked by the caller.
+        warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+        with Image.open(BytesIO(header)) as image:
+            return image.format, image.size
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    field_name = "image"
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_size = get_setting("MAX_UPLOAD_SIZE")
+        self.max_pixels = get_setting("MAX_PIXELS")
+        self.rejection = None
+
+    def reject(self, status_code, message):
+        self.rejection = (status_code, message)
+        raise StopUpload(connection_reset=True)
+
+    def handle_raw_input(
+        self, input_data, META, content_length, boundary, encoding=None
+    ):
+        if content_length > self.max_size + MULTIPART_OVERHEAD:
+            # Raising here is not handled by the parser; new_file() stops.
+            self.rejection = (
+                status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                self.too_large(),
+            )
+
+    def too_large(self):
+        return f"Images are limited to {self.max_size} bytes."
+
+    def new_file(self, field_name, *args, **kwargs):
+        if self.rejection:
+            raise StopUpload(connection_reset=True)
+        if field_name != self.field_name:
+            self.reject(
+                status.HTTP_400_BAD_REQUEST,
+                f"Unexpected file field '{field_name}'.",
+            )
+        super().new_file(field_name, *args, **kwargs)
+        self.header = b""
+        self.digest = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.max_size:
+            self.reject(
+                status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, self.too_large()
+            )
+        if self.header is not None:
+            self.header += raw_data
+            self.check_header(final=False)
+        self.digest.update(raw_data)
+        self.file.write(raw_data)
+
+    def check_header(self, final):
+        try:
+            image_format, (width, height) = sniff_image(self.header)
+        except Image.DecompressionBombError:
+            self.reject(status.HTTP_400_BAD_REQUEST, self.too_many_pixels())
+        except (UnidentifiedImageError, OSError):
+            if final or len(self.header) >= HEADER_LIMIT:
+                self.reject(
+                    status.HTTP_400_BAD_REQUEST,
+                    "Upload a valid JPEG, PNG or WebP image.",
+                )
+            return
+        if image_format not in FORMATS:
+            self.reject(
+                status.HTTP_400_BAD_REQUEST,
+                f"{image_format} images are not supported, "
+                f"upload JPEG, PNG or WebP.",
+            )
+        if width * height > self.max_pixels:
+            self.reject(
+                status.HTTP_400_BAD_REQUEST,
+                self.too_many_pixels(f"{width}x{height}"),
+            )
+        self.header = None
+
+    def too_many_pixels(self, dimensions=None):
+        message = f"Images are limited to {self.max_pixels} pixels"
+        if dimensions:
+            return f"{message}, this one is {dimensions}."
+        return f"{message}."
+
+    def file_complete(self, file_size):
+        if self.header is not None:
+            self.check_header(final=True)
+        uploaded = super().file_complete(file_size)
+        uploaded.content_sha256 = self.digest.hexdigest()
+        return uploaded
+
+
+def use_image_upload_handler(request):
+    """Parse `request`'s body with ImageUploadHandler only."""
+    request.upload_handlers = [ImageUploadHandler(request)]
+
+
+def upload_rejection(request):
+    """(status, message) if the image upload of `request` was stopped."""
+    for handler in request.upload_handlers:
+        if getattr(handler, "rejection", None):
+            return handler.rejection
+    return None
@@ -1,13 +1,16 @@
-from django.urls import path, include
+from django.urls import path, include, re_path
 from rest_framework import routers
 
+from theatre import async_views
 from theatre.views import (
     GenreViewSet,
     ActorViewSet,
     TheatreHallViewSet,
     PlayViewSet,
     PerformanceViewSet,
+    ProfileView,
     ReservationViewSet,
+    TicketExportView,
 )
 
 app_name = "theatre"
@@ -22,4 +25,49 @@ router.register("reservations", ReservationViewSet)
 
 urlpatterns = [
     path("", include(router.urls)),
+    re_path(
+        r"^exports/tickets\.(?P<file_format>csv|ndjson)$",
+        TicketExportView.as_view(),
+        name="ticket-export",
+    ),
+    re_path(
+        r"^profiles/(?P<profile_id>[0-9a-f]{32})\.(?P<extension>folded|prof)$",
+        ProfileView.as_view(),
+        name="profile",
+    ),
+    path(
+        "performances/<int:pk>/seat-events/",
+        async_views.performance_seat_events,
+        name="performance-seat-events",
+    ),
+    path(
+        "async/genres/",
+        async_views.genre_list,
+        name="async-genre-list",
+    ),
+    path(
+        "async/actors/",
+        async_views.actor_list,
+        name="async-actor-list",
+    ),
+    path(
+        "async/plays/",
+        async_views.play_list,
+        name="async-play-list",
+    ),
+    path(
+        "async/plays/<int:pk>/",
+        async_views.play_detail,
+        name="async-play-detail",
+    ),
+    path(
+        "async/performances/",
+        async_views.performance_list,
+        name="async-performance-list",
+    ),
+    path(
+        "async/performances/<int:pk>/",
+        async_views.performance_detail,
+        name="async-performance-detail",
+    ),
 ]
@@ -1,15 +1,39 @@
 import logging
 from datetime import datetime
 
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError, transaction
 from django.db.models import Count, F
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    StreamingHttpResponse,
+)
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework import viewsets, mixins, status
 from rest_framework.decorators import action
 from rest_framework.pagination import PageNumberPagination
-from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.permissions import (
+    AllowAny,
+    IsAuthenticated,
+    IsAdminUser,
+)
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import GenericViewSet
 
+from theatre import metrics, profiling
+from theatre.admission import AdmissionGate, get_setting
+from theatre.exports import (
+    RENDERERS,
+    async_blocks,
+    export_querysets,
+    stream_export,
+)
+from theatre.health import database_status
+from theatre.idempotency import idempotent_response
+from theatre.images import release_replaced_image, schedule_variants
 from theatre.models import (
     Genre,
     Actor,
@@ -18,6 +42,7 @@ from theatre.models import (
     Performance,
     Reservation,
 )
+from theatre.retry import DatabaseBusy, RetriesExhausted
 from theatre.serializers import (
     GenreSerializer,
     ActorSerializer,
@@ -28,10 +53,16 @@ from theatre.serializers import (
     PerformanceSerializer,
     PerformanceListSerializer,
     PerformanceDetailSerializer,
+    PerformanceScheduleSerializer,
     ReservationListSerializer,
     ReservationSerializer,
     PlayImageSerializer,
+    SeatAllocationSerializer,
+    TicketExportFilterSerializer,
 )
+from theatre.scheduling import create_schedule, describe_conflict
+from theatre.seating import reserve_best_available
+from theatre.uploads import upload_rejection, use_image_upload_handler
 
 # Create your views here.
 
@@ -81,6 +112,13 @@ class PlayViewSet(viewsets.ModelViewSet):
 
         return queryset.distinct()
 
+    def initialize_request(self, request, *args, **kwargs):
+        request = super().initialize_request(request, *args, **kwargs)
+        if self.action == "upload_image":
+            # Before anything (CSRF checks included) parses the body.
+            use_image_upload_handler(request)
+        return request
+
     def get_serializer_class(self):
 
         if self.action == "list":
@@ -100,10 +138,21 @@ class PlayViewSet(viewsets.ModelViewSet):
     )
     def upload_image(self, request, pk=None):
         item = self.get_object()
-        serializer = self.get_serializer(item, data=request.data)
+        data = request.data
+        rejection = upload_rejection(request)
+        if rejection:
+            status_code, message = rejection
+            return Response({"image": [message]}, status=status_code)
+        serializer = self.get_serializer(item, data=data)
 
         if serializer.is_valid():
-            serializer.save()
+            # The old files are released when this block commits, once the
+            # play no longer refers to them.
+            with transaction.atomic():
+                release_replaced_image(item)
+                # Serve the new original until its variants are rendered.
+                serializer.save(image_variants={})
+                schedule_variants(item)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -168,8 +217,93 @@ class PerformanceViewSet(viewsets.ModelViewSet):
             return PerformanceListSerializer
         elif self.action == "retrieve":
             return PerformanceDetailSerializer
+        elif self.action == "best_available":
+            return SeatAllocationSerializer
+        elif self.action == "schedule":
+            return PerformanceScheduleSerializer
         return PerformanceSerializer
 
+    @action(
+        methods=["POST"],
+        detail=True,
+        url_path="best-available",
+        permission_classes=[IsAuthenticated],
+    )
+    def best_available(self, request, pk=None):
+        """Reserve N adjacent seats, preferring centre rows"""
+        performance = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            reservation = reserve_best_available(
+                performance.id,
+                request.user,
+                serializer.validated_data["count"],
+            )
+        except RetriesExhausted:
+            raise DatabaseBusy()
+        except IntegrityError:
+            return Response(
+                {"detail": "Seats were taken concurrently, please retry."},
+                status=status.HTTP_409_CONFLICT,
+            )
+        if reservation is None:
+            return Response(
+                {"detail": "No adjacent seats available."},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        return Response(
+            ReservationSerializer(reservation).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+    @action(
+        methods=["POST"],
+        detail=False,
+        permission_classes=[IsAdminUser],
+    )
+    def schedule(self, request):
+        """
+        Create a recurring run of performances in one transaction, skipping
+        slots that clash with the hall's schedule
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        try:
+            created, conflicts = create_schedule(
+                data["theatre_hall"].id,
+                data["play"],
+                data["duration"],
+                data["slots"],
+            )
+        except IntegrityError:
+            return Response(
+                {"detail": "The hall was booked concurrently, please retry."},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        return Response(
+            {
+                "created": [performance.id for performance in created],
+                "conflicts": [
+                    {
+                        "show_time": show_time,
+                        "clashes": [describe_conflict(p) for p in clashes],
+                    }
+                    for show_time, clashes in conflicts
+                ],
+            },
+            status=(
+                status.HTTP_201_CREATED
+                if created
+                else status.HTTP_409_CONFLICT
+            ),
+        )
+
     @extend_schema(
         parameters=[
             OpenApiParameter(
@@ -204,19 +338,159 @@ class ReservationViewSet(
     GenericViewSet,
 ):
     queryset = Reservation.objects.prefetch_related(
-        "tickets__performance__theatre_hall", "tickets__performance__play"
+        "tickets__performance__theatre_hall",
+        "tickets__performance__play",
+        "archived_tickets__performance__theatre_hall",
+        "archived_tickets__performance__play",
     )
     pagination_class = ReservationPagination
     serializer_class = ReservationSerializer
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
-        return Reservation.objects.filter(user=self.request.user)
+        return self.queryset.filter(user=self.request.user)
 
     def get_serializer_class(self):
         if self.action == "list":
             return ReservationListSerializer
         return ReservationSerializer
 
+    @staticmethod
+    def _performance_ids(data):
+        """Collect performance ids from raw ticket data, ignoring junk."""
+        ids = set()
+        tickets = data.get("tickets") if hasattr(data, "get") else None
+        for ticket in tickets if isinstance(tickets, list) else []:
+            try:
+                ids.add(int(ticket["performance"]))
+            except (KeyError, TypeError, ValueError):
+                continue
+        return ids
+
+    def create(self, request, *args, **kwargs):
+        """Create a reservation, replaying it for a repeated Idempotency-Key"""
+        return idempotent_response(
+            self,
+            request,
+            lambda: self._admit_and_create(request, *args, **kwargs),
+        )
+
+    def _admit_and_create(self, request, *args, **kwargs):
+        if not get_setting("ENABLED"):
+            return super().create(request, *args, **kwargs)
+
+        with AdmissionGate(
+            self._performance_ids(request.data),
+            token=request.headers.get("Queue-Ticket"),
+            owner=request.user.pk,
+        ) as gate:
+            if gate.blocked:
+                return Response(
+                    {
+                        "detail": "Too many bookings in progress, "
+                        "retry with the queue ticket.",
+                        "queue_ticket": gate.blocked.token,
+                        "position": gate.blocked.position,
+                    },
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    headers={"Retry-After": "1"},
+                )
+            return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+
+
+class ReadinessView(APIView):
+    """Report whether the database (and its connection pool) can serve"""
+
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+    throttle_classes = ()
+
+    def get(self, request):
+        database = database_status()
+        if not database["available"]:
+            return Response(
+                {"status": "unavailable", "database": database},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        return Response({"status": "ready", "database": database})
+
+
+class MetricsView(APIView):
+    """Prometheus metrics of every server process, for admins and scrapers"""
+
+    authentication_classes = (
+        metrics.ScrapeTokenAuthentication,
+        *APIView.authentication_classes,
+    )
+    permission_classes = (IsAdminUser | metrics.IsScraper,)
+    throttle_classes = ()
+
+    @extend_schema(responses={(200, "text/plain"): str})
+    def get(self, request):
+        return HttpResponse(
+            metrics.render(), content_type=metrics.CONTENT_TYPE
+        )
+
+
+class ProfileView(APIView):
+    """Download a request profile recorded by ProfilerMiddleware, for admins"""
+
+    permission_classes = (IsAdminUser,)
+    throttle_classes = ()
+
+    @extend_schema(responses={(200, "application/octet-stream"): bytes})
+    def get(self, request, profile_id, extension):
+        try:
+            fileobj = open(profiling.profile_path(profile_id, extension), "rb")
+        except FileNotFoundError:
+            raise Http404
+        return FileResponse(
+            fileobj,
+            as_attachment=True,
+            filename=f"{profile_id}.{extension}",
+            content_type=(
+                "text/plain; charset=utf-8"
+                if extension == "folded"
+                else "application/octet-stream"
+            ),
+        )
+
+
+class TicketExportView(APIView):
+    """
+    Stream sold tickets with their performance, play, hall and buyer as
+    CSV or NDJSON, optionally filtered by sale date or performance
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    @extend_schema(
+        parameters=[TicketExportFilterSerializer],
+        responses={(200, "text/csv"): str, (200, "application/x-ndjson"): str},
+    )
+    def get(self, request, file_format):
+        filters = TicketExportFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        # The body is produced after the view returns, when the replica
+        # routing middleware no longer applies, so pick the database now.
+        querysets = [
+            queryset.using(queryset.db)
+            for queryset in export_querysets(**filters.validated_data)
+        ]
+        blocks = stream_export(querysets, file_format)
+        if isinstance(request._request, ASGIRequest):
+            blocks = async_blocks(blocks)
+
+        content_type, _ = RENDERERS[file_format]
+        return StreamingHttpResponse(
+            blocks,
+            content_type=content_type,
+            headers={
+                "Content-Disposition": (
+                    f'attachment; filename="tickets.{file_format}"'
+                )
+            },
+        )
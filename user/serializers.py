@@ -24,9 +24,6 @@ class UserSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         """Update a user, set the password correctly and return it"""
         password = validated_data.pop("password", None)
-        user = super().update(instance, validated_data)
         if password:
-            user.set_password(password)
-            user.save()
-
-        return user
+            instance.set_password(password)
+        return super().update(instance, validated_data)